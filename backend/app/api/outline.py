@@ -2,9 +2,10 @@
 Outline Builder API endpoints
 """
 from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import Optional
-from app.database import get_db
+from typing import Dict, Optional
+from app.database import get_db, SessionLocal
 from app.models.database import Keyword, KeywordAnalysis, Outline, KeywordList
 from app.schemas.requests import GenerateOutlineRequest
 from app.schemas.responses import OutlineResponse, ImprovementPlanResponse
@@ -14,6 +15,10 @@ from app.services.intent_service import get_intent_service
 from app.services.outline_service import get_outline_service
 from app.services.content_analyzer import get_content_analyzer
 import json
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -81,6 +86,76 @@ def generate_outline(
     Generate dynamic content brief for a keyword
     Includes PAA, related searches, SERP features, and AI-generated outline
     """
+    inputs = _prepare_outline_inputs(request, db)
+    outline_service = get_outline_service()
+
+    # Generate dynamic content brief with SERP features
+    try:
+        outline_data = outline_service.generate_outline(
+            keyword=inputs["keyword"],
+            serp_results=inputs["enriched_results"],
+            serp_medians=inputs["serp_medians"],
+            intent_analysis=inputs["intent_analysis"],
+            content_type=request.content_type,
+            serp_features=inputs["serp_features"],
+            existing_content=inputs["existing_content_data"],
+            use_cache=not request.force_refresh
+        )
+    except Exception as e:
+        error_detail = str(e)
+        logger.exception("Error generating outline for keyword %s", request.keyword_id)
+        raise HTTPException(
+            status_code=500,
+            detail=error_detail
+        )
+
+    return _save_outline(request, db, inputs, outline_data)
+
+
+@router.post("/generate/stream")
+def generate_outline_stream(
+    request: GenerateOutlineRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    Streaming variant of /generate. Returns newline-delimited JSON events:
+    - {"type": "field", "key": ..., "value": ...} as each top-level brief field
+      (title_recommendation, meta_description, ...) finishes streaming from the LLM
+    - {"type": "complete", "outline": {...}} with the saved OutlineResponse
+    - {"type": "error", "detail": ...} if generation fails mid-stream
+    """
+    inputs = _prepare_outline_inputs(request, db)
+    outline_service = get_outline_service()
+
+    async def event_stream():
+        try:
+            async for event in outline_service.generate_outline_stream_async(
+                keyword=inputs["keyword"],
+                serp_results=inputs["enriched_results"],
+                serp_medians=inputs["serp_medians"],
+                intent_analysis=inputs["intent_analysis"],
+                content_type=request.content_type,
+                serp_features=inputs["serp_features"],
+                existing_content=inputs["existing_content_data"],
+                use_cache=not request.force_refresh
+            ):
+                if event["type"] == "complete":
+                    response = await asyncio.to_thread(_save_outline_in_new_session, request, inputs, event["outline"])
+                    event = {"type": "complete", "outline": response.model_dump(mode="json")}
+                yield json.dumps(event) + "\n"
+        except Exception as e:
+            logger.exception("Error streaming outline for keyword %s", request.keyword_id)
+            yield json.dumps({"type": "error", "detail": str(e)}) + "\n"
+
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
+
+def _prepare_outline_inputs(request: GenerateOutlineRequest, db: Session) -> Dict:
+    """
+    Gather everything the outline service needs for a keyword: cached or fresh
+    SERP analysis, SERP features, intent analysis and (for existing content)
+    the analyzed page plus improvement plan.
+    """
     keyword_obj = db.query(Keyword).filter(Keyword.id == request.keyword_id).first()
     if not keyword_obj:
         raise HTTPException(status_code=404, detail="Keyword not found")
@@ -97,7 +172,6 @@ def generate_outline(
     serp_service = get_serp_service()
     semantic_service = get_semantic_service()
     intent_service = get_intent_service()
-    outline_service = get_outline_service()
 
     # Track raw SERP data for feature extraction
     raw_serp_data = None
@@ -227,27 +301,41 @@ def generate_outline(
             keyword=keyword
         )
 
-    # Generate dynamic content brief with SERP features
+    return {
+        "keyword": keyword,
+        "enriched_results": enriched_results,
+        "serp_medians": serp_medians,
+        "serp_features": serp_features,
+        "intent_analysis": intent_analysis,
+        "existing_content_data": existing_content_data,
+        "improvement_plan": improvement_plan
+    }
+
+
+def _save_outline_in_new_session(request: GenerateOutlineRequest, inputs: Dict, outline_data: Dict) -> OutlineResponse:
+    """
+    _save_outline on a session of its own: the streaming endpoint saves after the
+    response has started, when the request-scoped session may already be closed
+    """
+    db = SessionLocal()
     try:
-        outline_data = outline_service.generate_outline(
-            keyword=keyword,
-            serp_results=enriched_results,
-            serp_medians=serp_medians,
-            intent_analysis=intent_analysis,
-            content_type=request.content_type,
-            serp_features=serp_features,
-            existing_content=existing_content_data
-        )
-    except Exception as e:
-        error_detail = str(e)
-        print(f"Error generating outline: {error_detail}")
-        import traceback
-        traceback.print_exc()
-        raise HTTPException(
-            status_code=500,
-            detail=error_detail
-        )
-    
+        return _save_outline(request, db, inputs, outline_data)
+    finally:
+        db.close()
+
+
+def _save_outline(
+    request: GenerateOutlineRequest,
+    db: Session,
+    inputs: Dict,
+    outline_data: Dict
+) -> OutlineResponse:
+    """Persist a generated outline and build the API response"""
+    keyword = inputs["keyword"]
+    serp_features = inputs["serp_features"]
+    intent_analysis = inputs["intent_analysis"]
+    improvement_plan = inputs["improvement_plan"]
+
     # Build the response first so we can save it
     sections = [
         {
@@ -312,7 +400,7 @@ def generate_outline(
 
     # Save outline to database with full brief data
     outline = Outline(
-        keyword_id=keyword_obj.id,
+        keyword_id=request.keyword_id,
         name=f"Brief: {keyword}",
         content_type=request.content_type,
         target_url=request.existing_url if request.content_type == "existing" else None,
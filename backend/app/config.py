@@ -14,6 +14,9 @@ BASE_DIR = Path(__file__).parent.parent
 # Model files directory
 MODELS_DIR = BASE_DIR / "models"
 
+# Runtime data (SQLite caches) - created on first use, not part of the package
+DATA_DIR = Path(os.getenv("DATA_DIR", str(BASE_DIR / "data")))
+
 # API Keys - Must be set via environment variables
 SERPAPI_KEY = os.getenv("SERPAPI_KEY", "")
 SERANKING_KEY = os.getenv("SERANKING_KEY", "")
@@ -24,6 +27,58 @@ HUGGINGFACE_API_KEY = os.getenv("HUGGINGFACE_API_KEY", "")
 # LLM Provider preference: "claude" or "openai" (defaults to claude if available)
 LLM_PROVIDER = os.getenv("LLM_PROVIDER", "claude")
 
+# Models for outline generation. Claude prompts of CLAUDE_FAST_MODEL_MIN_TOKENS
+# or more (e.g. batched briefs) go to the faster, cheaper CLAUDE_FAST_MODEL
+# (0 disables routing). LLM_MODEL_OVERRIDE forces one model for the active provider.
+CLAUDE_MODEL = os.getenv("CLAUDE_MODEL", "claude-sonnet-4-20250514")
+CLAUDE_FAST_MODEL = os.getenv("CLAUDE_FAST_MODEL", "claude-haiku-4-5-20251001")
+CLAUDE_FAST_MODEL_MIN_TOKENS = int(os.getenv("CLAUDE_FAST_MODEL_MIN_TOKENS", "8000"))
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+LLM_MODEL_OVERRIDE = os.getenv("LLM_MODEL_OVERRIDE", "")
+
+# Retries for throttled/failed LLM requests (429, 5xx, connection errors)
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_RETRY_MAX_WAIT = float(os.getenv("LLM_RETRY_MAX_WAIT", "30"))
+
+# In-flight LLM requests per provider (sized to rate limits), and pooled connections per client
+ANTHROPIC_MAX_CONCURRENCY = int(os.getenv("ANTHROPIC_MAX_CONCURRENCY", "5"))
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "20"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "50"))
+
+# "low_latency": with both API keys set, new-content briefs are requested from Claude and
+# OpenAI at once and the first parseable answer wins (roughly doubles brief spend).
+# Any other value ("standard") calls only the active provider.
+LLM_COST_MODE = os.getenv("LLM_COST_MODE", "standard").lower()
+
+# SERP context compression (LLMLingua-2) - optional, requires `pip install llmlingua`
+SERP_CONTEXT_COMPRESSION = os.getenv("SERP_CONTEXT_COMPRESSION", "false").lower() == "true"
+SERP_CONTEXT_COMPRESSION_RATE = float(os.getenv("SERP_CONTEXT_COMPRESSION_RATE", "0.5"))
+SERP_CONTEXT_COMPRESSION_MODEL = os.getenv(
+    "SERP_CONTEXT_COMPRESSION_MODEL", "microsoft/llmlingua-2-xlm-roberta-large-meetingbank"
+)
+
+# Token budget for the SERP context sent to the LLM (lowest-value sections are dropped past it)
+SERP_CONTEXT_TOKEN_BUDGET = int(os.getenv("SERP_CONTEXT_TOKEN_BUDGET", "6000"))
+
+# Semantic brief cache: reuse a stored brief when a new keyword (same intent) embeds
+# within BRIEF_CACHE_THRESHOLD cosine similarity of a cached one
+BRIEF_CACHE_ENABLED = os.getenv("BRIEF_CACHE_ENABLED", "false").lower() == "true"
+BRIEF_CACHE_PATH = os.getenv("BRIEF_CACHE_PATH", str(DATA_DIR / "brief_cache.db"))
+BRIEF_CACHE_THRESHOLD = float(os.getenv("BRIEF_CACHE_THRESHOLD", "0.92"))
+BRIEF_CACHE_TTL_DAYS = int(os.getenv("BRIEF_CACHE_TTL_DAYS", "30"))
+
+# Optimization plan cache keyed on the page text (plus keyword, URL and rounded targets):
+# unchanged pages skip the LLM on re-audits even if the SERP has drifted
+PLAN_CACHE_ENABLED = os.getenv("PLAN_CACHE_ENABLED", "true").lower() == "true"
+PLAN_CACHE_PATH = os.getenv("PLAN_CACHE_PATH", str(DATA_DIR / "plan_cache.db"))
+PLAN_CACHE_TTL_DAYS = int(os.getenv("PLAN_CACHE_TTL_DAYS", "30"))
+
+# Exact response cache for briefs/plans: "memory" (per process), "redis" (shared) or "none"
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory").lower()
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", str(24 * 3600)))
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "512"))
+
 # Model file paths
 MODEL_FILE = os.getenv("MODEL_FILE", str(MODELS_DIR / "rf_model_top10_v2_20251208_2022.pkl"))
 FEATURE_LIST_FILE = os.getenv("FEATURE_LIST_FILE", str(MODELS_DIR / "feature_cols_v2.json"))
@@ -31,6 +86,33 @@ FEATURE_LIST_FILE = os.getenv("FEATURE_LIST_FILE", str(MODELS_DIR / "feature_col
 # Semantic model configuration
 SENTENCE_TRANSFORMERS_MODEL = os.getenv("SENTENCE_TRANSFORMERS_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
 
+# Persistent (SQLite) cache of query/document embeddings, shared across workers and restarts
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", str(DATA_DIR / "embedding_cache.db"))
+
+# Run the embedding model as a dynamically INT8-quantized ONNX graph on CPU (requires
+# `pip install optimum[onnxruntime]`). Exported once into ONNX_MODEL_DIR on first use;
+# falls back to the regular SentenceTransformer if export or loading fails.
+USE_ONNX_INT8 = os.getenv("USE_ONNX_INT8", "false").lower() == "true"
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", str(MODELS_DIR / "onnx"))
+
+# Device for the SentenceTransformer: "auto" (CUDA if available, else CPU), "cpu" or "cuda".
+# On CUDA the model runs in fp16.
+RANKPREDICT_DEVICE = os.getenv("RANKPREDICT_DEVICE", "auto").lower()
+
+# Compile the SentenceTransformer's transformer with torch.compile (PyTorch >= 2.1) and
+# warm it up at startup; falls back to eager mode if compilation fails
+TORCH_COMPILE_EMBEDDINGS = os.getenv("TORCH_COMPILE_EMBEDDINGS", "false").lower() == "true"
+
+# HTML characters parsed for a page's semantic main text (title + h1 + first paragraphs sit
+# near the top). Feature extraction always sees the full page.
+SEMANTIC_HTML_MAX_CHARS = int(os.getenv("SEMANTIC_HTML_MAX_CHARS", str(512 * 1024)))
+
+# Parse pages with selectolax (`pip install selectolax`) instead of BeautifulSoup's html.parser.
+# Off by default: the trained model's content features and semantic scores came from
+# BeautifulSoup, and selectolax builds a different tree from malformed markup.
+USE_SELECTOLAX = os.getenv("USE_SELECTOLAX", "false").lower() == "true"
+
 # SERP Configuration
 SERP_RESULTS_COUNT = int(os.getenv("SERP_RESULTS_COUNT", "25"))
 TOP_N_POSITIONS = 10  # Top-10 positions for positive class
@@ -1,12 +1,29 @@
 """
 Main FastAPI application for RankPredict v2
 """
+import logging
+import logging.handlers
+import queue
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api import strategy, outline, auth
 from app.database import init_db
+from app.services.llm_http import aclose_async_client
+from app.services.serp_service import aclose_async_http_client
 from app.config import ALLOWED_ORIGINS
 
+# Service modules log through logging.getLogger(__name__). Callers only enqueue
+# records; a listener thread (started with the app) writes them to stderr, so
+# request handlers and the event loop never wait on log I/O.
+_log_queue = queue.SimpleQueue()
+_log_handler = logging.StreamHandler()
+_log_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+_log_listener = logging.handlers.QueueListener(_log_queue, _log_handler, respect_handler_level=True)
+_queue_handler = logging.handlers.QueueHandler(_log_queue)
+# Only merge args/traceback into the message here - the listener's handler does the real formatting
+_queue_handler.setFormatter(logging.Formatter("%(message)s"))
+logging.basicConfig(level=logging.INFO, handlers=[_queue_handler])
+
 app = FastAPI(
     title="RankPredict v2 API",
     description="Two-screen SEO tool: Strategy Dashboard + Dynamic Outline Builder",
@@ -27,6 +44,7 @@ app.add_middleware(
 # Model preloading moved to background to avoid blocking healthcheck
 @app.on_event("startup")
 async def startup_event():
+    _log_listener.start()
     try:
         init_db()
         print("RankPredict v2 API started - database initialized")
@@ -37,6 +55,14 @@ async def startup_event():
     import asyncio
     asyncio.create_task(preload_models_background())
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Close pooled LLM and SERP enrichment connections
+    await aclose_async_client()
+    await aclose_async_http_client()
+    # Flush queued log records
+    _log_listener.stop()
+
 async def preload_models_background():
     """Preload models in background after server starts"""
     import asyncio
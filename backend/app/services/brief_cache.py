@@ -0,0 +1,190 @@
+"""
+Semantic brief cache - reuse generated content briefs for near-duplicate keywords.
+Persisted in SQLite (WAL mode, shared across workers and restarts); nearest
+neighbour lookup uses FAISS when installed, otherwise a NumPy dot product.
+Embeddings are kept as float16 (half the memory and scan bandwidth); past
+IVF_MIN_SIZE entries FAISS switches to an IVF-PQ index, and candidates are
+always re-scored exactly in float32 before the threshold is applied.
+"""
+import json
+import hashlib
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+import numpy as np
+from typing import Dict, List, Optional
+from app.config import (
+    BRIEF_CACHE_PATH, BRIEF_CACHE_THRESHOLD, BRIEF_CACHE_TTL_DAYS
+)
+
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
+logger = logging.getLogger(__name__)
+
+# Candidates checked per lookup (nearest first) for a matching intent type
+CACHE_SEARCH_K = 5
+
+# Approximate (IVF-PQ) index settings, used with FAISS once the cache is large
+IVF_MIN_SIZE = 10000
+IVF_NLIST = 100
+IVF_NPROBE = 8
+IVF_PQ_M = 48            # sub-quantizers (must divide the embedding dimension)
+IVF_PQ_NBITS = 8
+IVF_TRAIN_SAMPLE = 10000
+IVF_CANDIDATES = 4 * CACHE_SEARCH_K   # approximate hits re-scored exactly
+
+# Exact NumPy scan is done in float32 blocks of this many rows
+SCAN_BLOCK_ROWS = 8192
+
+_SCHEMA = """CREATE TABLE IF NOT EXISTS briefs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    keyword TEXT NOT NULL,
+    intent_type TEXT NOT NULL,
+    serp_hash TEXT,
+    response_json TEXT NOT NULL,
+    vec BLOB NOT NULL,
+    created_at TEXT NOT NULL DEFAULT (datetime('now'))
+)"""
+
+
+class BriefCache:
+    """Keyword-embedding → generated brief cache"""
+
+    def __init__(self, path: str = None, threshold: float = None):
+        self.threshold = BRIEF_CACHE_THRESHOLD if threshold is None else threshold
+        path = path or BRIEF_CACHE_PATH
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(_SCHEMA)
+        # Guards the shared connection and the in-memory index
+        self._lock = threading.Lock()
+
+        # In-memory index over the rows loaded so far (row ids -> unit vectors)
+        self._index = None
+        self._quantizer = None
+        self._ivf = False
+        self._ids = np.empty(0, dtype=np.int64)
+        self._vectors = None    # float16, one row per id
+        self._max_id = 0
+        self._sync()
+
+    def lookup(self, keyword: str, intent_type: str) -> Optional[Dict]:
+        """Return the cached brief JSON of the most similar keyword with the same intent, if close enough"""
+        query = self._embed(keyword)
+        with self._lock:
+            self._sync()
+            for row_id, score in self._search(query):
+                if score < self.threshold:
+                    break
+                row = self._db.execute(
+                    "SELECT keyword, response_json FROM briefs WHERE id = ? AND intent_type = ? "
+                    "AND created_at >= datetime('now', ?)",
+                    (row_id, intent_type, f"-{BRIEF_CACHE_TTL_DAYS} days")
+                ).fetchone()
+                if row:
+                    logger.info("Brief cache hit for %r (matched %r, similarity %.3f)", keyword, row[0], score)
+                    return json.loads(row[1])
+        return None
+
+    def store(self, keyword: str, intent_type: str, serp_hash: str, brief: Dict):
+        """
+        Persist generated brief JSON (unformatted, so a hit can be formatted for
+        the new keyword); other workers pick it up on their next lookup
+        """
+        vec = self._embed(keyword)
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO briefs (keyword, intent_type, serp_hash, response_json, vec) VALUES (?, ?, ?, ?, ?)",
+                (keyword, intent_type, serp_hash, json.dumps(brief, default=str), vec.astype(np.float16).tobytes())
+            )
+            self._sync()
+
+    def _embed(self, keyword: str) -> np.ndarray:
+        """Unit-norm float32 embedding of the keyword"""
+        from app.services.semantic_service import get_semantic_service
+        vec = get_semantic_service().model.encode(keyword, normalize_embeddings=True)
+        return np.asarray(vec, dtype=np.float32)
+
+    def _sync(self):
+        """Load rows added since the last sync (by this or another worker) into the index"""
+        rows = self._db.execute(
+            "SELECT id, vec FROM briefs WHERE id > ? ORDER BY id", (self._max_id,)
+        ).fetchall()
+        if not rows:
+            return
+
+        ids = np.array([r[0] for r in rows], dtype=np.int64)
+        vectors = np.vstack([np.frombuffer(r[1], dtype=np.float16) for r in rows])
+        self._max_id = int(ids[-1])
+
+        # Ids only ever grow, so the id column stays sorted for searchsorted()
+        self._ids = np.concatenate([self._ids, ids])
+        self._vectors = vectors if self._vectors is None else np.vstack([self._vectors, vectors])
+
+        if faiss is None:
+            return
+        dim = self._vectors.shape[1]
+        if not self._ivf and len(self._ids) >= IVF_MIN_SIZE and dim % IVF_PQ_M == 0:
+            self._build_ivf_index()
+        elif self._index is None:
+            self._index = faiss.IndexIDMap(faiss.IndexFlatIP(dim))
+            self._index.add_with_ids(self._vectors.astype(np.float32), self._ids)
+        else:
+            self._index.add_with_ids(vectors.astype(np.float32), ids)
+
+    def _build_ivf_index(self):
+        """Replace the flat index with IVF-PQ trained on a sample of the cached vectors"""
+        n, dim = self._vectors.shape
+        sample = np.random.default_rng(0).choice(n, min(n, IVF_TRAIN_SAMPLE), replace=False)
+
+        quantizer = faiss.IndexFlatIP(dim)
+        index = faiss.IndexIVFPQ(quantizer, dim, IVF_NLIST, IVF_PQ_M, IVF_PQ_NBITS, faiss.METRIC_INNER_PRODUCT)
+        index.train(self._vectors[sample].astype(np.float32))
+        index.nprobe = IVF_NPROBE
+        index.add_with_ids(self._vectors.astype(np.float32), self._ids)
+
+        # Keep the quantizer alive alongside the index that references it
+        self._index, self._quantizer, self._ivf = index, quantizer, True
+        logger.info("Brief cache switched to IVF-PQ index (%d entries)", n)
+
+    def _search(self, query: np.ndarray):
+        """[(row_id, cosine similarity)] of the nearest cached keywords, best first"""
+        if self._vectors is None:
+            return []
+
+        if faiss is not None:
+            k = IVF_CANDIDATES if self._ivf else CACHE_SEARCH_K
+            _, ids = self._index.search(query.reshape(1, -1), k)
+            candidates = ids[0][ids[0] != -1]
+            if not len(candidates):
+                return []
+            # PQ scores are approximate - re-score candidates exactly in float32
+            positions = np.searchsorted(self._ids, candidates)
+            scores = self._vectors[positions].astype(np.float32) @ query
+        else:
+            positions = np.arange(len(self._ids))
+            scores = np.concatenate([
+                self._vectors[start:start + SCAN_BLOCK_ROWS].astype(np.float32) @ query
+                for start in range(0, len(self._ids), SCAN_BLOCK_ROWS)
+            ])
+
+        top = np.argsort(-scores)[:CACHE_SEARCH_K]
+        return [(int(self._ids[positions[i]]), float(scores[i])) for i in top]
+
+
+def serp_fingerprint(serp_results: List[Dict]) -> str:
+    """Hash of the top-10 result URLs, stored alongside each brief for auditing"""
+    urls = "\n".join(r.get("url", r.get("link", "")) for r in serp_results[:10])
+    return hashlib.sha1(urls.encode("utf-8")).hexdigest()
+
+
+def get_brief_cache() -> BriefCache:
+    """Get brief cache instance (singleton)"""
+    if not hasattr(get_brief_cache, "_instance"):
+        get_brief_cache._instance = BriefCache()
+    return get_brief_cache._instance
@@ -26,6 +26,13 @@ STOP_WORDS = {
     'not', 'only', 'own', 'same', 'so', 'than', 'too', 'very', 'can', 'will', 'just'
 }
 
+# Text and JSON extraction patterns, compiled once
+_WHITESPACE_RE = re.compile(r"\s+")
+_SENTENCE_END_RE = re.compile(r'[.!?]+')
+_WORD_RE = re.compile(r'\b\w+\b')
+_JSON_ARRAY_RE = re.compile(r'\[.*?\]', re.DOTALL)
+_JSON_OBJ_RE = re.compile(r'\{.*\}', re.DOTALL)
+
 
 def count_syllables(word: str) -> int:
     """
@@ -108,7 +115,7 @@ class ContentAnalyzer:
                 # Get text from body
                 body = soup.find('body') or soup
                 text = body.get_text(separator=" ")
-                text = re.sub(r"\s+", " ", text).strip()
+                text = _WHITESPACE_RE.sub(" ", text).strip()
 
             if not text:
                 text = ""  # Will result in 0 word count
@@ -118,7 +125,7 @@ class ContentAnalyzer:
             word_count = len(words)
 
             # Count sentences - look for sentence-ending punctuation
-            sentence_count = len(re.findall(r'[.!?]+', text))
+            sentence_count = len(_SENTENCE_END_RE.findall(text))
             if sentence_count < 1:
                 sentence_count = max(1, word_count // 15)  # Estimate ~15 words per sentence
 
@@ -250,7 +257,7 @@ class ContentAnalyzer:
                 # Get text from body or full content
                 body = soup.find('body') or soup
                 text = body.get_text(separator=" ")
-                text = re.sub(r"\s+", " ", text).strip()
+                text = _WHITESPACE_RE.sub(" ", text).strip()
 
                 # Extract H2 headings
                 h2_headings = [h2.get_text(strip=True) for h2 in soup.find_all("h2")]
@@ -296,7 +303,7 @@ class ContentAnalyzer:
                         internal_links += 1
             else:
                 # Plain text - no HTML parsing
-                text = re.sub(r"\s+", " ", content).strip()
+                text = _WHITESPACE_RE.sub(" ", content).strip()
                 h2_headings = []
                 page_title = ""
                 h1_text = ""
@@ -312,7 +319,7 @@ class ContentAnalyzer:
             word_count = len(words)
 
             # Count sentences
-            sentence_count = len(re.findall(r'[.!?]+', text))
+            sentence_count = len(_SENTENCE_END_RE.findall(text))
             if sentence_count < 1:
                 sentence_count = max(1, word_count // 15)
 
@@ -536,8 +543,7 @@ Return ONLY the JSON array, no other text."""
             content = result["choices"][0]["message"]["content"]
             
             # Extract JSON array
-            import re
-            json_match = re.search(r'\[.*?\]', content, re.DOTALL)
+            json_match = _JSON_ARRAY_RE.search(content)
             if json_match:
                 topics = json.loads(json_match.group(0))
                 # Filter out stop words
@@ -556,7 +562,7 @@ Return ONLY the JSON array, no other text."""
             for r in serp_results[:10]
         ]).lower()
         
-        words = re.findall(r'\b\w+\b', all_text)
+        words = _WORD_RE.findall(all_text)
         from collections import Counter
         word_freq = Counter(words)
         
@@ -572,7 +578,7 @@ Return ONLY the JSON array, no other text."""
         """Extract topics from content H2 headings"""
         topics = []
         for h2 in h2_headings:
-            words = re.findall(r'\b\w+\b', h2.lower())
+            words = _WORD_RE.findall(h2.lower())
             topics.extend([w for w in words if w not in STOP_WORDS and len(w) > 3])
         return topics
     
@@ -685,8 +691,7 @@ Return ONLY valid JSON."""
             content = result["choices"][0]["message"]["content"]
             
             # Extract JSON
-            import re
-            json_match = re.search(r'\{.*\}', content, re.DOTALL)
+            json_match = _JSON_OBJ_RE.search(content)
             if json_match:
                 llm_plan = json.loads(json_match.group(0))
                 # Merge with our gap analysis
@@ -0,0 +1,67 @@
+"""
+Persistent embedding cache - query and document embeddings survive restarts and
+are shared across workers, so a recurring query or page skips the model.
+Persisted in SQLite (WAL mode) as float16 blobs (half the size; cosine scores on
+unit vectors barely move). Keys carry the model id, so a model change misses.
+"""
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+import numpy as np
+from typing import Dict, List
+from app.config import EMBEDDING_CACHE_PATH
+
+logger = logging.getLogger(__name__)
+
+# Keys per SELECT ... IN (...) (stays under SQLite's bound-parameter limit)
+LOOKUP_CHUNK = 500
+
+_SCHEMA = """CREATE TABLE IF NOT EXISTS embeddings (
+    key TEXT PRIMARY KEY,
+    vec BLOB NOT NULL,
+    created_at TEXT NOT NULL DEFAULT (datetime('now'))
+)"""
+
+
+class EmbeddingCache:
+    """Cache key ("<model id>:<kind>:<text digest>") → float32 embedding"""
+
+    def __init__(self, path: str = None):
+        path = path or EMBEDDING_CACHE_PATH
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(_SCHEMA)
+        # Guards the shared connection
+        self._lock = threading.Lock()
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """Stored embeddings for whichever of keys are present"""
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), LOOKUP_CHUNK):
+                chunk = keys[start:start + LOOKUP_CHUNK]
+                rows = self._db.execute(
+                    f"SELECT key, vec FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                for key, vec in rows:
+                    found[key] = np.frombuffer(vec, dtype=np.float16).astype(np.float32)
+        return found
+
+    def set_many(self, items: Dict[str, np.ndarray]):
+        """Persist embeddings (float16)"""
+        if not items:
+            return
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vec) VALUES (?, ?)",
+                [(key, np.asarray(vec, dtype=np.float16).tobytes()) for key, vec in items.items()]
+            )
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Get embedding cache instance (singleton)"""
+    if not hasattr(get_embedding_cache, "_instance"):
+        get_embedding_cache._instance = EmbeddingCache()
+    return get_embedding_cache._instance
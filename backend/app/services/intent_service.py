@@ -2,9 +2,100 @@
 Intent Analysis Service - LLM-powered intent extraction
 """
 import os
-import requests
-from typing import Dict, List, Optional
+import re
+import json
+import logging
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
 from app.config import OPENAI_API_KEY, HUGGINGFACE_API_KEY
+from app.services.llm_http import post_with_retry
+
+logger = logging.getLogger(__name__)
+
+# JSON extraction patterns, compiled once for every LLM response
+_JSON_BLOCK_RE = re.compile(r'```(?:json)?\s*(\{.*?\})\s*```', re.DOTALL)
+_JSON_OBJ_RE = re.compile(r'\{.*\}', re.DOTALL)
+_JSON_ARRAY_RE = re.compile(r'\[.*\]', re.DOTALL)
+
+# Shared by single and batch intent prompts
+INTENT_INSTRUCTIONS = """1. Intent Type (choose one):
+   - informational: User wants to learn or understand something
+   - commercial: User is researching products/services before buying
+   - transactional: User wants to make a purchase or take action
+   - navigational: User wants to find a specific website
+
+2. Content Format Recommendation (choose the most appropriate):
+   - article: General informational article
+   - how-to: Step-by-step guide or tutorial
+   - product: Product review, comparison, or buying guide
+   - FAQ: Frequently asked questions format
+   - list: Listicle or roundup format
+   - comparison: Comparison table or detailed comparison
+   - definition: Definition or explanation format
+   - news: News article or update format
+
+3. Query Variants: Provide 2-3 alternative phrasings of the keyword that capture the same intent (for better semantic matching)."""
+
+INTENT_JSON_STRUCTURE = """{
+  "intent_type": "informational|commercial|transactional|navigational",
+  "content_format": "article|how-to|product|FAQ|list|comparison|definition|news",
+  "query_variants": ["variant1", "variant2", "variant3"],
+  "reasoning": "Brief explanation of why this intent and format"
+}"""
+
+# Batched responses carry each keyword's number so results are routed by it, not by position
+INTENT_BATCH_JSON_STRUCTURE = """{
+  "index": 0,
+  "intent_type": "informational|commercial|transactional|navigational",
+  "content_format": "article|how-to|product|FAQ|list|comparison|definition|news",
+  "query_variants": ["variant1", "variant2", "variant3"],
+  "reasoning": "Brief explanation of why this intent and format"
+}"""
+
+# Max keywords per batched intent request (each result gets ~500 output tokens)
+INTENT_BATCH_SIZE = 10
+
+# Rule-based fallback vocabulary, matched as plain substrings of the keyword
+FALLBACK_INTENT_WORDS = {
+    "informational": ["how", "what", "why", "when", "where", "guide", "tutorial"],
+    "commercial": ["buy", "price", "cost", "cheap", "best", "top", "review"],
+    "question": ["?"],
+}
+_FALLBACK_WORD_CATEGORY = {
+    word: category for category, words in FALLBACK_INTENT_WORDS.items() for word in words
+}
+# Zero-width lookahead so overlapping matches ("howhat" -> how, what) are all
+# reported, giving the same substring semantics as `word in keyword` in one scan
+_FALLBACK_WORDS_RE = re.compile(
+    "(?=(" + "|".join(re.escape(w) for w in _FALLBACK_WORD_CATEGORY) + "))"
+)
+
+
+@lru_cache(maxsize=8192)
+def _classify_fallback_keyword(keyword_lower: str) -> Tuple[str, str, bool, bool]:
+    """
+    Rule-based (intent_type, content_format, has_how, has_best) for a lowercased
+    keyword. Memoized: bulk fallback runs see the same keywords repeatedly
+    across lists and re-scores.
+    """
+    # Simple intent detection - a single scan collects every vocabulary hit
+    hits = {m.group(1) for m in _FALLBACK_WORDS_RE.finditer(keyword_lower)}
+    categories = {_FALLBACK_WORD_CATEGORY[word] for word in hits}
+    
+    if "informational" in categories:
+        intent_type = "informational"
+        content_format = "how-to" if "how" in hits else "article"
+    elif "commercial" in categories:
+        intent_type = "commercial"
+        content_format = "product" if "review" in hits or "best" in hits else "comparison"
+    elif "question" in categories:
+        intent_type = "informational"
+        content_format = "FAQ"
+    else:
+        intent_type = "informational"
+        content_format = "article"
+    
+    return intent_type, content_format, "how" in hits, "best" in hits
 
 
 class IntentService:
@@ -32,10 +123,11 @@ class IntentService:
             - content_format: article/how-to/product/FAQ/etc.
             - query_variants: List of alternative phrasings for better semantic matching
         """
-        # Extract context from SERP
-        titles = [r.get("title", "") for r in serp_results[:10]]
-        snippets = [r.get("snippet", "") for r in serp_results[:10]]
-        serp_context = "\n".join([f"Title: {t}\nSnippet: {s}" for t, s in zip(titles, snippets)])
+        # No LLM configured - skip building a prompt nobody will read
+        if not self.openai_api_key and not self.huggingface_api_key:
+            return self._fallback_intent_analysis(keyword, serp_results)
+        
+        serp_context = self._build_serp_context(serp_results)
         
         # Build prompt for intent analysis
         prompt = f"""Analyze the search intent for this keyword and provide recommendations.
@@ -43,57 +135,141 @@ class IntentService:
 Keyword: "{keyword}"
 
 SERP Context (what's currently ranking):
-{serp_context[:2000]}
+{serp_context}
 
 Based on the keyword and what's ranking in the SERP, determine:
 
-1. Intent Type (choose one):
-   - informational: User wants to learn or understand something
-   - commercial: User is researching products/services before buying
-   - transactional: User wants to make a purchase or take action
-   - navigational: User wants to find a specific website
-
-2. Content Format Recommendation (choose the most appropriate):
-   - article: General informational article
-   - how-to: Step-by-step guide or tutorial
-   - product: Product review, comparison, or buying guide
-   - FAQ: Frequently asked questions format
-   - list: Listicle or roundup format
-   - comparison: Comparison table or detailed comparison
-   - definition: Definition or explanation format
-   - news: News article or update format
-
-3. Query Variants: Provide 2-3 alternative phrasings of the keyword that capture the same intent (for better semantic matching).
+{INTENT_INSTRUCTIONS}
 
 Return your response as JSON:
-{{
-  "intent_type": "informational|commercial|transactional|navigational",
-  "content_format": "article|how-to|product|FAQ|list|comparison|definition|news",
-  "query_variants": ["variant1", "variant2", "variant3"],
-  "reasoning": "Brief explanation of why this intent and format"
-}}"""
+{INTENT_JSON_STRUCTURE}"""
 
         # Try OpenAI first, then Hugging Face, then fallback
         if self.openai_api_key:
             try:
                 return self._analyze_with_openai(prompt)
             except Exception as e:
-                print(f"Error calling OpenAI for intent analysis: {e}")
+                logger.warning("Error calling OpenAI for intent analysis: %s", e)
         
         if self.huggingface_api_key:
             try:
                 return self._analyze_with_huggingface(prompt)
             except Exception as e:
-                print(f"Error calling Hugging Face for intent analysis: {e}")
+                logger.warning("Error calling Hugging Face for intent analysis: %s", e)
         
         # Fallback to rule-based analysis
         return self._fallback_intent_analysis(keyword, serp_results)
     
-    def _analyze_with_openai(self, prompt: str) -> Dict:
-        """Analyze intent using OpenAI API"""
-        import json
+    def analyze_intent_batch(
+        self,
+        keywords: List[str],
+        serp_results_list: List[List[Dict]]
+    ) -> List[Dict]:
+        """
+        Analyze search intent for many keywords with one OpenAI request per
+        batch of INTENT_BATCH_SIZE keywords instead of one request per keyword.
+        
+        Args:
+            keywords: Search keywords
+            serp_results_list: SERP results for each keyword (same order as keywords)
+            
+        Returns:
+            List of intent analysis dicts in input order (same shape as analyze_intent)
+        """
+        if not self.openai_api_key:
+            return [self.analyze_intent(kw, serp) for kw, serp in zip(keywords, serp_results_list)]
+        
+        results = []
+        for start in range(0, len(keywords), INTENT_BATCH_SIZE):
+            batch_keywords = keywords[start:start + INTENT_BATCH_SIZE]
+            batch_serps = serp_results_list[start:start + INTENT_BATCH_SIZE]
+            
+            batch_results: List[Optional[Dict]] = []
+            if len(batch_keywords) > 1:
+                try:
+                    batch_results = self._analyze_batch_with_openai(batch_keywords, batch_serps)
+                except Exception as e:
+                    logger.warning("Error calling OpenAI for batch intent analysis: %s", e)
+            
+            # Anything the batch response did not cover falls back to a single analysis
+            for i, (keyword, serp_results) in enumerate(zip(batch_keywords, batch_serps)):
+                if i < len(batch_results) and batch_results[i] is not None:
+                    results.append(batch_results[i])
+                else:
+                    results.append(self.analyze_intent(keyword, serp_results))
+        
+        return results
+    
+    def _analyze_batch_with_openai(
+        self,
+        keywords: List[str],
+        serp_results_list: List[List[Dict]]
+    ) -> List[Optional[Dict]]:
+        """
+        Analyze intent for several keywords in a single OpenAI call.
+        Returns one entry per keyword in order; None where the response had no
+        result for it (or more than one).
+        """
+        n = len(keywords)
+        blocks = []
+        for i, (keyword, serp_results) in enumerate(zip(keywords, serp_results_list)):
+            blocks.append(f"""[{i}] Keyword: "{keyword}"
+SERP Context (what's currently ranking):
+{self._build_serp_context(serp_results)}""")
+        
+        prompt = f"""Analyze the search intent for the following {n} keywords.
+
+""" + "\n\n".join(blocks) + f"""
+
+For EACH keyword, based on the keyword and what's ranking in its SERP, determine:
+
+{INTENT_INSTRUCTIONS}
+
+Return your response as a JSON array of {n} objects, one per keyword, each with this structure
+and "index" set to the keyword's number in brackets (0 to {n - 1}):
+{INTENT_BATCH_JSON_STRUCTURE}"""
+        
+        content = self._call_openai(prompt, max_tokens=500 * n, timeout=120)
         
-        response = requests.post(
+        try:
+            parsed = json.loads(content)
+        except Exception as e:
+            logger.debug("Batch intent response is not bare JSON (%s), searching for an array", e)
+            json_match = _JSON_ARRAY_RE.search(content)
+            if not json_match:
+                raise ValueError("Could not parse JSON array from OpenAI response")
+            parsed = json.loads(json_match.group(0))
+        
+        # Tolerate the array being wrapped in an object, e.g. {"results": [...]}
+        if isinstance(parsed, dict):
+            parsed = next((v for v in parsed.values() if isinstance(v, list)), [])
+        
+        # Route by the "index" field; a missing, out-of-range or repeated index leaves the keyword unmatched
+        results: List[Optional[Dict]] = [None] * n
+        seen = set()
+        for entry in parsed:
+            if not isinstance(entry, dict):
+                continue
+            index = entry.pop("index", None)
+            if not isinstance(index, int) or not 0 <= index < n:
+                continue
+            if index in seen:
+                results[index] = None
+                continue
+            seen.add(index)
+            results[index] = entry
+        return results
+    
+    def _build_serp_context(self, serp_results: List[Dict]) -> str:
+        """Titles and snippets of the top 10 results, truncated for the prompt"""
+        titles = [r.get("title", "") for r in serp_results[:10]]
+        snippets = [r.get("snippet", "") for r in serp_results[:10]]
+        serp_context = "\n".join([f"Title: {t}\nSnippet: {s}" for t, s in zip(titles, snippets)])
+        return serp_context[:2000]
+    
+    def _call_openai(self, prompt: str, max_tokens: int = 500, timeout: int = 30) -> str:
+        """Call OpenAI chat completions and return the message content"""
+        response = post_with_retry(
             "https://api.openai.com/v1/chat/completions",
             headers={
                 "Authorization": f"Bearer {self.openai_api_key}",
@@ -106,27 +282,31 @@ Return your response as JSON:
                     {"role": "user", "content": prompt}
                 ],
                 "temperature": 0.3,
-                "max_tokens": 500
+                "max_tokens": max_tokens
             },
-            timeout=30
+            timeout=timeout
         )
         response.raise_for_status()
         
         result = response.json()
-        content = result["choices"][0]["message"]["content"]
+        return result["choices"][0]["message"]["content"]
+    
+    def _analyze_with_openai(self, prompt: str) -> Dict:
+        """Analyze intent using OpenAI API"""
+        content = self._call_openai(prompt)
         
         # Extract JSON from response
         try:
             # Try to parse as JSON directly
             return json.loads(content)
-        except:
+        except Exception as e:
+            logger.debug("Intent response is not bare JSON (%s), searching for an object", e)
             # Try to extract JSON from markdown code blocks
-            import re
-            json_match = re.search(r'```json\s*(\{.*?\})\s*```', content, re.DOTALL)
+            json_match = _JSON_BLOCK_RE.search(content)
             if json_match:
                 return json.loads(json_match.group(1))
             # Fallback: try to find JSON object
-            json_match = re.search(r'\{.*\}', content, re.DOTALL)
+            json_match = _JSON_OBJ_RE.search(content)
             if json_match:
                 return json.loads(json_match.group(0))
             raise ValueError("Could not parse JSON from OpenAI response")
@@ -134,7 +314,7 @@ Return your response as JSON:
     def _analyze_with_huggingface(self, prompt: str) -> Dict:
         """Analyze intent using Hugging Face API"""
         # Hugging Face inference API
-        response = requests.post(
+        response = post_with_retry(
             "https://api-inference.huggingface.co/models/mistralai/Mistral-7B-Instruct-v0.2",
             headers={
                 "Authorization": f"Bearer {self.huggingface_api_key}",
@@ -159,41 +339,25 @@ Return your response as JSON:
             content = str(result)
         
         # Try to extract JSON (similar to OpenAI)
-        import json
-        import re
         try:
-            json_match = re.search(r'\{.*\}', content, re.DOTALL)
+            json_match = _JSON_OBJ_RE.search(content)
             if json_match:
                 return json.loads(json_match.group(0))
-        except:
-            pass
+        except Exception as e:
+            logger.warning("Could not parse Hugging Face intent response, using rule-based fallback: %s", e)
         
         # Fallback
         return self._fallback_intent_analysis("", [])
     
     def _fallback_intent_analysis(self, keyword: str, serp_results: List[Dict]) -> Dict:
         """Fallback rule-based intent analysis"""
-        keyword_lower = keyword.lower()
-        
-        # Simple intent detection
-        if any(word in keyword_lower for word in ["how", "what", "why", "when", "where", "guide", "tutorial"]):
-            intent_type = "informational"
-            content_format = "how-to" if "how" in keyword_lower else "article"
-        elif any(word in keyword_lower for word in ["buy", "price", "cost", "cheap", "best", "top", "review"]):
-            intent_type = "commercial"
-            content_format = "product" if "review" in keyword_lower or "best" in keyword_lower else "comparison"
-        elif any(word in keyword_lower for word in ["?"]):
-            intent_type = "informational"
-            content_format = "FAQ"
-        else:
-            intent_type = "informational"
-            content_format = "article"
+        intent_type, content_format, has_how, has_best = _classify_fallback_keyword(keyword.lower())
         
         # Generate query variants
         query_variants = []
-        if "how" in keyword_lower:
+        if has_how:
             query_variants.append(keyword.replace("how", "way to"))
-        if "best" in keyword_lower:
+        if has_best:
             query_variants.append(keyword.replace("best", "top"))
         
         return {
@@ -0,0 +1,167 @@
+"""
+Provider batch APIs for non-interactive LLM work such as bulk page audits.
+OpenAI Batch and Anthropic Message Batches bill at half the regular price
+and complete within 24 hours.
+"""
+import time
+import logging
+import orjson
+from typing import Dict, Optional
+from app.services.llm_http import request_with_retry
+
+logger = logging.getLogger(__name__)
+
+# Seconds between batch status checks
+BATCH_POLL_INTERVAL = 60
+
+# Give up waiting after the providers' 24h completion window (plus slack)
+BATCH_MAX_WAIT = 25 * 60 * 60
+
+OPENAI_API_URL = "https://api.openai.com/v1"
+ANTHROPIC_BATCHES_URL = "https://api.anthropic.com/v1/messages/batches"
+
+
+class BatchProcessor:
+    """
+    Submit many LLM requests as one provider batch, wait for it to finish and
+    collect the response text of each request.
+
+    Request bodies are the same JSON bodies sent to /v1/chat/completions
+    (OpenAI) or /v1/messages (Claude), keyed by a custom id made of
+    letters, digits, "_" and "-".
+    """
+
+    def __init__(self, provider: str, api_key: str, poll_interval: float = BATCH_POLL_INTERVAL):
+        self.provider = provider
+        self.api_key = api_key
+        self.poll_interval = poll_interval
+
+    def run(self, bodies: Dict[str, Dict]) -> Dict[str, Optional[str]]:
+        """custom id -> request body in; custom id -> response text out (None where that request failed)"""
+        if not bodies:
+            return {}
+        batch_id = self.submit(bodies)
+        logger.info("Submitted %s batch %s (%d requests)", self.provider, batch_id, len(bodies))
+        batch = self.wait(batch_id)
+        results = self.results(batch)
+        return {custom_id: results.get(custom_id) for custom_id in bodies}
+
+    def submit(self, bodies: Dict[str, Dict]) -> str:
+        """Create the batch and return its id"""
+        if self.provider == "claude":
+            response = request_with_retry(
+                "POST", ANTHROPIC_BATCHES_URL,
+                headers=self._headers(),
+                data=orjson.dumps({
+                    "requests": [{"custom_id": custom_id, "params": body} for custom_id, body in bodies.items()]
+                }),
+                timeout=120
+            )
+            response.raise_for_status()
+            return response.json()["id"]
+
+        # OpenAI takes the requests as an uploaded JSONL file
+        jsonl = b"\n".join(
+            orjson.dumps({"custom_id": custom_id, "method": "POST", "url": "/v1/chat/completions", "body": body})
+            for custom_id, body in bodies.items()
+        )
+        response = request_with_retry(
+            "POST", f"{OPENAI_API_URL}/files",
+            headers={"Authorization": f"Bearer {self.api_key}"},
+            data={"purpose": "batch"},
+            files={"file": ("batch.jsonl", jsonl, "application/jsonl")},
+            timeout=120
+        )
+        response.raise_for_status()
+
+        response = request_with_retry(
+            "POST", f"{OPENAI_API_URL}/batches",
+            headers=self._headers(),
+            data=orjson.dumps({
+                "input_file_id": response.json()["id"],
+                "endpoint": "/v1/chat/completions",
+                "completion_window": "24h"
+            }),
+            timeout=60
+        )
+        response.raise_for_status()
+        return response.json()["id"]
+
+    def wait(self, batch_id: str) -> Dict:
+        """Poll until the batch has finished processing; returns the final batch object"""
+        if self.provider == "claude":
+            url = f"{ANTHROPIC_BATCHES_URL}/{batch_id}"
+        else:
+            url = f"{OPENAI_API_URL}/batches/{batch_id}"
+
+        deadline = time.monotonic() + BATCH_MAX_WAIT
+        while True:
+            response = request_with_retry("GET", url, headers=self._headers(), timeout=60)
+            response.raise_for_status()
+            batch = response.json()
+
+            if self.provider == "claude":
+                if batch.get("processing_status") == "ended":
+                    return batch
+            elif batch.get("status") in ("completed", "failed", "expired", "cancelled"):
+                return batch
+
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Batch {batch_id} did not finish in time")
+            time.sleep(self.poll_interval)
+
+    def results(self, batch: Dict) -> Dict[str, str]:
+        """custom id -> response text for the requests that succeeded"""
+        if self.provider == "claude":
+            if not batch.get("results_url"):
+                raise Exception(f"Batch {batch.get('id')} has no results")
+            response = request_with_retry("GET", batch["results_url"], headers=self._headers(), timeout=300)
+        else:
+            # Expired batches still return whatever finished in time
+            if not batch.get("output_file_id"):
+                raise Exception(f"Batch {batch.get('id')} {batch.get('status')} without output")
+            response = request_with_retry(
+                "GET", f"{OPENAI_API_URL}/files/{batch['output_file_id']}/content",
+                headers=self._headers(), timeout=300
+            )
+        response.raise_for_status()
+
+        texts = {}
+        for line in response.content.splitlines():
+            if not line.strip():
+                continue
+            entry = orjson.loads(line)
+            text = self._entry_text(entry)
+            if text is None:
+                logger.warning("Batch request %s failed: %s", entry.get("custom_id"), entry.get("error") or entry.get("result"))
+            else:
+                texts[entry["custom_id"]] = text
+        return texts
+
+    def _entry_text(self, entry: Dict) -> Optional[str]:
+        """Response text of one results line, or None if that request failed"""
+        if self.provider == "claude":
+            result = entry.get("result") or {}
+            if result.get("type") != "succeeded":
+                return None
+            return "".join(
+                block.get("text", "") for block in result["message"].get("content", [])
+                if block.get("type") == "text"
+            )
+
+        response = entry.get("response") or {}
+        if entry.get("error") or response.get("status_code") != 200:
+            return None
+        return response["body"]["choices"][0]["message"]["content"]
+
+    def _headers(self) -> Dict[str, str]:
+        if self.provider == "claude":
+            return {
+                "x-api-key": self.api_key,
+                "anthropic-version": "2023-06-01",
+                "Content-Type": "application/json"
+            }
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
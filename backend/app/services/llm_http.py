@@ -0,0 +1,180 @@
+"""
+HTTP helpers for LLM provider calls - retry with backoff on throttling,
+shared async client for concurrent and streamed calls
+"""
+import asyncio
+import logging
+import random
+import time
+import weakref
+import requests
+from requests.adapters import HTTPAdapter
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from typing import Optional
+from app.config import LLM_MAX_RETRIES, LLM_RETRY_MAX_WAIT, LLM_MAX_CONNECTIONS
+
+logger = logging.getLogger(__name__)
+
+# Status codes worth retrying: throttling, overload and transient server errors
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504, 529}
+
+
+def post_with_retry(url: str, **kwargs) -> requests.Response:
+    """
+    requests.post with up to LLM_MAX_RETRIES retries on 429/5xx and connection errors.
+    Waits for the provider's Retry-After when given, otherwise exponential backoff
+    with full jitter (1s, 2s, 4s... capped at LLM_RETRY_MAX_WAIT).
+    The final response is returned as-is, so callers still raise_for_status().
+    """
+    return request_with_retry("POST", url, **kwargs)
+
+
+def request_with_retry(method: str, url: str, **kwargs) -> requests.Response:
+    """post_with_retry for any HTTP method"""
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        last_attempt = attempt == LLM_MAX_RETRIES
+        try:
+            response = get_session().request(method, url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if last_attempt:
+                raise
+            wait = _backoff(attempt)
+            logger.warning("LLM request to %s failed (%s), retrying in %.1fs", url, e, wait)
+            time.sleep(wait)
+            continue
+
+        if response.status_code not in RETRY_STATUS_CODES or last_attempt:
+            return response
+
+        wait = _retry_wait(response, attempt)
+        response.close()
+        logger.warning("LLM request to %s returned %d, retrying in %.1fs", url, response.status_code, wait)
+        time.sleep(wait)
+
+
+async def apost_with_retry(client, url: str, **kwargs):
+    """Async post_with_retry for an httpx.AsyncClient (same retry policy)"""
+    import httpx
+
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        last_attempt = attempt == LLM_MAX_RETRIES
+        try:
+            response = await client.post(url, **kwargs)
+        except (httpx.ConnectError, httpx.TimeoutException) as e:
+            if last_attempt:
+                raise
+            wait = _backoff(attempt)
+            logger.warning("LLM request to %s failed (%s), retrying in %.1fs", url, e, wait)
+            await asyncio.sleep(wait)
+            continue
+
+        if response.status_code not in RETRY_STATUS_CODES or last_attempt:
+            return response
+
+        wait = _retry_wait(response, attempt)
+        await response.aclose()
+        logger.warning("LLM request to %s returned %d, retrying in %.1fs", url, response.status_code, wait)
+        await asyncio.sleep(wait)
+
+
+@asynccontextmanager
+async def astream_with_retry(client, url: str, **kwargs):
+    """
+    Streaming POST on an httpx.AsyncClient. Opening the stream follows the
+    post_with_retry policy; once the body starts arriving there are no retries.
+    """
+    import httpx
+
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        last_attempt = attempt == LLM_MAX_RETRIES
+        try:
+            response = await client.send(client.build_request("POST", url, **kwargs), stream=True)
+        except (httpx.ConnectError, httpx.TimeoutException) as e:
+            if last_attempt:
+                raise
+            wait = _backoff(attempt)
+            logger.warning("LLM request to %s failed (%s), retrying in %.1fs", url, e, wait)
+            await asyncio.sleep(wait)
+            continue
+
+        if response.status_code not in RETRY_STATUS_CODES or last_attempt:
+            break
+
+        wait = _retry_wait(response, attempt)
+        await response.aclose()
+        logger.warning("LLM request to %s returned %d, retrying in %.1fs", url, response.status_code, wait)
+        await asyncio.sleep(wait)
+
+    try:
+        yield response
+    finally:
+        await response.aclose()
+
+
+_session = None
+# httpx clients are tied to the event loop they were created on - one per loop
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_session() -> requests.Session:
+    """
+    Shared requests.Session for blocking LLM calls (lazy singleton) - keeps
+    connections alive across calls instead of a new TLS handshake per request
+    """
+    global _session
+    if _session is None:
+        session = requests.Session()
+        session.mount("https://", HTTPAdapter(pool_connections=20, pool_maxsize=LLM_MAX_CONNECTIONS))
+        _session = session
+    return _session
+
+
+def get_async_client():
+    """
+    Shared httpx.AsyncClient for LLM calls (pooled connections), created lazily
+    for each running event loop, since its connections belong to that loop
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        import httpx
+        client = httpx.AsyncClient(
+            timeout=120,
+            limits=httpx.Limits(max_connections=LLM_MAX_CONNECTIONS)
+        )
+        _async_clients[loop] = client
+    return client
+
+
+async def aclose_async_client():
+    """Close the running loop's LLM client (app shutdown)"""
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+def _retry_wait(response, attempt: int) -> float:
+    """Retry-After if the provider sent one, otherwise backoff"""
+    wait = _retry_after(response)
+    return _backoff(attempt) if wait is None else wait
+
+
+def _backoff(attempt: int) -> float:
+    """Exponential backoff with full jitter"""
+    return random.uniform(0, min(LLM_RETRY_MAX_WAIT, 2 ** attempt))
+
+
+def _retry_after(response) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date), if present"""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+    return min(max(seconds, 0.0), LLM_RETRY_MAX_WAIT)
@@ -2,207 +2,47 @@
 Dynamic Outline/Brief Service using Claude or OpenAI
 Generates intelligent, SERP-driven content briefs
 """
+import re
 import json
-import requests
-from typing import Dict, List, Optional
-from app.config import OPENAI_API_KEY, ANTHROPIC_API_KEY, LLM_PROVIDER
-
-
-class OutlineService:
-    """
-    Service for generating dynamic, SERP-driven content briefs using LLM.
-    Supports both Claude (Anthropic) and OpenAI.
-    """
-
-    def __init__(self):
-        self.openai_api_key = OPENAI_API_KEY
-        self.anthropic_api_key = ANTHROPIC_API_KEY
-        self.provider = LLM_PROVIDER
-
-        # Determine which provider to use
-        if self.provider == "claude" and self.anthropic_api_key:
-            self.active_provider = "claude"
-        elif self.openai_api_key:
-            self.active_provider = "openai"
-        elif self.anthropic_api_key:
-            self.active_provider = "claude"
-        else:
-            self.active_provider = None
-
-    def generate_outline(
-        self,
-        keyword: str,
-        serp_results: List[Dict],
-        serp_medians: Dict[str, float],
-        intent_analysis: Dict,
-        content_type: str = "new",
-        serp_features: Optional[Dict] = None,
-        existing_content: Optional[Dict] = None
-    ) -> Dict:
-        """
-        Generate dynamic content brief using LLM based on SERP analysis
-
-        Args:
-            keyword: Search keyword
-            serp_results: Enriched SERP results with content
-            serp_medians: SERP median values
-            intent_analysis: Intent analysis from IntentService
-            content_type: "new" or "existing"
-            serp_features: Extracted SERP features (PAA, related, etc.)
-            existing_content: For existing content mode, the analyzed content data
-
-        Returns:
-            Dictionary with dynamic brief structure
-        """
-        if not self.active_provider:
-            raise Exception("No LLM API key configured. Please set ANTHROPIC_API_KEY or OPENAI_API_KEY.")
-
-        # Prepare comprehensive SERP data for LLM
-        serp_context = self._prepare_comprehensive_serp_context(
-            keyword, serp_results, serp_medians, serp_features
-        )
-
-        if content_type == "existing":
-            return self._generate_optimization_plan(keyword, serp_context, serp_medians, existing_content, serp_features)
-        else:
-            return self._generate_content_brief(keyword, serp_context, serp_medians, intent_analysis, serp_features)
-
-    def _prepare_comprehensive_serp_context(
-        self,
-        keyword: str,
-        serp_results: List[Dict],
-        serp_medians: Dict[str, float],
-        serp_features: Optional[Dict]
-    ) -> str:
-        """Prepare comprehensive SERP context including all features"""
-        lines = [
-            f"# SERP Analysis for: {keyword}",
-            "",
-            "## SERP Metrics (Top 10 Medians)",
-            f"- Median Word Count: {serp_medians.get('word_count', 0):.0f}",
-            f"- Median Domain Trust: {serp_medians.get('dt', 0):.1f}",
-            f"- Median Referring Domains: {serp_medians.get('referring_domains', 0):.0f}",
-            f"- Median Flesch Reading Ease: {serp_medians.get('flesch_reading_ease_score', 0):.1f}",
-            f"- Median Schema Types: {serp_medians.get('total_schema_types', 0):.0f}",
-            "",
-        ]
-
-        # SERP Features Present
-        if serp_features:
-            lines.append("## SERP Features Present")
-            features_present = serp_features.get("serp_features_present", [])
-            if features_present:
-                for feature in features_present:
-                    lines.append(f"- {feature.replace('_', ' ').title()}")
-            else:
-                lines.append("- Standard organic results only")
-            lines.append("")
-
-            # Featured Snippet
-            if serp_features.get("featured_snippet"):
-                fs = serp_features["featured_snippet"]
-                lines.append("## Featured Snippet")
-                lines.append(f"**Type:** {fs.get('type', 'paragraph')}")
-                if fs.get("title"):
-                    lines.append(f"**Title:** {fs.get('title')}")
-                if fs.get("snippet"):
-                    lines.append(f"**Content:** {fs.get('snippet')[:500]}...")
-                if fs.get("list"):
-                    lines.append("**List Items:**")
-                    for item in fs.get("list", [])[:5]:
-                        lines.append(f"  - {item}")
-                lines.append("")
-
-            # People Also Ask
-            if serp_features.get("people_also_ask"):
-                lines.append("## People Also Ask (PAA)")
-                lines.append("These questions MUST be addressed in your content:")
-                for paa in serp_features["people_also_ask"]:
-                    question = paa.get("question", "")
-                    snippet = paa.get("snippet", "")[:200]
-                    if question:
-                        lines.append(f"- **Q:** {question}")
-                        if snippet:
-                            lines.append(f"  **A:** {snippet}...")
-                lines.append("")
-
-            # Related Searches
-            if serp_features.get("related_searches"):
-                lines.append("## Related Searches")
-                lines.append("These topics indicate related user intent:")
-                for rs in serp_features["related_searches"][:10]:
-                    lines.append(f"- {rs}")
-                lines.append("")
-
-            # Knowledge Panel
-            if serp_features.get("knowledge_panel"):
-                kp = serp_features["knowledge_panel"]
-                lines.append("## Knowledge Panel")
-                if kp.get("title"):
-                    lines.append(f"**Entity:** {kp.get('title')}")
-                if kp.get("type"):
-                    lines.append(f"**Type:** {kp.get('type')}")
-                if kp.get("description"):
-                    lines.append(f"**Description:** {kp.get('description')[:300]}...")
-                if kp.get("people_also_search_for"):
-                    lines.append("**Related entities:**")
-                    for entity in kp.get("people_also_search_for", [])[:5]:
-                        lines.append(f"  - {entity}")
-                lines.append("")
-
-            # Local Pack
-            if serp_features.get("local_pack"):
-                lines.append("## Local Pack Present")
-                lines.append("This indicates local intent - consider local optimization.")
-                lines.append("")
-
-            # Video Results
-            if serp_features.get("video_results"):
-                lines.append("## Video Results")
-                lines.append("Video content is ranking - consider video content or embedding.")
-                for v in serp_features["video_results"][:3]:
-                    lines.append(f"- {v.get('title', '')} ({v.get('platform', '')})")
-                lines.append("")
-
-        # Top Ranking Results
-        lines.append("## Top 10 Ranking Results")
-        for i, result in enumerate(serp_results[:10], 1):
-            title = result.get("title", "")
-            url = result.get("url", result.get("link", ""))
-            snippet = result.get("snippet", "")[:200]
-            wc = result.get("word_count", 0)
-            dt = result.get("dt", 0)
-
-            lines.append(f"### {i}. {title}")
-            lines.append(f"**URL:** {url}")
-            lines.append(f"**Snippet:** {snippet}...")
-            lines.append(f"**Word Count:** {wc} | **Domain Trust:** {dt:.1f}")
-            lines.append("")
-
-        return "\n".join(lines)
-
-    def _generate_content_brief(
-        self,
-        keyword: str,
-        serp_context: str,
-        serp_medians: Dict[str, float],
-        intent_analysis: Dict,
-        serp_features: Optional[Dict]
-    ) -> Dict:
-        """Generate comprehensive content brief using Claude or OpenAI"""
-
-        # Build PAA questions list for explicit inclusion
-        paa_questions = []
-        if serp_features and serp_features.get("people_also_ask"):
-            paa_questions = [p.get("question", "") for p in serp_features["people_also_ask"] if p.get("question")]
-
-        related_searches = []
-        if serp_features and serp_features.get("related_searches"):
-            related_searches = serp_features["related_searches"][:10]
-
-        prompt = f"""You are a senior SEO content strategist. Analyze the following SERP data and create a comprehensive content brief that will help the content rank in the top 10.
-
-## IMPORTANT: SERVICE SCOPE CONSTRAINTS
+import io
+import textwrap
+import asyncio
+import concurrent.futures
+import hashlib
+import logging
+import threading
+import weakref
+import orjson
+from collections import OrderedDict
+from functools import lru_cache
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+from app.config import (
+    OPENAI_API_KEY, ANTHROPIC_API_KEY, LLM_PROVIDER,
+    SERP_CONTEXT_COMPRESSION, SERP_CONTEXT_COMPRESSION_RATE, SERP_CONTEXT_COMPRESSION_MODEL,
+    SERP_CONTEXT_TOKEN_BUDGET, LLM_MAX_RETRIES, ANTHROPIC_MAX_CONCURRENCY, OPENAI_MAX_CONCURRENCY,
+    BRIEF_CACHE_ENABLED, CLAUDE_MODEL, CLAUDE_FAST_MODEL, CLAUDE_FAST_MODEL_MIN_TOKENS,
+    OPENAI_MODEL, LLM_MODEL_OVERRIDE, LLM_COST_MODE, PLAN_CACHE_ENABLED
+)
+from app.services.llm_http import post_with_retry, apost_with_retry, astream_with_retry, get_async_client
+from app.services.response_cache import get_response_cache, response_cache_key
+from app.services.llm_batch import BatchProcessor, BATCH_POLL_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+try:
+    import anthropic
+except ImportError:
+    anthropic = None
+
+# Structural tokens kept verbatim when compressing SERP context so the LLM still sees the layout
+COMPRESSION_FORCE_TOKENS = ["\n", "#", ":", "Q:", "A:", "-"]
+
+SERVICE_SCOPE_CONSTRAINTS = """## IMPORTANT: SERVICE SCOPE CONSTRAINTS
 All recommendations MUST be limited to services we actually provide. DO NOT recommend:
 - Video creation or video marketing
 - Link building or backlink acquisition
@@ -218,16 +58,9 @@ ONLY recommend actions within these service areas:
 - Semantic Search Optimization (entity coverage, topical authority, NLP optimization)
 - Local SEO / Local Listings (Google Business Profile, local citations)
 - Digital PR (press releases, news coverage, brand mentions)
-- Data Analysis (analytics, reporting, competitor analysis)
-
-{serp_context}
+- Data Analysis (analytics, reporting, competitor analysis)"""
 
-## Intent Analysis
-- **TARGET Intent Type:** {intent_analysis.get('intent_type', 'informational')} {"(USER SPECIFIED - build content for THIS intent)" if intent_analysis.get('user_override') else "(detected from SERP)"}
-- **Content Format:** {intent_analysis.get('content_format', 'article')}
-- **Reasoning:** {intent_analysis.get('reasoning', '')}
-
-CRITICAL INSTRUCTION - PAGE FORMAT BY INTENT:
+PAGE_FORMAT_BY_INTENT = """CRITICAL INSTRUCTION - PAGE FORMAT BY INTENT:
 The TARGET intent type OVERRIDES what the SERP shows. Even if the SERP is full of listicles/comparisons, you MUST create content matching the TARGET intent:
 
 **TRANSACTIONAL** (Service/Product Page):
@@ -249,15 +82,16 @@ The TARGET intent type OVERRIDES what the SERP shows. Even if the SERP is full o
 
 **NAVIGATIONAL** (Brand/Direct Answer):
 - Direct answers, brand-focused content
-- Contact information, location, credentials
+- Contact information, location, credentials"""
 
-## Your Task
+# Filled via str.format: word_count_instruction, readability_instruction
+CONTENT_BRIEF_TASK = """## Your Task
 
 Create a detailed content brief that addresses:
 
 1. **Content Strategy Summary**
-   - Recommended word count: Use EXACTLY the SERP median word count of {serp_medians.get('word_count', 1500):.0f} words
-   - Target readability: Use EXACTLY the SERP median Flesch score of {serp_medians.get('flesch_reading_ease_score', 60):.0f} (give range ±5)
+   - Recommended word count: {word_count_instruction}
+   - Target readability: {readability_instruction}
    - Schema markup to implement
    - Key differentiators from existing content
 
@@ -290,16 +124,16 @@ Create a detailed content brief that addresses:
 7. **Competitive Differentiation**
    - What competitors are missing
    - Unique angles to explore
-   - How to make content more comprehensive/useful
+   - How to make content more comprehensive/useful"""
 
-Return the brief as JSON with this exact structure:
-{{
+# Filled via str.format: target_word_count, min_word_count, readability_target
+CONTENT_BRIEF_JSON_STRUCTURE = """{{
   "title_recommendation": "<optimized H1 title>",
   "meta_description": "<compelling meta description under 160 chars>",
   "content_strategy": {{
-    "target_word_count": {serp_medians.get('word_count', 1500):.0f},
-    "min_word_count": {serp_medians.get('word_count', 1500) * 0.9:.0f},
-    "readability_target": "{max(serp_medians.get('flesch_reading_ease_score', 60) - 5, 0):.0f}-{min(serp_medians.get('flesch_reading_ease_score', 60) + 5, 100):.0f}",
+    "target_word_count": {target_word_count},
+    "min_word_count": {min_word_count},
+    "readability_target": "{readability_target}",
     "schema_types": ["<type1>", "<type2>"],
     "key_differentiators": ["<diff1>", "<diff2>"]
   }},
@@ -344,417 +178,2029 @@ Return the brief as JSON with this exact structure:
     "unique_angles": ["<angle1>", "<angle2>"],
     "comprehensiveness_improvements": ["<improvement1>"]
   }}
-}}
+}}"""
 
-Return ONLY valid JSON, no markdown code blocks or other formatting."""
+# Static prefix of every content brief prompt, built once at import. It is sent
+# ahead of the per-keyword data so providers can reuse the cached prefix
+# (Anthropic cache_control / OpenAI automatic prefix caching).
+CONTENT_BRIEF_INSTRUCTIONS = f"""You are a senior SEO content strategist. Analyze the SERP data provided after these instructions and create a comprehensive content brief that will help the content rank in the top 10.
 
-        try:
-            if self.active_provider == "claude":
-                response_text = self._call_claude(prompt)
-            else:
-                response_text = self._call_openai(prompt)
+{SERVICE_SCOPE_CONSTRAINTS}
 
-            # Parse JSON response
-            brief_data = self._parse_json_response(response_text)
+{PAGE_FORMAT_BY_INTENT}
 
-            # Format into our standard response
-            return self._format_brief_response(keyword, brief_data, serp_medians, intent_analysis, serp_features)
+{CONTENT_BRIEF_TASK.format(
+    word_count_instruction="Use EXACTLY the target_word_count from Brief Targets (the SERP median word count)",
+    readability_instruction="Use EXACTLY the readability_target from Brief Targets (the SERP median Flesch score ±5)"
+)}
 
-        except Exception as e:
-            print(f"Error generating brief: {e}")
-            import traceback
-            traceback.print_exc()
-            raise Exception(f"Error generating content brief: {str(e)}")
+Return the brief as JSON with this exact structure:
+{CONTENT_BRIEF_JSON_STRUCTURE.format(
+    target_word_count="<target_word_count>",
+    min_word_count="<min_word_count>",
+    readability_target="<readability_target>"
+)}"""
+
+# Static part of every optimization plan prompt (sent as the cacheable prefix)
+OPTIMIZATION_PLAN_JSON_STRUCTURE = """{
+  "title_recommendation": "<optimized H1>",
+  "meta_description": "<optimized meta under 160 chars>",
+  "content_strategy": {
+    "word_count_current": <word_count_current from Plan Targets>,
+    "word_count_target": <word_count_target from Plan Targets>,
+    "word_count_action": "<INCREASE/DECREASE/MAINTAIN>",
+    "word_count_delta": <number to add or remove>,
+    "readability_current": <readability_current from Plan Targets>,
+    "readability_target": "<readability_target from Plan Targets>",
+    "readability_action": "<SIMPLIFY/ADD_DEPTH/MAINTAIN>",
+    "schema_types": ["<type1>", "<type2>"]
+  },
+  "content_annotations": [
+    {
+      "original_text": "<current text excerpt>",
+      "improved_text": "<suggested replacement>",
+      "reason": "<why this helps>",
+      "priority": "<high/medium/low>"
+    }
+  ],
+  "outline": {
+    "sections": [
+      {
+        "h2": "<section heading>",
+        "status": "<KEEP/MODIFY/ADD/REMOVE>",
+        "description": "<what to do with this section>",
+        "word_count_target": <number>,
+        "h3_subsections": ["<sub1>", "<sub2>"],
+        "key_points": ["<point1>", "<point2>"]
+      }
+    ]
+  },
+  "semantic_coverage": {
+    "must_cover_topics": ["<topic1>", "<topic2>"],
+    "missing_entities": ["<entity1>", "<entity2>"],
+    "topics_to_strengthen": ["<topic1>", "<topic2>"]
+  },
+  "serp_optimization": {
+    "featured_snippet_strategy": "<how to win it>",
+    "faq_schema_questions": ["<q1>", "<q2>"],
+    "paa_questions_to_answer": ["<q1>", "<q2>"]
+  },
+  "competitive_gaps": {
+    "missing_from_page": ["<gap1>", "<gap2>"],
+    "strengths_to_keep": ["<strength1>", "<strength2>"],
+    "quick_wins": ["<win1>", "<win2>"]
+  }
+}"""
 
-    def _call_claude(self, prompt: str) -> str:
-        """Call Claude API"""
-        try:
-            import anthropic
-            client = anthropic.Anthropic(api_key=self.anthropic_api_key)
-
-            message = client.messages.create(
-                model="claude-sonnet-4-20250514",
-                max_tokens=4096,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ]
-            )
+OPTIMIZATION_PLAN_INSTRUCTIONS = f"""You are a senior SEO content strategist. Analyze the EXISTING content described after these instructions and create a detailed optimization plan to improve rankings.
 
-            return message.content[0].text
+## CRITICAL: DO NOT RECOMMEND ELEMENTS THAT ALREADY EXIST
+The elements listed under "Existing Elements Detected" have been DETECTED on the page. DO NOT recommend adding these - mark them as MAINTAIN instead.
 
-        except ImportError:
-            # Fallback to requests if anthropic not installed
-            response = requests.post(
-                "https://api.anthropic.com/v1/messages",
-                headers={
-                    "x-api-key": self.anthropic_api_key,
-                    "anthropic-version": "2023-06-01",
-                    "Content-Type": "application/json"
-                },
-                json={
-                    "model": "claude-sonnet-4-20250514",
-                    "max_tokens": 4096,
-                    "messages": [
-                        {"role": "user", "content": prompt}
-                    ]
-                },
-                timeout=120
-            )
-            response.raise_for_status()
-            result = response.json()
-            return result["content"][0]["text"]
+If an element already exists on the page (like FAQ section, pricing, case studies, statistics, testimonials, etc.), your recommendation should be "MAINTAIN" - not "ADD". Only recommend adding elements that are genuinely MISSING from the current page.
 
-    def _call_openai(self, prompt: str) -> str:
-        """Call OpenAI API"""
-        response = requests.post(
-            "https://api.openai.com/v1/chat/completions",
-            headers={
-                "Authorization": f"Bearer {self.openai_api_key}",
-                "Content-Type": "application/json"
-            },
-            json={
-                "model": "gpt-4o-mini",
-                "messages": [
-                    {"role": "system", "content": "You are an expert SEO content strategist. Always return valid JSON."},
-                    {"role": "user", "content": prompt}
-                ],
-                "temperature": 0.3,
-                "max_tokens": 4000
-            },
-            timeout=120
-        )
-        response.raise_for_status()
-        result = response.json()
-        return result["choices"][0]["message"]["content"]
+{SERVICE_SCOPE_CONSTRAINTS}
 
-    def _parse_json_response(self, response_text: str) -> Dict:
-        """Parse JSON from LLM response"""
-        import re
+## YOUR TASK
 
-        # Try direct parse
-        try:
-            return json.loads(response_text)
-        except:
-            pass
+Create a comprehensive optimization brief for this EXISTING content that includes:
 
-        # Try to extract from markdown code blocks
-        json_match = re.search(r'```(?:json)?\s*(\{.*?\})\s*```', response_text, re.DOTALL)
-        if json_match:
-            return json.loads(json_match.group(1))
+1. **Recommended Title** - An optimized H1 that will perform better for this keyword
 
-        # Try to find JSON object
-        json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-        if json_match:
-            return json.loads(json_match.group(0))
+2. **Content Strategy Analysis**
+   - Word count: word_count_current vs word_count_target (Plan Targets) with action (increase/decrease/maintain)
+   - Readability: readability_current vs readability_target (Plan Targets) with specific suggestions
+   - Schema types needed
 
-        raise ValueError("Could not parse JSON from LLM response")
+3. **Annotated Content Improvements**
+   - List specific text changes needed with the format:
+     - ORIGINAL: "current text excerpt"
+     - IMPROVED: "suggested replacement text"
+     - REASON: "why this change helps SEO"
+   - Include 5-10 specific text improvements
 
-    def _format_brief_response(
-        self,
-        keyword: str,
-        brief_data: Dict,
-        serp_medians: Dict[str, float],
-        intent_analysis: Dict,
-        serp_features: Optional[Dict]
-    ) -> Dict:
-        """Format LLM response into our standard brief structure"""
+4. **Content Outline** - What the optimized page structure should look like:
+   - H2 sections (mark existing sections to KEEP, REMOVE, or MODIFY)
+   - NEW sections to ADD
+   - Target word count per section
 
-        # Build sections from outline
-        sections = []
-        for section in brief_data.get("outline", {}).get("sections", []):
-            sections.append({
-                "heading": section.get("h2", ""),
-                "h3_subsections": section.get("h3_subsections", []),
-                "topics": section.get("content_elements", []),
-                "word_count_target": section.get("word_count_target", 0),
-                "entities": [],
-                "semantic_focus": section.get("description", ""),
-                "key_points": section.get("key_points", [])
-            })
+5. **Semantic Coverage** - Topics and entities to add/improve
 
-        return {
-            "keyword": keyword,
-            "intent_analysis": intent_analysis,
-            "title_recommendation": brief_data.get("title_recommendation", f"Complete Guide to {keyword}"),
-            "meta_description": brief_data.get("meta_description", ""),
-            "content_strategy": brief_data.get("content_strategy", {}),
-            "search_intent": brief_data.get("search_intent", {}),
-            "questions_to_answer": brief_data.get("questions_to_answer", []),
-            "serp_patterns": {
-                "content_strategy": brief_data.get("content_strategy", {}),
-                "gap_analysis": brief_data.get("competitive_gaps", {})
-            },
-            "sections": sections,
-            "word_count_target": brief_data.get("content_strategy", {}).get("target_word_count", int(serp_medians.get("word_count", 2000) * 1.15)),
-            "topics": brief_data.get("semantic_coverage", {}).get("must_cover_topics", []),
-            "related_topics": brief_data.get("semantic_coverage", {}).get("related_topics", []),
-            "entities": brief_data.get("semantic_coverage", {}).get("entities_to_mention", []),
-            "structure_type": intent_analysis.get("content_format", "article"),
-            "structure_reasoning": brief_data.get("competitive_gaps", {}).get("unique_angles", []),
-            "serp_optimization": brief_data.get("serp_optimization", {}),
-            "competitive_gaps": brief_data.get("competitive_gaps", {}),
-            # Include raw SERP features for frontend display
-            "serp_features": serp_features or {}
-        }
+6. **SERP Feature Optimization** - How to win featured snippets, PAA, etc.
 
-    def _generate_optimization_plan(
-        self,
-        keyword: str,
-        serp_context: str,
-        serp_medians: Dict[str, float],
-        existing_content: Optional[Dict] = None,
-        serp_features: Optional[Dict] = None
-    ) -> Dict:
-        """Generate comprehensive optimization plan for existing content"""
+7. **Competitive Gaps** - What competitors do that this page doesn't
 
-        # If we don't have existing content data, return basic structure
-        if not existing_content:
-            return {
-                "keyword": keyword,
-                "optimization_mode": True,
-                "serp_analysis": serp_context,
-                "sections": [],
-                "word_count_target": int(serp_medians.get("word_count", 1500))
-            }
+Return as JSON:
+{OPTIMIZATION_PLAN_JSON_STRUCTURE}"""
 
-        # Build comprehensive optimization prompt
-        current_wc = existing_content.get("word_count", 0)
-        target_wc = serp_medians.get("word_count", 1500)
-        current_flesch = existing_content.get("flesch_reading_ease_score", 50)
-        target_flesch = serp_medians.get("flesch_reading_ease_score", 60)
+# Per-keyword part of a brief prompt that follows the SERP context. Filled via
+# str.format_map: intent_type, intent_source, content_format, reasoning,
+# wc_target, wc_min, r_lo, r_hi
+BRIEF_TARGETS_TEMPLATE = """
 
-        # Word count strategy
-        if current_wc < target_wc * 0.8:
-            wc_strategy = f"INCREASE word count by {int(target_wc - current_wc)} words to match competitors"
-        elif current_wc > target_wc * 1.3:
-            wc_strategy = f"Consider TRIMMING content - you have {int(current_wc - target_wc)} more words than competitors"
-        else:
-            wc_strategy = "Word count is competitive - focus on quality over quantity"
+## Intent Analysis
+- **TARGET Intent Type:** {intent_type} {intent_source}
+- **Content Format:** {content_format}
+- **Reasoning:** {reasoning}
+
+## Brief Targets
+- target_word_count: {wc_target}
+- min_word_count: {wc_min}
+- readability_target: {r_lo}-{r_hi}"""
+
+# Per-page part of an optimization plan prompt (OPTIMIZATION_PLAN_INSTRUCTIONS is
+# the cached prefix). Filled via str.format_map
+OPTIMIZATION_PLAN_PAGE_TEMPLATE = """## Plan Targets
+- word_count_current: {wc_current}
+- word_count_target: {wc_target}
+- readability_current: {r_current} (Flesch)
+- readability_target: {r_lo}-{r_hi} (Flesch, SERP median ±5)
+
+## Existing Elements Detected (DO NOT recommend adding these - mark as MAINTAIN)
+{existing_elements}
 
-        # Readability strategy
-        if current_flesch < target_flesch - 10:
-            readability_strategy = f"SIMPLIFY content - current readability ({current_flesch:.0f}) is harder than competitors ({target_flesch:.0f}). Use shorter sentences and simpler words."
-        elif current_flesch > target_flesch + 10:
-            readability_strategy = f"Content may be TOO simple ({current_flesch:.0f} vs {target_flesch:.0f}). Consider adding more technical depth."
+{serp_context}
+
+## CURRENT PAGE ANALYSIS
+**URL:** {url}
+**Word Count Strategy:** {wc_strategy}
+**Readability Strategy:** {readability_strategy}
+
+**Current H2 Headings:**
+{h2_headings}
+
+**Current Page Content (excerpt):**
+{page_text}
+
+Return ONLY valid JSON, no markdown code blocks."""
+
+# Top-level keys of CONTENT_BRIEF_JSON_STRUCTURE and their JSON types. Briefs
+# are checked against this before formatting (see brief_schema_errors)
+BRIEF_SCHEMA = {
+    "title_recommendation": str,
+    "meta_description": str,
+    "content_strategy": dict,
+    "search_intent": dict,
+    "questions_to_answer": list,
+    "outline": dict,
+    "semantic_coverage": dict,
+    "serp_optimization": dict,
+    "competitive_gaps": dict,
+}
+_JSON_TYPE_NAMES = {str: "a string", dict: "an object", list: "an array"}
+
+# Appended to the original brief prompt when a response fails the schema check
+BRIEF_REPAIR_PROMPT = """
+
+## Correction
+Your previous response was:
+{previous}
+
+It does not match the required JSON structure: {errors}.
+Return the complete brief again with every key of the structure above. Return ONLY valid JSON, no markdown code blocks or other formatting."""
+
+# Fixed-shape SERP context sections (each ends with a blank separator line)
+SERP_MEDIANS_TEMPLATE = """## SERP Metrics (Top 10 Medians)
+- Median Word Count: %.0f
+- Median Domain Trust: %.1f
+- Median Referring Domains: %.0f
+- Median Flesch Reading Ease: %.1f
+- Median Schema Types: %.0f
+
+"""
+
+SERP_LOCAL_PACK_SECTION = """## Local Pack Present
+This indicates local intent - consider local optimization.
+
+"""
+
+# One "Top 10 Ranking Results" entry
+SERP_RESULT_TEMPLATE = """### {0}. {1}
+**URL:** {2}
+**Snippet:** {3}
+**Word Count:** {4} | **Domain Trust:** {5:.1f}
+
+"""
+
+# Max keywords packed into one batched brief request; fewer when the
+# provider's context window or output limit can't hold that many briefs
+OUTLINE_BATCH_SIZE = 5
+
+# In-flight LLM requests allowed per provider (sized to typical rate limits)
+LLM_CONCURRENCY = {"claude": ANTHROPIC_MAX_CONCURRENCY, "openai": OPENAI_MAX_CONCURRENCY}
+
+# Per-provider token limits used to size batches
+BRIEF_MAX_TOKENS = {"claude": 4096, "openai": 4000}        # output reserved per brief
+LLM_CONTEXT_TOKENS = {"claude": 200000, "openai": 128000}
+LLM_MAX_OUTPUT_TOKENS = {"claude": 64000, "openai": 16384}
+# Kept free between prompt + max_tokens and the context window (token counts are estimates)
+OUTPUT_SLACK_TOKENS = 256
+
+# Stands in for the user prompt in a request body serialized by PromptStreamer
+PROMPT_PLACEHOLDER = "\x00prompt\x00"
+# Prompt characters JSON-encoded per uploaded chunk
+PROMPT_STREAM_CHUNK_CHARS = 16384
+
+_JSON_DECODER = json.JSONDecoder()
+_PERCENTAGE_RE = re.compile(r'\d+%|\d+\s*percent')
+_SENTENCE_SPLIT_RE = re.compile(r'(?<=[.!?])\s+')
+_NON_WORD_RE = re.compile(r'\W+')
+
+# Character caps for free text quoted in prompts
+SNIPPET_CHARS = 200
+FEATURED_SNIPPET_CHARS = 500
+KNOWLEDGE_PANEL_CHARS = 300
+PAGE_EXCERPT_CHARS = 3000
+
+# SERP context sections, most important first. When the context exceeds
+# SERP_CONTEXT_TOKEN_BUDGET the highest-numbered sections are dropped first
+# (and within a priority, the later one - so tail results go from rank 10 up).
+# The "# SERP Analysis" header is never dropped.
+CONTEXT_PRIORITY_HEADER = -1
+CONTEXT_PRIORITY_PAA = 0
+CONTEXT_PRIORITY_MEDIANS = 1
+CONTEXT_PRIORITY_TOP_RESULTS = 2
+CONTEXT_PRIORITY_TAIL_RESULTS = 3
+CONTEXT_PRIORITY_FEATURES = 4
+CONTEXT_PRIORITY_RELATED = 5
+
+# Results ranked above this count as "top" results for budgeting
+CONTEXT_TOP_RESULTS = 3
+
+# Assembled SERP contexts, keyed on a hash of the inputs that feed them (LRU)
+SERP_CONTEXT_CACHE_SIZE = 1024
+_serp_context_cache: "OrderedDict[bytes, str]" = OrderedDict()
+_serp_context_cache_lock = threading.Lock()
+
+_prompt_compressor = None
+_anthropic_client = None
+_token_encoder = None
+# Per event loop, then per provider (an asyncio.Semaphore must not be shared across loops)
+_llm_semaphores = weakref.WeakKeyDictionary()
+_llm_thread_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+_llm_thread_semaphores_lock = threading.Lock()
+
+
+def get_prompt_compressor():
+    """
+    Get the LLMLingua-2 prompt compressor (lazy singleton).
+    Returns None if llmlingua is not installed or the model fails to load
+    (not retried - compression stays off for the life of the process).
+    """
+    global _prompt_compressor
+    if _prompt_compressor is None:
+        try:
+            from llmlingua import PromptCompressor
+            _prompt_compressor = PromptCompressor(
+                model_name=SERP_CONTEXT_COMPRESSION_MODEL,
+                use_llmlingua2=True,
+                device_map="cpu"
+            )
+        except ImportError:
+            logger.warning("llmlingua not installed, SERP context compression disabled")
+            _prompt_compressor = False
+        except Exception as e:
+            logger.warning("Could not load LLMLingua-2 model, SERP context compression disabled: %s", e)
+            _prompt_compressor = False
+    return _prompt_compressor or None
+
+
+def get_anthropic_client(api_key: str):
+    """
+    Shared anthropic.Anthropic client (lazy singleton, pooled connections).
+    Returns None if the anthropic package is not installed.
+    """
+    global _anthropic_client
+    if anthropic is None:
+        return None
+    if _anthropic_client is None or _anthropic_client.api_key != api_key:
+        # The SDK retries 429/5xx itself, honoring Retry-After
+        _anthropic_client = anthropic.Anthropic(api_key=api_key, max_retries=LLM_MAX_RETRIES)
+    return _anthropic_client
+
+
+def truncate(text: str, limit: int) -> str:
+    """text cut to at most limit characters (returned as-is if already short enough)"""
+    return text if len(text) <= limit else text[:limit]
+
+
+def shorten(text: str, width: int) -> str:
+    """text with whitespace collapsed, cut at a word boundary to at most width characters ("…" marks a cut)"""
+    if len(text) <= width:
+        return " ".join(text.split())
+    short = textwrap.shorten(text, width=width, placeholder="…")
+    if short == "…":
+        # First word alone is longer than width (long URL, unspaced script) - hard cut
+        short = " ".join(text.split())[:width - 1] + "…"
+    return short
+
+
+def dedupe_sentences(text: str, seen: set) -> str:
+    """
+    text without the sentences already in seen, compared on a blake2b hash of
+    their normalized first 80 characters; the remaining sentences are added to seen
+    """
+    kept = []
+    for sentence in _SENTENCE_SPLIT_RE.split(text):
+        normalized = _NON_WORD_RE.sub(" ", sentence).lower().strip()[:80]
+        if normalized:
+            digest = hashlib.blake2b(normalized.encode("utf-8"), digest_size=8).digest()
+            if digest in seen:
+                continue
+            seen.add(digest)
+        kept.append(sentence)
+    return " ".join(kept)
+
+
+def brief_schema_errors(brief_data) -> List[str]:
+    """Ways brief_data deviates from BRIEF_SCHEMA (empty if it conforms)"""
+    if not isinstance(brief_data, dict):
+        return ["the response must be a JSON object"]
+
+    errors = []
+    for key, expected in BRIEF_SCHEMA.items():
+        if key not in brief_data:
+            errors.append(f"missing {key}")
+        elif not isinstance(brief_data[key], expected):
+            errors.append(f"{key} must be {_JSON_TYPE_NAMES[expected]}")
+
+    outline = brief_data.get("outline")
+    if isinstance(outline, dict):
+        sections = outline.get("sections")
+        if not (isinstance(sections, list) and sections and all(isinstance(section, dict) for section in sections)):
+            errors.append("outline.sections must be a non-empty array of section objects")
+    return errors
+
+
+def get_llm_semaphore(provider: str) -> asyncio.Semaphore:
+    """Per-provider cap on concurrent async LLM calls (LLM_CONCURRENCY) on the running event loop"""
+    semaphores = _llm_semaphores.setdefault(asyncio.get_running_loop(), {})
+    if provider not in semaphores:
+        semaphores[provider] = asyncio.Semaphore(LLM_CONCURRENCY[provider])
+    return semaphores[provider]
+
+
+def get_llm_thread_semaphore(provider: str) -> threading.BoundedSemaphore:
+    """Per-provider cap on concurrent blocking LLM calls across worker threads (LLM_CONCURRENCY)"""
+    with _llm_thread_semaphores_lock:
+        if provider not in _llm_thread_semaphores:
+            _llm_thread_semaphores[provider] = threading.BoundedSemaphore(LLM_CONCURRENCY[provider])
+        return _llm_thread_semaphores[provider]
+
+
+def get_token_encoder():
+    """
+    Get the tiktoken encoding used for context budgeting (lazy singleton).
+    Returns None if tiktoken is not installed.
+    """
+    global _token_encoder
+    if _token_encoder is None:
+        if tiktoken is None:
+            logger.info("tiktoken not installed, estimating tokens as characters / 4")
+            _token_encoder = False
         else:
-            readability_strategy = "Readability aligns with competitor content"
+            try:
+                _token_encoder = tiktoken.encoding_for_model("gpt-4o-mini")
+            except Exception as e:
+                logger.warning("Error loading tiktoken encoding: %s", e)
+                _token_encoder = False
+    return _token_encoder or None
 
-        # Current headings
-        current_h2s = existing_content.get("h2_headings", [])
-        h2_context = "\n".join([f"- {h}" for h in current_h2s[:10]]) if current_h2s else "No H2 headings found"
 
-        # Page content for annotation
-        page_text = existing_content.get("page_text", "")[:5000]
+def count_tokens(text: str) -> int:
+    """Token count for text (tiktoken if available, else ~4 characters per token)"""
+    encoder = get_token_encoder()
+    if encoder:
+        return len(encoder.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
 
-        # Detect existing page elements to avoid redundant recommendations
-        existing_elements = self._detect_existing_page_elements(existing_content)
-        existing_elements_context = "\n".join([f"- {elem}" for elem in existing_elements]) if existing_elements else "None detected"
 
-        prompt = f"""You are a senior SEO content strategist. Analyze this EXISTING content and create a detailed optimization plan to improve rankings.
+@lru_cache(maxsize=16)
+def _count_prefix_tokens(prefix: str) -> int:
+    """count_tokens for the constant instruction prefixes, counted once each"""
+    return count_tokens(prefix)
 
-## CRITICAL: DO NOT RECOMMEND ELEMENTS THAT ALREADY EXIST
-The following elements have been DETECTED on the page. DO NOT recommend adding these - mark them as MAINTAIN instead:
-{existing_elements_context}
 
-If an element already exists on the page (like FAQ section, pricing, case studies, statistics, testimonials, etc.), your recommendation should be "MAINTAIN" - not "ADD". Only recommend adding elements that are genuinely MISSING from the current page.
+class PromptStreamer:
+    """
+    Async iterable over a JSON request body's bytes (httpx streaming upload).
+    The body holds PROMPT_PLACEHOLDER where the user prompt goes; the prompt
+    parts are encoded chunk by chunk in its place, so neither the joined prompt
+    nor the fully encoded body is ever built. Iterable again for retries.
+    """
 
-## IMPORTANT: SERVICE SCOPE CONSTRAINTS
-All recommendations MUST be limited to services we actually provide. DO NOT recommend:
-- Video creation or video marketing
-- Link building or backlink acquisition
-- Social media marketing
-- Paid advertising (PPC, display ads)
-- Influencer outreach
-- Guest posting
+    def __init__(self, body: Dict, prompt_parts: Sequence[str]):
+        self._head, self._tail = orjson.dumps(body).split(orjson.dumps(PROMPT_PLACEHOLDER)[1:-1])
+        self._parts = prompt_parts
 
-ONLY recommend actions within these service areas:
-- On-Page SEO (title tags, meta descriptions, header structure, keyword optimization)
-- Technical SEO (site speed, schema markup, crawlability, mobile optimization)
-- Content Strategy (new content, content updates, content gaps, topic clusters)
-- Semantic Search Optimization (entity coverage, topical authority, NLP optimization)
-- Local SEO / Local Listings (Google Business Profile, local citations)
-- Digital PR (press releases, news coverage, brand mentions)
-- Data Analysis (analytics, reporting, competitor analysis)
+    async def __aiter__(self):
+        yield self._head
+        for part in self._parts:
+            for start in range(0, len(part), PROMPT_STREAM_CHUNK_CHARS):
+                # JSON string escaping is per character, so chunks encode independently
+                yield orjson.dumps(part[start:start + PROMPT_STREAM_CHUNK_CHARS])[1:-1]
+        yield self._tail
 
-{serp_context}
 
-## CURRENT PAGE ANALYSIS
-**URL:** {existing_content.get('url', 'Unknown')}
-**Current Word Count:** {current_wc}
-**Target Word Count:** {target_wc:.0f}
-**Word Count Strategy:** {wc_strategy}
+class StreamingJSONObjectParser:
+    """
+    Incrementally parse the top-level members of a JSON object as it streams in.
+    feed() returns (key, value) pairs for each member whose value is complete,
+    so early fields (title, meta description) are usable before the object closes.
+    Values are delimited with a bracket/string-aware scan and decoded once.
+    """
 
-**Current Readability (Flesch):** {current_flesch:.0f}
-**Target Readability:** {target_flesch:.0f}
-**Readability Strategy:** {readability_strategy}
+    def __init__(self):
+        self._buf = ""
+        self._pos = 0
+        self._state = "start"  # start -> key -> colon -> value -> key ... -> done
+        self._key = None
+        self._value_start = None
+        self._scan_pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, chunk: str) -> List[Tuple[str, object]]:
+        self._buf += chunk
+        members = []
+        while self._state != "done" and self._step(members):
+            pass
+        return members
+
+    def _skip(self, chars: str) -> bool:
+        """Advance past any of chars; False if the buffer ran out"""
+        buf = self._buf
+        while self._pos < len(buf) and buf[self._pos] in chars:
+            self._pos += 1
+        return self._pos < len(buf)
+
+    def _step(self, members: List) -> bool:
+        """Consume one token; False when more input is needed"""
+        buf = self._buf
+
+        if self._state == "start":
+            start = buf.find("{", self._pos)
+            if start < 0:
+                self._pos = len(buf)
+                return False
+            self._pos = start + 1
+            self._state = "key"
+            return True
+
+        if self._state == "key":
+            if not self._skip(" \t\r\n,"):
+                return False
+            if buf[self._pos] != '"':
+                # "}" closes the object; anything else is malformed, leave it to the final parse
+                self._state = "done"
+                return False
+            end = self._pos + 1
+            while True:
+                end = buf.find('"', end)
+                if end < 0:
+                    return False
+                backslashes = 0
+                while buf[end - 1 - backslashes] == "\\":
+                    backslashes += 1
+                if backslashes % 2 == 0:
+                    break
+                end += 1
+            self._key = json.loads(buf[self._pos:end + 1])
+            self._pos = end + 1
+            self._state = "colon"
+            return True
+
+        if self._state == "colon":
+            if not self._skip(" \t\r\n"):
+                return False
+            if buf[self._pos] != ":":
+                self._state = "done"
+                return False
+            self._pos += 1
+            self._state = "value"
+            self._value_start = None
+            return True
+
+        # state == "value"
+        if self._value_start is None:
+            if not self._skip(" \t\r\n"):
+                return False
+            self._value_start = self._scan_pos = self._pos
+            self._depth = 0
+            self._in_string = False
+            self._escape = False
+
+        end = None
+        i = self._scan_pos
+        while i < len(buf):
+            c = buf[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if self._depth == 0:
+                        end = i + 1
+                        break
+            elif c == '"':
+                self._in_string = True
+            elif c in "{[":
+                self._depth += 1
+            elif c in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    end = i + 1
+                    break
+                if self._depth < 0:
+                    # Closing brace of the object right after a scalar value
+                    end = i
+                    break
+            elif c == "," and self._depth == 0:
+                end = i
+                break
+            i += 1
+
+        if end is None:
+            self._scan_pos = len(buf)
+            return False
 
-**Current H2 Headings:**
-{h2_context}
+        try:
+            members.append((self._key, json.loads(buf[self._value_start:end])))
+        except ValueError:
+            self._state = "done"
+            return False
+        self._pos = end
+        self._state = "key"
+        return True
 
-**Existing Elements Detected (DO NOT recommend adding these):**
-{existing_elements_context}
 
-**Current Page Content (excerpt):**
-{page_text[:3000]}
+class OutlineService:
+    """
+    Service for generating dynamic, SERP-driven content briefs using LLM.
+    Supports both Claude (Anthropic) and OpenAI.
+    """
 
-## YOUR TASK
+    def __init__(self):
+        self.openai_api_key = OPENAI_API_KEY
+        self.anthropic_api_key = ANTHROPIC_API_KEY
+        self.provider = LLM_PROVIDER
 
-Create a comprehensive optimization brief for this EXISTING content that includes:
+        # Determine which provider to use
+        if self.provider == "claude" and self.anthropic_api_key:
+            self.active_provider = "claude"
+        elif self.openai_api_key:
+            self.active_provider = "openai"
+        elif self.anthropic_api_key:
+            self.active_provider = "claude"
+        else:
+            self.active_provider = None
 
-1. **Recommended Title** - An optimized H1 that will perform better for this keyword
+        # LLM_COST_MODE=low_latency: race both providers for briefs (see _race_brief_json)
+        self.race_providers = LLM_COST_MODE == "low_latency" and bool(self.openai_api_key and self.anthropic_api_key)
 
-2. **Content Strategy Analysis**
-   - Word count: Current vs Target with action (increase/decrease/maintain)
-   - Readability: Current vs Target with specific suggestions
-   - Schema types needed
+    def generate_outline(
+        self,
+        keyword: str,
+        serp_results: List[Dict],
+        serp_medians: Dict[str, float],
+        intent_analysis: Dict,
+        content_type: str = "new",
+        serp_features: Optional[Dict] = None,
+        existing_content: Optional[Dict] = None,
+        use_cache: bool = True
+    ) -> Dict:
+        """
+        Generate dynamic content brief using LLM based on SERP analysis
 
-3. **Annotated Content Improvements**
-   - List specific text changes needed with the format:
-     - ORIGINAL: "current text excerpt"
-     - IMPROVED: "suggested replacement text"
-     - REASON: "why this change helps SEO"
-   - Include 5-10 specific text improvements
+        Args:
+            keyword: Search keyword
+            serp_results: Enriched SERP results with content
+            serp_medians: SERP median values
+            intent_analysis: Intent analysis from IntentService
+            content_type: "new" or "existing"
+            serp_features: Extracted SERP features (PAA, related, etc.)
+            existing_content: For existing content mode, the analyzed content data
+            use_cache: Allow a cached brief for a near-identical keyword (BRIEF_CACHE_ENABLED)
 
-4. **Content Outline** - What the optimized page structure should look like:
-   - H2 sections (mark existing sections to KEEP, REMOVE, or MODIFY)
-   - NEW sections to ADD
-   - Target word count per section
+        Returns:
+            Dictionary with dynamic brief structure
+        """
+        if not self.active_provider:
+            raise Exception("No LLM API key configured. Please set ANTHROPIC_API_KEY or OPENAI_API_KEY.")
 
-5. **Semantic Coverage** - Topics and entities to add/improve
+        # Prepare comprehensive SERP data for LLM
+        serp_context = self._prepare_comprehensive_serp_context(
+            keyword, serp_results, serp_medians, serp_features
+        )
 
-6. **SERP Feature Optimization** - How to win featured snippets, PAA, etc.
+        cache_key = self._response_cache_key(
+            keyword, serp_context, serp_medians, intent_analysis, content_type, existing_content
+        )
+        if use_cache:
+            cached = get_response_cache().get(cache_key)
+            if cached is not None:
+                return cached
 
-7. **Competitive Gaps** - What competitors do that this page doesn't
+        if content_type == "existing":
+            return self._generate_optimization_plan(
+                keyword, serp_context, serp_medians, existing_content, serp_features,
+                cache_key=cache_key, use_cache=use_cache
+            )
 
-Return as JSON:
-{{
-  "title_recommendation": "<optimized H1>",
-  "meta_description": "<optimized meta under 160 chars>",
-  "content_strategy": {{
-    "word_count_current": {current_wc},
-    "word_count_target": {target_wc:.0f},
-    "word_count_action": "<INCREASE/DECREASE/MAINTAIN>",
-    "word_count_delta": <number to add or remove>,
-    "readability_current": {current_flesch:.0f},
-    "readability_target": "{max(target_flesch - 5, 0):.0f}-{min(target_flesch + 5, 100):.0f}",
-    "readability_action": "<SIMPLIFY/ADD_DEPTH/MAINTAIN>",
-    "schema_types": ["<type1>", "<type2>"]
-  }},
-  "content_annotations": [
-    {{
-      "original_text": "<current text excerpt>",
-      "improved_text": "<suggested replacement>",
-      "reason": "<why this helps>",
-      "priority": "<high/medium/low>"
-    }}
-  ],
-  "outline": {{
-    "sections": [
-      {{
-        "h2": "<section heading>",
-        "status": "<KEEP/MODIFY/ADD/REMOVE>",
-        "description": "<what to do with this section>",
-        "word_count_target": <number>,
-        "h3_subsections": ["<sub1>", "<sub2>"],
-        "key_points": ["<point1>", "<point2>"]
-      }}
-    ]
-  }},
-  "semantic_coverage": {{
-    "must_cover_topics": ["<topic1>", "<topic2>"],
-    "missing_entities": ["<entity1>", "<entity2>"],
-    "topics_to_strengthen": ["<topic1>", "<topic2>"]
-  }},
-  "serp_optimization": {{
-    "featured_snippet_strategy": "<how to win it>",
-    "faq_schema_questions": ["<q1>", "<q2>"],
-    "paa_questions_to_answer": ["<q1>", "<q2>"]
-  }},
-  "competitive_gaps": {{
-    "missing_from_page": ["<gap1>", "<gap2>"],
-    "strengths_to_keep": ["<strength1>", "<strength2>"],
-    "quick_wins": ["<win1>", "<win2>"]
-  }}
-}}
+        if use_cache:
+            cached = self._lookup_cached_brief(keyword, intent_analysis, serp_medians, serp_features)
+            if cached:
+                return cached
 
-Return ONLY valid JSON, no markdown code blocks."""
+        brief_data = self._generate_content_brief_data(keyword, serp_context, serp_medians, intent_analysis)
+        brief = self._format_brief_response(keyword, brief_data, serp_medians, intent_analysis, serp_features)
+        get_response_cache().set(cache_key, brief)
+        self._store_cached_brief(keyword, intent_analysis, serp_results, brief_data)
+        return brief
+
+    async def generate_outline_async(
+        self,
+        keyword: str,
+        serp_results: List[Dict],
+        serp_medians: Dict[str, float],
+        intent_analysis: Dict,
+        content_type: str = "new",
+        serp_features: Optional[Dict] = None,
+        existing_content: Optional[Dict] = None,
+        use_cache: bool = True
+    ) -> Dict:
+        """
+        Async variant of generate_outline. New-content briefs are requested on the
+        shared async HTTP client, so many keywords can be generated concurrently
+        (see generate_outlines_async).
+        """
+        if not self.active_provider:
+            raise Exception("No LLM API key configured. Please set ANTHROPIC_API_KEY or OPENAI_API_KEY.")
+
+        if content_type == "existing":
+            # Optimization plans use the blocking client - keep them off the event loop
+            return await asyncio.to_thread(
+                self.generate_outline, keyword, serp_results, serp_medians, intent_analysis,
+                content_type, serp_features, existing_content, use_cache
+            )
+
+        serp_context = self._prepare_comprehensive_serp_context(
+            keyword, serp_results, serp_medians, serp_features
+        )
+
+        cache_key = self._response_cache_key(
+            keyword, serp_context, serp_medians, intent_analysis, content_type, existing_content
+        )
+        if use_cache:
+            cached = get_response_cache().get(cache_key)
+            if cached is None:
+                cached = await asyncio.to_thread(
+                    self._lookup_cached_brief, keyword, intent_analysis, serp_medians, serp_features
+                )
+            if cached:
+                return cached
+
+        prompt_parts = self._content_brief_prompt_parts(serp_context, serp_medians, intent_analysis)
 
         try:
-            if self.active_provider == "claude":
-                response_text = self._call_claude(prompt)
+            if self.race_providers:
+                brief_data = await self._arace_brief_json(prompt_parts)
             else:
-                response_text = self._call_openai(prompt)
-
-            brief_data = self._parse_json_response(response_text)
-
-            # Format sections for response
-            sections = []
-            for section in brief_data.get("outline", {}).get("sections", []):
-                sections.append({
-                    "heading": section.get("h2", ""),
-                    "status": section.get("status", "KEEP"),
-                    "h3_subsections": section.get("h3_subsections", []),
-                    "word_count_target": section.get("word_count_target", 0),
-                    "semantic_focus": section.get("description", ""),
-                    "key_points": section.get("key_points", []),
-                    "topics": []
-                })
+                response_text = await self._acall_llm(prompt_parts, cached_prefix=CONTENT_BRIEF_INSTRUCTIONS)
+                brief_data = self._parse_json_response(response_text)
+            brief_data = await self._avalidate_brief(keyword, prompt_parts, brief_data)
+        except Exception as e:
+            logger.exception("Error generating brief for %r", keyword)
+            raise Exception(f"Error generating content brief: {str(e)}")
 
-            return {
-                "keyword": keyword,
-                "optimization_mode": True,
-                "existing_url": existing_content.get("url", ""),
-                "title_recommendation": brief_data.get("title_recommendation", ""),
-                "meta_description": brief_data.get("meta_description", ""),
-                "content_strategy": brief_data.get("content_strategy", {
-                    "word_count_current": current_wc,
-                    "word_count_target": int(target_wc),
-                    "word_count_action": "INCREASE" if current_wc < target_wc else "MAINTAIN",
-                    "readability_current": int(current_flesch),
-                    "readability_target": f"{int(target_flesch-5)}-{int(target_flesch+5)}"
-                }),
-                "content_annotations": brief_data.get("content_annotations", []),
-                "sections": sections,
-                "word_count_target": int(target_wc),
-                "topics": brief_data.get("semantic_coverage", {}).get("must_cover_topics", []),
-                "related_topics": brief_data.get("semantic_coverage", {}).get("topics_to_strengthen", []),
-                "entities": brief_data.get("semantic_coverage", {}).get("missing_entities", []),
-                "structure_type": "optimization",
-                "serp_optimization": brief_data.get("serp_optimization", {}),
-                "competitive_gaps": brief_data.get("competitive_gaps", {}),
-                "serp_features": serp_features or {},
-                "intent_analysis": {"intent_type": "optimization", "content_format": "existing_page"}
-            }
+        brief = self._format_brief_response(keyword, brief_data, serp_medians, intent_analysis, serp_features)
+        get_response_cache().set(cache_key, brief)
+        await asyncio.to_thread(self._store_cached_brief, keyword, intent_analysis, serp_results, brief_data)
+        return brief
 
-        except Exception as e:
-            print(f"Error generating optimization plan: {e}")
-            import traceback
-            traceback.print_exc()
+    async def generate_outlines_async(self, requests_list: List[Dict]) -> List:
+        """
+        Generate briefs for many keywords concurrently.
 
-            # Return basic structure on error
-            return {
-                "keyword": keyword,
-                "optimization_mode": True,
-                "existing_url": existing_content.get("url", ""),
-                "content_strategy": {
-                    "word_count_current": current_wc,
-                    "word_count_target": int(target_wc),
-                    "word_count_action": "INCREASE" if current_wc < target_wc else "MAINTAIN",
-                    "word_count_delta": int(target_wc - current_wc),
-                    "readability_current": int(current_flesch),
-                    "readability_target": f"{int(target_flesch-5)}-{int(target_flesch+5)}",
-                    "readability_action": "SIMPLIFY" if current_flesch < target_flesch - 10 else "MAINTAIN"
-                },
-                "sections": [],
-                "word_count_target": int(target_wc),
-                "topics": [],
-                "entities": [],
-                "serp_features": serp_features or {},
-                "intent_analysis": {"intent_type": "optimization"}
-            }
+        Args:
+            requests_list: One dict of generate_outline_async keyword arguments per keyword
+
+        Returns:
+            Results in input order; an entry that failed holds its Exception
+        """
+        return await asyncio.gather(
+            *(self.generate_outline_async(**req) for req in requests_list),
+            return_exceptions=True
+        )
+
+    async def generate_outline_stream_async(
+        self,
+        keyword: str,
+        serp_results: List[Dict],
+        serp_medians: Dict[str, float],
+        intent_analysis: Dict,
+        content_type: str = "new",
+        serp_features: Optional[Dict] = None,
+        existing_content: Optional[Dict] = None,
+        use_cache: bool = True
+    ) -> AsyncIterator[Dict]:
+        """
+        Streaming variant of generate_outline. Yields events as the LLM responds:
+        - {"type": "field", "key": ..., "value": ...} for each top-level brief field
+          as soon as its value has fully arrived (new content briefs only)
+        - {"type": "complete", "outline": ...} with the same dict generate_outline returns
+        The brief is streamed on the shared async HTTP client, so a slow completion
+        holds no worker thread.
+        """
+        if not self.active_provider:
+            raise Exception("No LLM API key configured. Please set ANTHROPIC_API_KEY or OPENAI_API_KEY.")
+
+        serp_context = self._prepare_comprehensive_serp_context(
+            keyword, serp_results, serp_medians, serp_features
+        )
+
+        cache_key = self._response_cache_key(
+            keyword, serp_context, serp_medians, intent_analysis, content_type, existing_content
+        )
+        if use_cache:
+            cached = get_response_cache().get(cache_key)
+            if cached is None and content_type != "existing":
+                cached = await asyncio.to_thread(
+                    self._lookup_cached_brief, keyword, intent_analysis, serp_medians, serp_features
+                )
+            if cached:
+                yield {"type": "complete", "outline": cached}
+                return
+
+        if content_type == "existing":
+            # Optimization plans use the blocking client - keep them off the event loop
+            plan = await asyncio.to_thread(
+                self._generate_optimization_plan,
+                keyword, serp_context, serp_medians, existing_content, serp_features,
+                cache_key=cache_key, use_cache=use_cache
+            )
+            yield {"type": "complete", "outline": plan}
+            return
+
+        prompt_parts = self._content_brief_prompt_parts(serp_context, serp_medians, intent_analysis)
+        parser = StreamingJSONObjectParser()
+        chunks = []
+        try:
+            async for delta in self._astream_llm(prompt_parts, cached_prefix=CONTENT_BRIEF_INSTRUCTIONS):
+                chunks.append(delta)
+                for key, value in parser.feed(delta):
+                    yield {"type": "field", "key": key, "value": value}
+
+            brief_data = self._parse_json_response("".join(chunks))
+            brief_data = await self._avalidate_brief(keyword, prompt_parts, brief_data)
+        except Exception as e:
+            logger.exception("Error streaming brief for %r", keyword)
+            raise Exception(f"Error generating content brief: {str(e)}")
+
+        brief = self._format_brief_response(keyword, brief_data, serp_medians, intent_analysis, serp_features)
+        get_response_cache().set(cache_key, brief)
+        await asyncio.to_thread(self._store_cached_brief, keyword, intent_analysis, serp_results, brief_data)
+        yield {"type": "complete", "outline": brief}
+
+    def _response_cache_key(
+        self,
+        keyword: str,
+        serp_context: str,
+        serp_medians: Dict[str, float],
+        intent_analysis: Dict,
+        content_type: str,
+        existing_content: Optional[Dict]
+    ) -> str:
+        """
+        Exact response-cache key. The SERP context already renders the results and
+        features, so it stands in for them; existing-content plans also key on the page.
+        """
+        if content_type == "existing":
+            return response_cache_key(
+                "plan", self.active_provider, keyword, serp_context, serp_medians, existing_content
+            )
+        return response_cache_key(
+            "brief", self.active_provider, keyword, serp_context, serp_medians, intent_analysis
+        )
+
+    def _lookup_cached_brief(
+        self,
+        keyword: str,
+        intent_analysis: Dict,
+        serp_medians: Dict[str, float],
+        serp_features: Optional[Dict]
+    ) -> Optional[Dict]:
+        """
+        Cached brief for a near-identical keyword with the same intent, formatted
+        for this keyword, its SERP medians/features and intent (None if disabled or missed)
+        """
+        if not BRIEF_CACHE_ENABLED:
+            return None
+        try:
+            from app.services.brief_cache import get_brief_cache
+            brief_data = get_brief_cache().lookup(keyword, intent_analysis.get("intent_type", "informational"))
+        except Exception as e:
+            logger.warning("Brief cache lookup failed: %s", e)
+            return None
+        # Entries hold the LLM's brief JSON - one that no longer passes the schema is a miss
+        if not brief_data or brief_schema_errors(brief_data):
+            return None
+        return self._format_brief_response(keyword, brief_data, serp_medians, intent_analysis, serp_features)
+
+    def _store_cached_brief(self, keyword: str, intent_analysis: Dict, serp_results: List[Dict], brief_data: Dict):
+        """Save freshly generated brief JSON (before formatting) to the semantic cache"""
+        if not BRIEF_CACHE_ENABLED:
+            return
+        try:
+            from app.services.brief_cache import get_brief_cache, serp_fingerprint
+            get_brief_cache().store(
+                keyword, intent_analysis.get("intent_type", "informational"), serp_fingerprint(serp_results), brief_data
+            )
+        except Exception as e:
+            logger.warning("Brief cache store failed: %s", e)
+
+    def _lookup_cached_plan(self, keyword: str, existing_content: Dict, serp_medians: Dict[str, float]) -> Optional[Dict]:
+        """Plan stored for this exact page text and targets (None if disabled or missed)"""
+        if not PLAN_CACHE_ENABLED:
+            return None
+        try:
+            from app.services.plan_cache import get_plan_cache, plan_cache_key
+            plan = get_plan_cache().get(plan_cache_key(self.active_provider, keyword, existing_content, serp_medians))
+        except Exception as e:
+            logger.warning("Plan cache lookup failed: %s", e)
+            return None
+        if plan:
+            logger.info("Plan cache hit for %r (%s)", keyword, existing_content.get("url", ""))
+        return plan
+
+    def _store_cached_plan(self, keyword: str, existing_content: Dict, serp_medians: Dict[str, float], plan: Dict):
+        """Save a freshly generated optimization plan to the plan cache"""
+        if not PLAN_CACHE_ENABLED:
+            return
+        try:
+            from app.services.plan_cache import get_plan_cache, plan_cache_key
+            get_plan_cache().set(
+                plan_cache_key(self.active_provider, keyword, existing_content, serp_medians),
+                keyword, existing_content.get("url", ""), plan
+            )
+        except Exception as e:
+            logger.warning("Plan cache store failed: %s", e)
+
+    def generate_outline_batch(self, requests_list: List[Dict]) -> List[Dict]:
+        """
+        Generate new-content briefs for several keywords, packing up to
+        OUTLINE_BATCH_SIZE keywords into each LLM request.
+
+        Args:
+            requests_list: One dict per keyword with keys keyword, serp_results,
+                serp_medians, intent_analysis and optional serp_features
+
+        Returns:
+            List of briefs in input order (same shape as generate_outline)
+        """
+        if not self.active_provider:
+            raise Exception("No LLM API key configured. Please set ANTHROPIC_API_KEY or OPENAI_API_KEY.")
+
+        items = []
+        for req in requests_list:
+            serp_features = req.get("serp_features")
+            serp_context = self._prepare_comprehensive_serp_context(
+                req["keyword"], req["serp_results"], req["serp_medians"], serp_features
+            )
+            data_block = self._build_brief_data_block(serp_context, req["serp_medians"], req["intent_analysis"])
+            items.append({
+                "keyword": req["keyword"],
+                "serp_medians": req["serp_medians"],
+                "intent_analysis": req["intent_analysis"],
+                "serp_features": serp_features,
+                "serp_context": serp_context,
+                "data_block": data_block,
+                "tokens": count_tokens(data_block)
+            })
+
+        briefs = []
+        for batch in self._pack_brief_batches(items):
+            batch_data = []
+            if len(batch) > 1:
+                try:
+                    batch_data = self._generate_content_brief_batch(batch)
+                except Exception as e:
+                    logger.warning("Error generating batched briefs: %s", e)
+
+            # Anything the batch response did not cover is generated individually
+            for i, item in enumerate(batch):
+                if i < len(batch_data) and batch_data[i]:
+                    briefs.append(self._format_brief_response(
+                        item["keyword"], batch_data[i], item["serp_medians"],
+                        item["intent_analysis"], item["serp_features"]
+                    ))
+                else:
+                    briefs.append(self._generate_content_brief(
+                        item["keyword"], item["serp_context"], item["serp_medians"],
+                        item["intent_analysis"], item["serp_features"]
+                    ))
+
+        return briefs
+
+    def _pack_brief_batches(self, items: List[Dict]) -> List[List[Dict]]:
+        """
+        Split items into consecutive batches of up to OUTLINE_BATCH_SIZE keywords,
+        closing a batch early once another keyword's data block plus its reserved
+        output would overflow the provider's context window or output limit.
+        """
+        provider = self.active_provider
+        per_brief = BRIEF_MAX_TOKENS[provider]
+        max_briefs = min(OUTLINE_BATCH_SIZE, LLM_MAX_OUTPUT_TOKENS[provider] // per_brief)
+        # Instructions plus headroom for the batch wrapper text
+        base_tokens = count_tokens(CONTENT_BRIEF_INSTRUCTIONS) + 200
+
+        batches, batch, used = [], [], base_tokens
+        for item in items:
+            needed = item["tokens"] + per_brief
+            if batch and (len(batch) >= max_briefs or used + needed > LLM_CONTEXT_TOKENS[provider]):
+                batches.append(batch)
+                batch, used = [], base_tokens
+            batch.append(item)
+            used += needed
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def _generate_content_brief_batch(self, items: List[Dict]) -> List[Optional[Dict]]:
+        """
+        Generate raw brief JSON for several keywords in a single LLM call.
+        Returns one entry per item in order; None where the response had no brief for it.
+        """
+        n = len(items)
+        blocks = [
+            f"""## KEYWORD {i}: {item['keyword']}
+
+{item['data_block']}"""
+            for i, item in enumerate(items)
+        ]
+
+        prompt = f"""Create a content brief for EACH of the following {n} keywords, using that keyword's own SERP data, intent analysis and Brief Targets.
+
+""" + "\n\n".join(blocks) + f"""
+
+Return a JSON object {{"briefs": [...]}} holding {n} briefs, each with the structure above plus an "index" field set to its KEYWORD number (0 to {n - 1}).
+
+Return ONLY valid JSON, no markdown code blocks or other formatting."""
+
+        max_tokens = BRIEF_MAX_TOKENS[self.active_provider] * n
+        if self.active_provider == "claude":
+            response_text = self._call_claude(prompt, max_tokens=max_tokens, cached_prefix=CONTENT_BRIEF_INSTRUCTIONS)
+        else:
+            response_text = self._call_openai(prompt, max_tokens=max_tokens, cached_prefix=CONTENT_BRIEF_INSTRUCTIONS)
+
+        # Route by the "index" field - fall back to position if the model left it out
+        briefs: List[Optional[Dict]] = [None] * n
+        for position, brief in enumerate(self._parse_json_array_response(response_text)):
+            if not isinstance(brief, dict):
+                continue
+            index = brief.pop("index", position)
+            if isinstance(index, int) and 0 <= index < n and briefs[index] is None and not brief_schema_errors(brief):
+                briefs[index] = brief
+        return briefs
+
+    def _prepare_comprehensive_serp_context(
+        self,
+        keyword: str,
+        serp_results: List[Dict],
+        serp_medians: Dict[str, float],
+        serp_features: Optional[Dict]
+    ) -> str:
+        """
+        Prepare comprehensive SERP context including all features, fitted to the token budget.
+        Memoized on the inputs, so re-generating a keyword (e.g. with a different
+        target intent) reuses the assembled (and compressed) context.
+        """
+        key = self._serp_context_key(keyword, serp_results, serp_medians, serp_features)
+        if key is not None:
+            with _serp_context_cache_lock:
+                serp_context = _serp_context_cache.get(key)
+                if serp_context is not None:
+                    _serp_context_cache.move_to_end(key)
+                    return serp_context
+
+        serp_context = self._build_serp_context(keyword, serp_results, serp_medians, serp_features)
+
+        if key is not None:
+            with _serp_context_cache_lock:
+                _serp_context_cache[key] = serp_context
+                if len(_serp_context_cache) > SERP_CONTEXT_CACHE_SIZE:
+                    _serp_context_cache.popitem(last=False)
+        return serp_context
+
+    def _serp_context_key(
+        self,
+        keyword: str,
+        serp_results: List[Dict],
+        serp_medians: Dict[str, float],
+        serp_features: Optional[Dict]
+    ) -> Optional[bytes]:
+        """blake2b digest of everything the SERP context renders (None if not serializable)"""
+        rendered_results = [
+            [r.get("title", ""), r.get("url", r.get("link", "")), r.get("snippet", ""),
+             r.get("word_count", 0), r.get("dt", 0)]
+            for r in serp_results[:10]
+        ]
+        try:
+            payload = orjson.dumps(
+                [keyword, rendered_results, serp_medians, serp_features],
+                option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+            )
+        except TypeError:
+            return None
+        return hashlib.blake2b(payload, digest_size=16).digest()
+
+    def _build_serp_context(
+        self,
+        keyword: str,
+        serp_results: List[Dict],
+        serp_medians: Dict[str, float],
+        serp_features: Optional[Dict]
+    ) -> str:
+        """Assemble the SERP context text (uncached)"""
+        # (priority, text) in output order - see CONTEXT_PRIORITY_*. Every line of a
+        # section's text ends in "\n" and each section ends with a blank line.
+        sections = [
+            (CONTEXT_PRIORITY_HEADER, f"# SERP Analysis for: {keyword}\n\n"),
+            (CONTEXT_PRIORITY_MEDIANS, SERP_MEDIANS_TEMPLATE % (
+                serp_medians.get('word_count', 0),
+                serp_medians.get('dt', 0),
+                serp_medians.get('referring_domains', 0),
+                serp_medians.get('flesch_reading_ease_score', 0),
+                serp_medians.get('total_schema_types', 0),
+            )),
+        ]
+
+        # Hashes of the PAA answer / result snippet sentences written so far -
+        # boilerplate repeated across results is only sent once (PAA answers
+        # are deduped first, then results in rank order)
+        seen_sentences = set()
+
+        # SERP Features Present
+        if serp_features:
+            buf = io.StringIO()
+            w = buf.write
+            w("## SERP Features Present\n")
+            features_present = serp_features.get("serp_features_present", [])
+            if features_present:
+                for feature in features_present:
+                    w(f"- {feature.replace('_', ' ').title()}\n")
+            else:
+                w("- Standard organic results only\n")
+            w("\n")
+            sections.append((CONTEXT_PRIORITY_FEATURES, buf.getvalue()))
+
+            # Featured Snippet
+            if serp_features.get("featured_snippet"):
+                fs = serp_features["featured_snippet"]
+                buf = io.StringIO()
+                w = buf.write
+                w(f"## Featured Snippet\n**Type:** {fs.get('type', 'paragraph')}\n")
+                if fs.get("title"):
+                    w(f"**Title:** {fs.get('title')}\n")
+                fs_snippet = fs.get("snippet")
+                if fs_snippet:
+                    w(f"**Content:** {shorten(fs_snippet, FEATURED_SNIPPET_CHARS)}\n")
+                if fs.get("list"):
+                    w("**List Items:**\n")
+                    for item in fs.get("list", [])[:5]:
+                        w(f"  - {item}\n")
+                w("\n")
+                sections.append((CONTEXT_PRIORITY_FEATURES, buf.getvalue()))
+
+            # People Also Ask
+            if serp_features.get("people_also_ask"):
+                buf = io.StringIO()
+                w = buf.write
+                w("## People Also Ask (PAA)\nThese questions MUST be addressed in your content:\n")
+                # SERP APIs repeat PAA questions as the box expands - keep the first answer of each
+                paa_answers = {}
+                for paa in serp_features["people_also_ask"]:
+                    question = paa.get("question", "")
+                    if question:
+                        paa_answers.setdefault(question, paa.get("snippet", ""))
+                for question, snippet in paa_answers.items():
+                    w(f"- **Q:** {question}\n")
+                    snippet = dedupe_sentences(shorten(snippet, SNIPPET_CHARS), seen_sentences)
+                    if snippet:
+                        w(f"  **A:** {snippet}\n")
+                w("\n")
+                sections.append((CONTEXT_PRIORITY_PAA, buf.getvalue()))
+
+            # Related Searches
+            if serp_features.get("related_searches"):
+                buf = io.StringIO()
+                w = buf.write
+                w("## Related Searches\nThese topics indicate related user intent:\n")
+                for rs in list(dict.fromkeys(serp_features["related_searches"]))[:10]:
+                    w(f"- {rs}\n")
+                w("\n")
+                sections.append((CONTEXT_PRIORITY_RELATED, buf.getvalue()))
+
+            # Knowledge Panel
+            if serp_features.get("knowledge_panel"):
+                kp = serp_features["knowledge_panel"]
+                buf = io.StringIO()
+                w = buf.write
+                w("## Knowledge Panel\n")
+                if kp.get("title"):
+                    w(f"**Entity:** {kp.get('title')}\n")
+                if kp.get("type"):
+                    w(f"**Type:** {kp.get('type')}\n")
+                kp_description = kp.get("description")
+                if kp_description:
+                    w(f"**Description:** {shorten(kp_description, KNOWLEDGE_PANEL_CHARS)}\n")
+                if kp.get("people_also_search_for"):
+                    w("**Related entities:**\n")
+                    for entity in kp.get("people_also_search_for", [])[:5]:
+                        w(f"  - {entity}\n")
+                w("\n")
+                sections.append((CONTEXT_PRIORITY_FEATURES, buf.getvalue()))
+
+            # Local Pack
+            if serp_features.get("local_pack"):
+                sections.append((CONTEXT_PRIORITY_FEATURES, SERP_LOCAL_PACK_SECTION))
+
+            # Video Results
+            if serp_features.get("video_results"):
+                buf = io.StringIO()
+                w = buf.write
+                w("## Video Results\nVideo content is ranking - consider video content or embedding.\n")
+                for v in serp_features["video_results"][:3]:
+                    w(f"- {v.get('title', '')} ({v.get('platform', '')})\n")
+                w("\n")
+                sections.append((CONTEXT_PRIORITY_FEATURES, buf.getvalue()))
+
+        # Top Ranking Results - pull each field into its own column once, then
+        # render every row through the shared template (one section per row)
+        top_results = serp_results[:10]
+        titles = [r.get("title", "") for r in top_results]
+        urls = [r.get("url", r.get("link", "")) for r in top_results]
+        snippets = [
+            dedupe_sentences(shorten(r.get("snippet", ""), SNIPPET_CHARS), seen_sentences)
+            for r in top_results
+        ]
+        word_counts = [r.get("word_count", 0) for r in top_results]
+        domain_trusts = [r.get("dt", 0) for r in top_results]
+
+        rows = list(map(
+            SERP_RESULT_TEMPLATE.format,
+            range(1, len(top_results) + 1), titles, urls, snippets, word_counts, domain_trusts
+        ))
+        sections.append((CONTEXT_PRIORITY_TOP_RESULTS, "## Top 10 Ranking Results\n" + "".join(rows[:1])))
+        for i, row in enumerate(rows[1:], 2):
+            priority = CONTEXT_PRIORITY_TOP_RESULTS if i <= CONTEXT_TOP_RESULTS else CONTEXT_PRIORITY_TAIL_RESULTS
+            sections.append((priority, row))
+
+        # Drop the final newline so the context ends on its last line
+        serp_context = "".join(self._fit(sections, SERP_CONTEXT_TOKEN_BUDGET))[:-1]
+        if SERP_CONTEXT_COMPRESSION:
+            serp_context = self._compress_serp_context(serp_context)
+        return serp_context
+
+    def _fit(self, sections: List[Tuple[int, str]], budget: int) -> List[str]:
+        """
+        Drop the least important sections until their combined text fits in budget tokens.
+        Returns the surviving section texts in their original order.
+        """
+        costs = [count_tokens(text) for _, text in sections]
+        total = sum(costs)
+
+        if total > budget:
+            # Highest priority number first; later sections before earlier ones on ties
+            drop_order = sorted(
+                (i for i, (priority, _) in enumerate(sections) if priority > CONTEXT_PRIORITY_HEADER),
+                key=lambda i: (sections[i][0], i),
+                reverse=True
+            )
+            dropped = set()
+            for i in drop_order:
+                if total <= budget:
+                    break
+                dropped.add(i)
+                total -= costs[i]
+            logger.info("SERP context over %d token budget, dropped %d section(s)", budget, len(dropped))
+            sections = [section for i, section in enumerate(sections) if i not in dropped]
+
+        return [text for _, text in sections]
+
+    def _compress_serp_context(self, serp_context: str) -> str:
+        """
+        Drop low-signal tokens from the SERP context with LLMLingua-2.
+        Headings, PAA Q/A markers and line breaks are forced through so the
+        structure survives. Returns the original text if compression fails.
+        """
+        try:
+            compressor = get_prompt_compressor()
+            if not compressor:
+                return serp_context
+
+            result = compressor.compress_prompt(
+                serp_context,
+                rate=SERP_CONTEXT_COMPRESSION_RATE,
+                force_tokens=COMPRESSION_FORCE_TOKENS
+            )
+            return result.get("compressed_prompt") or serp_context
+        except Exception as e:
+            logger.warning("Error compressing SERP context: %s", e)
+            return serp_context
+
+    def _generate_content_brief(
+        self,
+        keyword: str,
+        serp_context: str,
+        serp_medians: Dict[str, float],
+        intent_analysis: Dict,
+        serp_features: Optional[Dict]
+    ) -> Dict:
+        """Generate comprehensive content brief using Claude or OpenAI"""
+        brief_data = self._generate_content_brief_data(keyword, serp_context, serp_medians, intent_analysis)
+
+        # Format into our standard response
+        return self._format_brief_response(keyword, brief_data, serp_medians, intent_analysis, serp_features)
+
+    def _generate_content_brief_data(
+        self,
+        keyword: str,
+        serp_context: str,
+        serp_medians: Dict[str, float],
+        intent_analysis: Dict
+    ) -> Dict:
+        """Brief JSON from Claude or OpenAI, checked against BRIEF_SCHEMA (not yet formatted)"""
+        prompt = self._build_content_brief_prompt(keyword, serp_context, serp_medians, intent_analysis)
+
+        try:
+            if self.race_providers:
+                brief_data = self._race_brief_json(prompt)
+            else:
+                if self.active_provider == "claude":
+                    response_text = self._call_claude(prompt, cached_prefix=CONTENT_BRIEF_INSTRUCTIONS)
+                else:
+                    response_text = self._call_openai(prompt, cached_prefix=CONTENT_BRIEF_INSTRUCTIONS)
+
+                # Parse JSON response
+                brief_data = self._parse_json_response(response_text)
+
+            return self._validate_brief(keyword, prompt, brief_data)
+
+        except Exception as e:
+            logger.exception("Error generating brief for %r", keyword)
+            raise Exception(f"Error generating content brief: {str(e)}")
+
+    def _validate_brief(self, keyword: str, prompt: str, brief_data: Dict) -> Dict:
+        """
+        brief_data if it matches BRIEF_SCHEMA; otherwise the provider is asked
+        once to correct it (original prompt plus the listed problems)
+        """
+        errors = brief_schema_errors(brief_data)
+        if not errors:
+            return brief_data
+
+        logger.warning("Brief for %r does not match the schema (%s), requesting a corrected one", keyword, "; ".join(errors))
+        response_text = "".join(self._stream_llm(
+            prompt + self._brief_repair_prompt(brief_data, errors), cached_prefix=CONTENT_BRIEF_INSTRUCTIONS
+        ))
+        return self._checked_brief(self._parse_json_response(response_text))
+
+    async def _avalidate_brief(self, keyword: str, prompt_parts: Sequence[str], brief_data: Dict) -> Dict:
+        """Async _validate_brief"""
+        errors = brief_schema_errors(brief_data)
+        if not errors:
+            return brief_data
+
+        logger.warning("Brief for %r does not match the schema (%s), requesting a corrected one", keyword, "; ".join(errors))
+        response_text = await self._acall_llm(
+            (*prompt_parts, self._brief_repair_prompt(brief_data, errors)), cached_prefix=CONTENT_BRIEF_INSTRUCTIONS
+        )
+        return self._checked_brief(self._parse_json_response(response_text))
+
+    def _brief_repair_prompt(self, brief_data, errors: List[str]) -> str:
+        return BRIEF_REPAIR_PROMPT.format(
+            previous=orjson.dumps(brief_data).decode("utf-8"), errors="; ".join(errors)
+        )
+
+    def _checked_brief(self, brief_data: Dict) -> Dict:
+        """brief_data, or ValueError if it still does not match BRIEF_SCHEMA"""
+        errors = brief_schema_errors(brief_data)
+        if errors:
+            raise ValueError(f"LLM response does not match the brief structure: {'; '.join(errors)}")
+        return brief_data
+
+    def _build_content_brief_prompt(
+        self,
+        keyword: str,
+        serp_context: str,
+        serp_medians: Dict[str, float],
+        intent_analysis: Dict
+    ) -> str:
+        """Build the per-keyword part of the brief prompt (sent after CONTENT_BRIEF_INSTRUCTIONS)"""
+        return "".join(self._content_brief_prompt_parts(serp_context, serp_medians, intent_analysis))
+
+    def _content_brief_prompt_parts(
+        self,
+        serp_context: str,
+        serp_medians: Dict[str, float],
+        intent_analysis: Dict
+    ) -> Tuple[str, str]:
+        """_build_content_brief_prompt unjoined - the (shared, cached) SERP context and the rest"""
+        return serp_context, f"""{self._build_brief_targets(serp_medians, intent_analysis)}
+
+Return ONLY valid JSON, no markdown code blocks or other formatting."""
+
+    def _build_brief_data_block(
+        self,
+        serp_context: str,
+        serp_medians: Dict[str, float],
+        intent_analysis: Dict
+    ) -> str:
+        """SERP context, intent analysis and numeric targets for one keyword"""
+        return serp_context + self._build_brief_targets(serp_medians, intent_analysis)
+
+    def _build_brief_targets(self, serp_medians: Dict[str, float], intent_analysis: Dict) -> str:
+        """Intent analysis and numeric targets that follow the SERP context"""
+        word_count = serp_medians.get('word_count', 1500)
+        flesch = serp_medians.get('flesch_reading_ease_score', 60)
+
+        return BRIEF_TARGETS_TEMPLATE.format_map({
+            "intent_type": intent_analysis.get('intent_type', 'informational'),
+            "intent_source": "(USER SPECIFIED - build content for THIS intent)" if intent_analysis.get('user_override') else "(detected from SERP)",
+            "content_format": intent_analysis.get('content_format', 'article'),
+            "reasoning": intent_analysis.get('reasoning', ''),
+            "wc_target": f"{word_count:.0f}",
+            "wc_min": f"{word_count * 0.9:.0f}",
+            "r_lo": f"{max(flesch - 5, 0):.0f}",
+            "r_hi": f"{min(flesch + 5, 100):.0f}",
+        })
+
+    def _call_claude(self, prompt: str, max_tokens: int = 4096, cached_prefix: Optional[str] = None) -> str:
+        """Call Claude API (streamed, returns the full response text)"""
+        return "".join(self._stream_claude(prompt, max_tokens, cached_prefix))
+
+    def _call_openai(self, prompt: str, max_tokens: int = 4000, cached_prefix: Optional[str] = None) -> str:
+        """Call OpenAI API (streamed, returns the full response text)"""
+        return "".join(self._stream_openai(prompt, max_tokens, cached_prefix))
+
+    def _stream_llm(self, prompt: str, cached_prefix: Optional[str] = None) -> Iterator[str]:
+        """Stream response text deltas from the active provider"""
+        if self.active_provider == "claude":
+            return self._stream_claude(prompt, cached_prefix=cached_prefix)
+        return self._stream_openai(prompt, cached_prefix=cached_prefix)
+
+    def _stream_claude(self, prompt: str, max_tokens: int = 4096, cached_prefix: Optional[str] = None) -> Iterator[str]:
+        """Stream response text deltas from Claude"""
+        headers, body = self._claude_request(prompt, max_tokens, cached_prefix)
+        client = get_anthropic_client(self.anthropic_api_key)
+
+        with get_llm_thread_semaphore("claude"):
+            if client is not None:
+                with client.messages.stream(
+                    model=body["model"],
+                    max_tokens=body["max_tokens"],
+                    messages=body["messages"]
+                ) as stream:
+                    for text in stream.text_stream:
+                        yield text
+                return
+
+            # Fallback to requests if anthropic not installed
+            with post_with_retry(
+                "https://api.anthropic.com/v1/messages",
+                headers=headers,
+                data=orjson.dumps({**body, "stream": True}),
+                timeout=120,
+                stream=True
+            ) as response:
+                response.raise_for_status()
+                for event in self._iter_sse_data(response):
+                    if event == b"[DONE]":
+                        break
+                    text = self._sse_text("claude", event)
+                    if text:
+                        yield text
+
+    def _stream_openai(self, prompt: str, max_tokens: int = 4000, cached_prefix: Optional[str] = None) -> Iterator[str]:
+        """Stream response text deltas from OpenAI"""
+        headers, body = self._openai_request(prompt, max_tokens, cached_prefix)
+
+        with get_llm_thread_semaphore("openai"), post_with_retry(
+            "https://api.openai.com/v1/chat/completions",
+            headers=headers,
+            data=orjson.dumps({**body, "stream": True}),
+            timeout=120,
+            stream=True
+        ) as response:
+            response.raise_for_status()
+            for event in self._iter_sse_data(response):
+                if event == b"[DONE]":
+                    break
+                text = self._sse_text("openai", event)
+                if text:
+                    yield text
+
+    async def _astream_llm(
+        self,
+        prompt: Union[str, Sequence[str]],
+        cached_prefix: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """
+        Async _stream_llm on the shared httpx.AsyncClient (counts against the
+        provider's semaphore). prompt may be given as parts, which are uploaded
+        in sequence without being joined.
+        """
+        provider = self.active_provider
+        headers, body, parts = self._prompt_request(provider, prompt, cached_prefix)
+        if provider == "claude":
+            url = "https://api.anthropic.com/v1/messages"
+        else:
+            url = "https://api.openai.com/v1/chat/completions"
+
+        async with get_llm_semaphore(provider):
+            async with astream_with_retry(
+                get_async_client(), url, headers=headers, content=PromptStreamer({**body, "stream": True}, parts)
+            ) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    event = line[5:].strip()
+                    if event == "[DONE]":
+                        break
+                    text = self._sse_text(provider, event)
+                    if text:
+                        yield text
+
+    def _sse_text(self, provider: str, event) -> Optional[str]:
+        """Text delta carried by one streamed SSE event, if any"""
+        data = orjson.loads(event)
+        if provider == "claude":
+            if data.get("type") == "error":
+                raise Exception(data.get("error", {}).get("message", "Claude streaming error"))
+            if data.get("type") == "content_block_delta":
+                return data.get("delta", {}).get("text")
+            return None
+
+        choices = data.get("choices") or []
+        return choices[0].get("delta", {}).get("content") if choices else None
+
+    def model_for_length(self, prompt_tokens: int, provider: Optional[str] = None) -> str:
+        """
+        Model for a prompt of prompt_tokens tokens (cached instruction prefix not
+        counted) on provider, default the active one. LLM_MODEL_OVERRIDE wins for
+        the active provider; long Claude prompts are routed to CLAUDE_FAST_MODEL.
+        """
+        provider = provider or self.active_provider
+        if LLM_MODEL_OVERRIDE and provider == self.active_provider:
+            return LLM_MODEL_OVERRIDE
+        if provider != "claude":
+            return OPENAI_MODEL
+        if CLAUDE_FAST_MODEL_MIN_TOKENS and prompt_tokens >= CLAUDE_FAST_MODEL_MIN_TOKENS:
+            return CLAUDE_FAST_MODEL
+        return CLAUDE_MODEL
+
+    def _output_budget(self, provider: str, requested: int, prompt_tokens: int) -> int:
+        """requested max_tokens, reduced so prompt + output fit the provider's context window and output limit"""
+        room = LLM_CONTEXT_TOKENS[provider] - prompt_tokens - OUTPUT_SLACK_TOKENS
+        return max(1, min(requested, room, LLM_MAX_OUTPUT_TOKENS[provider]))
+
+    def _claude_request(
+        self,
+        prompt: str,
+        max_tokens: int,
+        cached_prefix: Optional[str],
+        prompt_tokens: Optional[int] = None
+    ) -> Tuple[Dict, Dict]:
+        """
+        Headers and JSON body for a Claude Messages API call.
+        cached_prefix is sent as a separate leading content block marked with
+        cache_control so Anthropic reuses its prefill across calls.
+        """
+        content = prompt
+        if cached_prefix:
+            content = [
+                {"type": "text", "text": cached_prefix, "cache_control": {"type": "ephemeral"}},
+                {"type": "text", "text": prompt}
+            ]
+
+        headers = {
+            "x-api-key": self.anthropic_api_key,
+            "anthropic-version": "2023-06-01",
+            "Content-Type": "application/json"
+        }
+        if cached_prefix:
+            headers["anthropic-beta"] = "prompt-caching-2024-07-31"
+
+        if prompt_tokens is None:
+            prompt_tokens = count_tokens(prompt)
+        prefix_tokens = _count_prefix_tokens(cached_prefix) if cached_prefix else 0
+        body = {
+            "model": self.model_for_length(prompt_tokens, "claude"),
+            "max_tokens": self._output_budget("claude", max_tokens, prompt_tokens + prefix_tokens),
+            "messages": [
+                {"role": "user", "content": content}
+            ]
+        }
+        return headers, body
+
+    def _openai_request(
+        self,
+        prompt: str,
+        max_tokens: int,
+        cached_prefix: Optional[str],
+        prompt_tokens: Optional[int] = None
+    ) -> Tuple[Dict, Dict]:
+        """
+        Headers and JSON body for an OpenAI chat completions call.
+        cached_prefix goes verbatim at the end of the system message so every
+        call shares the same leading tokens (OpenAI caches prefixes automatically).
+        """
+        system_prompt = "You are an expert SEO content strategist. Always return valid JSON."
+        if cached_prefix:
+            system_prompt = f"{system_prompt}\n\n{cached_prefix}"
+
+        headers = {
+            "Authorization": f"Bearer {self.openai_api_key}",
+            "Content-Type": "application/json"
+        }
+        if prompt_tokens is None:
+            prompt_tokens = count_tokens(prompt)
+        prompt_tokens += _count_prefix_tokens(system_prompt)
+        body = {
+            "model": self.model_for_length(0, "openai"),
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": prompt}
+            ],
+            "temperature": 0.3,
+            "max_tokens": self._output_budget("openai", max_tokens, prompt_tokens)
+        }
+        return headers, body
+
+    async def _acall_llm(
+        self,
+        prompt: Union[str, Sequence[str]],
+        cached_prefix: Optional[str] = None,
+        provider: Optional[str] = None
+    ) -> str:
+        """
+        Call provider (default the active one) without blocking the event loop
+        (shared httpx.AsyncClient). At most LLM_CONCURRENCY[provider] calls
+        are in flight at once. prompt may be given as parts (see _astream_llm).
+        """
+        provider = provider or self.active_provider
+        headers, body, parts = self._prompt_request(provider, prompt, cached_prefix)
+        async with get_llm_semaphore(provider):
+            client = get_async_client()
+            if provider == "claude":
+                response = await apost_with_retry(
+                    client, "https://api.anthropic.com/v1/messages", headers=headers,
+                    content=PromptStreamer(body, parts)
+                )
+                response.raise_for_status()
+                return "".join(
+                    block.get("text", "") for block in orjson.loads(response.content).get("content", [])
+                    if block.get("type") == "text"
+                )
+
+            response = await apost_with_retry(
+                client, "https://api.openai.com/v1/chat/completions", headers=headers,
+                content=PromptStreamer(body, parts)
+            )
+            response.raise_for_status()
+            return orjson.loads(response.content)["choices"][0]["message"]["content"]
+
+    def _race_brief_json(self, prompt: str) -> Dict:
+        """
+        Request a brief from Claude and OpenAI at once and return the first
+        response that parses. The slower stream is closed once a winner is in;
+        if the first response does not parse, the other one is used instead.
+        """
+        stop = threading.Event()
+
+        def collect(stream: Iterator[str]) -> str:
+            chunks = []
+            for delta in stream:
+                if stop.is_set():
+                    stream.close()  # drops the connection, so the provider stops generating
+                    raise concurrent.futures.CancelledError()
+                chunks.append(delta)
+            return "".join(chunks)
+
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+        futures = {
+            executor.submit(collect, self._stream_claude(prompt, cached_prefix=CONTENT_BRIEF_INSTRUCTIONS)): "claude",
+            executor.submit(collect, self._stream_openai(prompt, cached_prefix=CONTENT_BRIEF_INSTRUCTIONS)): "openai",
+        }
+        pending = set(futures)
+        error: Optional[Exception] = None
+        try:
+            while pending:
+                done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    try:
+                        return self._parse_json_response(future.result())
+                    except Exception as e:
+                        logger.warning("Discarding %s brief response: %s", futures[future], e)
+                        error = e
+            raise error
+        finally:
+            stop.set()
+            executor.shutdown(wait=False)
+
+    async def _arace_brief_json(self, prompt: Union[str, Sequence[str]]) -> Dict:
+        """Async _race_brief_json: the slower request is cancelled once a winner is in"""
+        tasks = {
+            asyncio.ensure_future(self._acall_llm(prompt, CONTENT_BRIEF_INSTRUCTIONS, provider)): provider
+            for provider in ("claude", "openai")
+        }
+        pending = set(tasks)
+        error: Optional[Exception] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    try:
+                        return self._parse_json_response(task.result())
+                    except Exception as e:
+                        logger.warning("Discarding %s brief response: %s", tasks[task], e)
+                        error = e
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def _prompt_request(
+        self,
+        provider: str,
+        prompt: Union[str, Sequence[str]],
+        cached_prefix: Optional[str]
+    ) -> Tuple[Dict, Dict, Sequence[str]]:
+        """Headers, body with PROMPT_PLACEHOLDER for the prompt, and the prompt parts for PromptStreamer"""
+        parts = (prompt,) if isinstance(prompt, str) else prompt
+        prompt_tokens = sum(map(count_tokens, parts))
+        if provider == "claude":
+            headers, body = self._claude_request(PROMPT_PLACEHOLDER, 4096, cached_prefix, prompt_tokens)
+        else:
+            headers, body = self._openai_request(PROMPT_PLACEHOLDER, 4000, cached_prefix, prompt_tokens)
+        return headers, body, parts
+
+    def _iter_sse_data(self, response) -> Iterator[bytes]:
+        """Yield the raw payload of each `data:` line of a server-sent events response"""
+        for line in response.iter_lines():
+            if line.startswith(b"data:"):
+                yield line[5:].strip()
+
+    def _parse_json_response(self, response_text: str) -> Dict:
+        """Parse JSON object from LLM response"""
+        return self._decode_json(response_text, "{")
+
+    def _parse_json_array_response(self, response_text: str) -> List[Dict]:
+        """Parse a JSON array from LLM response (also accepts an object wrapping the array)"""
+        parsed = self._decode_json(response_text, "[")
+        if isinstance(parsed, dict):
+            parsed = next((v for v in parsed.values() if isinstance(v, list)), [])
+        return parsed
+
+    def _decode_json(self, response_text: str, opener: str):
+        """
+        Decode JSON from an LLM response in a single linear pass: strip a
+        ```json fence if present, try orjson on the whole text, then
+        raw_decode from the first opening bracket (ignores trailing prose).
+        """
+        text = response_text.partition("```json")[2].partition("```")[0] or response_text
+
+        try:
+            return orjson.loads(text)
+        except orjson.JSONDecodeError:
+            pass
+
+        start = text.find(opener)
+        if start < 0:
+            raise ValueError("Could not parse JSON from LLM response")
+        try:
+            parsed, _ = _JSON_DECODER.raw_decode(text, start)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Could not parse JSON from LLM response: {e}")
+        return parsed
+
+    def _format_brief_response(
+        self,
+        keyword: str,
+        brief_data: Dict,
+        serp_medians: Dict[str, float],
+        intent_analysis: Dict,
+        serp_features: Optional[Dict]
+    ) -> Dict:
+        """Format LLM response into our standard brief structure"""
+
+        # Build sections from outline
+        sections = []
+        for section in brief_data.get("outline", {}).get("sections", []):
+            sections.append({
+                "heading": section.get("h2", ""),
+                "h3_subsections": section.get("h3_subsections", []),
+                "topics": section.get("content_elements", []),
+                "word_count_target": section.get("word_count_target", 0),
+                "entities": [],
+                "semantic_focus": section.get("description", ""),
+                "key_points": section.get("key_points", [])
+            })
+
+        return {
+            "keyword": keyword,
+            "intent_analysis": intent_analysis,
+            "title_recommendation": brief_data.get("title_recommendation", f"Complete Guide to {keyword}"),
+            "meta_description": brief_data.get("meta_description", ""),
+            "content_strategy": brief_data.get("content_strategy", {}),
+            "search_intent": brief_data.get("search_intent", {}),
+            "questions_to_answer": brief_data.get("questions_to_answer", []),
+            "serp_patterns": {
+                "content_strategy": brief_data.get("content_strategy", {}),
+                "gap_analysis": brief_data.get("competitive_gaps", {})
+            },
+            "sections": sections,
+            "word_count_target": brief_data.get("content_strategy", {}).get("target_word_count", int(serp_medians.get("word_count", 2000) * 1.15)),
+            "topics": brief_data.get("semantic_coverage", {}).get("must_cover_topics", []),
+            "related_topics": brief_data.get("semantic_coverage", {}).get("related_topics", []),
+            "entities": brief_data.get("semantic_coverage", {}).get("entities_to_mention", []),
+            "structure_type": intent_analysis.get("content_format", "article"),
+            "structure_reasoning": brief_data.get("competitive_gaps", {}).get("unique_angles", []),
+            "serp_optimization": brief_data.get("serp_optimization", {}),
+            "competitive_gaps": brief_data.get("competitive_gaps", {}),
+            # Include raw SERP features for frontend display
+            "serp_features": serp_features or {}
+        }
+
+    def _generate_optimization_plan(
+        self,
+        keyword: str,
+        serp_context: str,
+        serp_medians: Dict[str, float],
+        existing_content: Optional[Dict] = None,
+        serp_features: Optional[Dict] = None,
+        cache_key: Optional[str] = None,
+        use_cache: bool = True
+    ) -> Dict:
+        """
+        Generate comprehensive optimization plan for existing content.
+        A successful plan is stored in the response cache under cache_key (if given)
+        and in the plan cache; with use_cache, a plan cached for the same page
+        text is returned without calling the LLM.
+        """
+
+        # If we don't have existing content data, return basic structure
+        if not existing_content:
+            return {
+                "keyword": keyword,
+                "optimization_mode": True,
+                "serp_analysis": serp_context,
+                "sections": [],
+                "word_count_target": int(serp_medians.get("word_count", 1500))
+            }
+
+        if use_cache:
+            plan = self._lookup_cached_plan(keyword, existing_content, serp_medians)
+            if plan:
+                if cache_key:
+                    get_response_cache().set(cache_key, plan)
+                return plan
+
+        prompt = self._build_optimization_plan_prompt(serp_context, serp_medians, existing_content)
+
+        try:
+            if self.active_provider == "claude":
+                response_text = self._call_claude(prompt, cached_prefix=OPTIMIZATION_PLAN_INSTRUCTIONS)
+            else:
+                response_text = self._call_openai(prompt, cached_prefix=OPTIMIZATION_PLAN_INSTRUCTIONS)
+
+            plan = self._format_optimization_plan(
+                keyword, self._parse_json_response(response_text), serp_medians, existing_content, serp_features
+            )
+            if cache_key:
+                get_response_cache().set(cache_key, plan)
+            self._store_cached_plan(keyword, existing_content, serp_medians, plan)
+            return plan
+
+        except Exception as e:
+            logger.exception("Error generating optimization plan for %r", keyword)
+            return self._fallback_optimization_plan(keyword, serp_medians, existing_content, serp_features)
+
+    def generate_optimization_plans_batch(
+        self,
+        requests_list: List[Dict],
+        poll_interval: float = BATCH_POLL_INTERVAL
+    ) -> List[Dict]:
+        """
+        Optimization plans for many existing pages through the provider's batch
+        API - half the price of regular calls, but results can take up to 24h.
+        Blocks until the batch finishes, so call it from background audit jobs.
+
+        Args:
+            requests_list: One dict per page with keys keyword, serp_results,
+                serp_medians, existing_content and optional serp_features
+            poll_interval: Seconds between batch status checks
+
+        Returns:
+            Plans in input order (same shape as generate_outline for existing
+            content); pages whose request failed get the basic fallback plan
+        """
+        if not self.active_provider:
+            raise Exception("No LLM API key configured. Please set ANTHROPIC_API_KEY or OPENAI_API_KEY.")
+
+        plans: List[Optional[Dict]] = [None] * len(requests_list)
+        bodies = {}
+        for i, req in enumerate(requests_list):
+            serp_context = self._prepare_comprehensive_serp_context(
+                req["keyword"], req["serp_results"], req["serp_medians"], req.get("serp_features")
+            )
+            if not req.get("existing_content"):
+                plans[i] = self._generate_optimization_plan(req["keyword"], serp_context, req["serp_medians"])
+                continue
+
+            plans[i] = self._lookup_cached_plan(req["keyword"], req["existing_content"], req["serp_medians"])
+            if plans[i]:
+                continue
+
+            prompt = self._build_optimization_plan_prompt(serp_context, req["serp_medians"], req["existing_content"])
+            if self.active_provider == "claude":
+                _, body = self._claude_request(prompt, 4096, OPTIMIZATION_PLAN_INSTRUCTIONS)
+            else:
+                _, body = self._openai_request(prompt, 4000, OPTIMIZATION_PLAN_INSTRUCTIONS)
+            bodies[f"plan-{i}"] = body
+
+        api_key = self.anthropic_api_key if self.active_provider == "claude" else self.openai_api_key
+        results = BatchProcessor(self.active_provider, api_key, poll_interval).run(bodies)
+
+        for custom_id, response_text in results.items():
+            i = int(custom_id.split("-")[1])
+            req = requests_list[i]
+            try:
+                if response_text is None:
+                    raise ValueError("request failed in batch")
+                plans[i] = self._format_optimization_plan(
+                    req["keyword"], self._parse_json_response(response_text), req["serp_medians"],
+                    req["existing_content"], req.get("serp_features")
+                )
+                self._store_cached_plan(req["keyword"], req["existing_content"], req["serp_medians"], plans[i])
+            except Exception as e:
+                logger.warning("Batched optimization plan for %r failed: %s", req["keyword"], e)
+                plans[i] = self._fallback_optimization_plan(
+                    req["keyword"], req["serp_medians"], req["existing_content"], req.get("serp_features")
+                )
+        return plans
+
+    def _build_optimization_plan_prompt(
+        self,
+        serp_context: str,
+        serp_medians: Dict[str, float],
+        existing_content: Dict
+    ) -> str:
+        """Per-page part of the optimization plan prompt (OPTIMIZATION_PLAN_INSTRUCTIONS is the cached prefix)"""
+        # Build comprehensive optimization prompt
+        current_wc = existing_content.get("word_count", 0)
+        target_wc = serp_medians.get("word_count", 1500)
+        current_flesch = existing_content.get("flesch_reading_ease_score", 50)
+        target_flesch = serp_medians.get("flesch_reading_ease_score", 60)
+
+        # Word count strategy
+        if current_wc < target_wc * 0.8:
+            wc_strategy = f"INCREASE word count by {int(target_wc - current_wc)} words to match competitors"
+        elif current_wc > target_wc * 1.3:
+            wc_strategy = f"Consider TRIMMING content - you have {int(current_wc - target_wc)} more words than competitors"
+        else:
+            wc_strategy = "Word count is competitive - focus on quality over quantity"
+
+        # Readability strategy
+        if current_flesch < target_flesch - 10:
+            readability_strategy = "SIMPLIFY content - readability_current is harder than competitors (readability_target). Use shorter sentences and simpler words."
+        elif current_flesch > target_flesch + 10:
+            readability_strategy = "Content may be TOO simple (readability_current vs readability_target). Consider adding more technical depth."
+        else:
+            readability_strategy = "Readability aligns with competitor content"
+
+        # Current headings
+        current_h2s = existing_content.get("h2_headings", [])
+        h2_context = "\n".join([f"- {h}" for h in current_h2s[:10]]) if current_h2s else "No H2 headings found"
+
+        # Page content for annotation
+        page_text = truncate(existing_content.get("page_text", ""), PAGE_EXCERPT_CHARS)
+
+        # Detect existing page elements to avoid redundant recommendations
+        existing_elements = self._detect_existing_page_elements(existing_content)
+        existing_elements_context = "\n".join([f"- {elem}" for elem in existing_elements]) if existing_elements else "None detected"
+
+        # Figures appear once, in Plan Targets; the rest of the prompt refers to them by name
+        return OPTIMIZATION_PLAN_PAGE_TEMPLATE.format_map({
+            "wc_current": current_wc,
+            "wc_target": f"{target_wc:.0f}",
+            "r_current": f"{current_flesch:.0f}",
+            "r_lo": f"{max(target_flesch - 5, 0):.0f}",
+            "r_hi": f"{min(target_flesch + 5, 100):.0f}",
+            "existing_elements": existing_elements_context,
+            "serp_context": serp_context,
+            "url": existing_content.get('url', 'Unknown'),
+            "wc_strategy": wc_strategy,
+            "readability_strategy": readability_strategy,
+            "h2_headings": h2_context,
+            "page_text": page_text,
+        })
+
+    def _format_optimization_plan(
+        self,
+        keyword: str,
+        brief_data: Dict,
+        serp_medians: Dict[str, float],
+        existing_content: Dict,
+        serp_features: Optional[Dict]
+    ) -> Dict:
+        """Shape the LLM's optimization plan JSON into the outline response"""
+        current_wc = existing_content.get("word_count", 0)
+        target_wc = serp_medians.get("word_count", 1500)
+        current_flesch = existing_content.get("flesch_reading_ease_score", 50)
+        target_flesch = serp_medians.get("flesch_reading_ease_score", 60)
+        target_wc_i = int(target_wc)
+        readability_range = f"{int(target_flesch-5)}-{int(target_flesch+5)}"
+
+        # Format sections for response
+        sections = []
+        for section in brief_data.get("outline", {}).get("sections", []):
+            sections.append({
+                "heading": section.get("h2", ""),
+                "status": section.get("status", "KEEP"),
+                "h3_subsections": section.get("h3_subsections", []),
+                "word_count_target": section.get("word_count_target", 0),
+                "semantic_focus": section.get("description", ""),
+                "key_points": section.get("key_points", []),
+                "topics": []
+            })
+
+        return {
+            "keyword": keyword,
+            "optimization_mode": True,
+            "existing_url": existing_content.get("url", ""),
+            "title_recommendation": brief_data.get("title_recommendation", ""),
+            "meta_description": brief_data.get("meta_description", ""),
+            "content_strategy": brief_data.get("content_strategy", {
+                "word_count_current": current_wc,
+                "word_count_target": target_wc_i,
+                "word_count_action": "INCREASE" if current_wc < target_wc else "MAINTAIN",
+                "readability_current": int(current_flesch),
+                "readability_target": readability_range
+            }),
+            "content_annotations": brief_data.get("content_annotations", []),
+            "sections": sections,
+            "word_count_target": target_wc_i,
+            "topics": brief_data.get("semantic_coverage", {}).get("must_cover_topics", []),
+            "related_topics": brief_data.get("semantic_coverage", {}).get("topics_to_strengthen", []),
+            "entities": brief_data.get("semantic_coverage", {}).get("missing_entities", []),
+            "structure_type": "optimization",
+            "serp_optimization": brief_data.get("serp_optimization", {}),
+            "competitive_gaps": brief_data.get("competitive_gaps", {}),
+            "serp_features": serp_features or {},
+            "intent_analysis": {"intent_type": "optimization", "content_format": "existing_page"}
+        }
+
+    def _fallback_optimization_plan(
+        self,
+        keyword: str,
+        serp_medians: Dict[str, float],
+        existing_content: Dict,
+        serp_features: Optional[Dict]
+    ) -> Dict:
+        """Basic plan from the page and SERP metrics alone (used when the LLM call fails)"""
+        current_wc = existing_content.get("word_count", 0)
+        target_wc = serp_medians.get("word_count", 1500)
+        current_flesch = existing_content.get("flesch_reading_ease_score", 50)
+        target_flesch = serp_medians.get("flesch_reading_ease_score", 60)
+        target_wc_i = int(target_wc)
+        readability_range = f"{int(target_flesch-5)}-{int(target_flesch+5)}"
+
+        return {
+            "keyword": keyword,
+            "optimization_mode": True,
+            "existing_url": existing_content.get("url", ""),
+            "content_strategy": {
+                "word_count_current": current_wc,
+                "word_count_target": target_wc_i,
+                "word_count_action": "INCREASE" if current_wc < target_wc else "MAINTAIN",
+                "word_count_delta": int(target_wc - current_wc),
+                "readability_current": int(current_flesch),
+                "readability_target": readability_range,
+                "readability_action": "SIMPLIFY" if current_flesch < target_flesch - 10 else "MAINTAIN"
+            },
+            "sections": [],
+            "word_count_target": target_wc_i,
+            "topics": [],
+            "entities": [],
+            "serp_features": serp_features or {},
+            "intent_analysis": {"intent_type": "optimization"}
+        }
 
 
     def _detect_existing_page_elements(self, existing_content: Optional[Dict]) -> List[str]:
@@ -788,9 +2234,7 @@ Return ONLY valid JSON, no markdown code blocks."""
         # Check for statistics/data
         stats_indicators = ["statistics", "stats", "data", "numbers", "metrics", "results", "%", "percent", "increased", "improved", "growth"]
         # Look for percentage patterns
-        import re
-        percentage_pattern = r'\d+%|\d+\s*percent'
-        if re.search(percentage_pattern, page_text) or any(ind in page_text for ind in stats_indicators):
+        if _PERCENTAGE_RE.search(page_text) or any(ind in page_text for ind in stats_indicators):
             detected_elements.append("Statistics/data points (already exists)")
 
         # Check for testimonials/reviews
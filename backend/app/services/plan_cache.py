@@ -0,0 +1,78 @@
+"""
+Persistent optimization plan cache, keyed on the audited page instead of the SERP.
+Re-auditing a page whose text has not changed returns the stored plan even when
+the SERP context has drifted (the exact response cache misses then), as long as
+the word count / readability targets round to the same values.
+Persisted in SQLite (WAL mode, shared across workers and restarts).
+"""
+import json
+import hashlib
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+from app.config import PLAN_CACHE_PATH, PLAN_CACHE_TTL_DAYS
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """CREATE TABLE IF NOT EXISTS plans (
+    key TEXT PRIMARY KEY,
+    keyword TEXT NOT NULL,
+    url TEXT,
+    response_json TEXT NOT NULL,
+    created_at TEXT NOT NULL DEFAULT (datetime('now'))
+)"""
+
+
+def plan_cache_key(provider: str, keyword: str, existing_content: Dict, serp_medians: Dict[str, float]) -> str:
+    """Digest of the keyword, the page (URL + full text) and the rounded SERP targets"""
+    page_text = existing_content.get("page_text", "")
+    page_digest = hashlib.blake2b(page_text.encode("utf-8"), digest_size=16).hexdigest()
+    payload = "|".join([
+        provider,
+        keyword,
+        existing_content.get("url", ""),
+        str(len(page_text)),
+        page_digest,
+        f"{serp_medians.get('word_count', 1500):.0f}",
+        f"{serp_medians.get('flesch_reading_ease_score', 60):.0f}",
+    ])
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class PlanCache:
+    """Page digest → generated optimization plan"""
+
+    def __init__(self, path: str = None):
+        path = path or PLAN_CACHE_PATH
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(_SCHEMA)
+        # Guards the shared connection
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Stored plan for key, unless older than PLAN_CACHE_TTL_DAYS"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT response_json FROM plans WHERE key = ? AND created_at >= datetime('now', ?)",
+                (key, f"-{PLAN_CACHE_TTL_DAYS} days")
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key: str, keyword: str, url: str, plan: Dict):
+        """Persist a plan (replaces an older one for the same page)"""
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO plans (key, keyword, url, response_json) VALUES (?, ?, ?, ?)",
+                (key, keyword, url, json.dumps(plan, default=str))
+            )
+
+
+def get_plan_cache() -> PlanCache:
+    """Get plan cache instance (singleton)"""
+    if not hasattr(get_plan_cache, "_instance"):
+        get_plan_cache._instance = PlanCache()
+    return get_plan_cache._instance
@@ -0,0 +1,121 @@
+"""
+Exact-match response cache for generated briefs and optimization plans.
+Backend picked by CACHE_BACKEND: "memory" (per-process LRU, default),
+"redis" (shared across workers, needs `pip install redis`) or "none".
+"""
+import copy
+import json
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+from app.config import CACHE_BACKEND, REDIS_URL, RESPONSE_CACHE_TTL, RESPONSE_CACHE_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Namespace for keys in a shared Redis
+REDIS_KEY_PREFIX = "rankpredict:response:"
+
+
+def response_cache_key(*parts) -> str:
+    """Stable digest of the inputs that determine a response (canonical JSON + blake2b)"""
+    payload = json.dumps(parts, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class MemoryResponseCache:
+    """In-process LRU with per-entry TTL"""
+
+    def __init__(self, maxsize: int = RESPONSE_CACHE_SIZE, ttl: int = RESPONSE_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        # Callers may mutate the result - hand out a copy
+        return copy.deepcopy(value)
+
+    def set(self, key: str, value: Dict):
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+class RedisResponseCache:
+    """Redis-backed cache shared by all workers (SETEX with TTL)"""
+
+    def __init__(self, url: str = REDIS_URL, ttl: int = RESPONSE_CACHE_TTL):
+        import redis
+        self.ttl = ttl
+        self._redis = redis.Redis.from_url(url)
+
+    def get(self, key: str) -> Optional[Dict]:
+        raw = self._redis.get(REDIS_KEY_PREFIX + key)
+        return json.loads(raw) if raw else None
+
+    def set(self, key: str, value: Dict):
+        self._redis.setex(REDIS_KEY_PREFIX + key, self.ttl, json.dumps(value, default=str))
+
+
+class ResponseCache:
+    """Wraps the configured backend; backend errors count as misses so generation never fails on the cache"""
+
+    def __init__(self, backend=None):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Dict]:
+        if self.backend is None:
+            return None
+        try:
+            value = self.backend.get(key)
+        except Exception as e:
+            logger.warning("Response cache read failed: %s", e)
+            value = None
+
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        logger.debug("Response cache %s (hits=%d misses=%d)", "hit" if value is not None else "miss", self.hits, self.misses)
+        return value
+
+    def set(self, key: str, value: Dict):
+        if self.backend is None:
+            return
+        try:
+            self.backend.set(key, value)
+        except Exception as e:
+            logger.warning("Response cache write failed: %s", e)
+
+
+def get_response_cache() -> ResponseCache:
+    """Get response cache instance (singleton)"""
+    if not hasattr(get_response_cache, "_instance"):
+        backend = None
+        if CACHE_BACKEND == "redis":
+            try:
+                backend = RedisResponseCache()
+            except ImportError:
+                logger.warning("redis not installed, falling back to in-memory response cache")
+                backend = MemoryResponseCache()
+        elif CACHE_BACKEND != "none":
+            backend = MemoryResponseCache()
+        get_response_cache._instance = ResponseCache(backend)
+    return get_response_cache._instance
@@ -1,18 +1,220 @@
 """
 Semantic similarity service using sentence-transformers (from notebook)
 """
+import hashlib
+import logging
+import threading
+from pathlib import Path
 import numpy as np
-from typing import List, Dict, Optional
+from collections import OrderedDict
+from functools import lru_cache
+from typing import List, Dict, Optional, Tuple
 from bs4 import BeautifulSoup
 from numpy.linalg import norm
 from sentence_transformers import SentenceTransformer
-from app.config import SENTENCE_TRANSFORMERS_MODEL
+from app.config import (
+    SENTENCE_TRANSFORMERS_MODEL, USE_ONNX_INT8, ONNX_MODEL_DIR, EMBEDDING_CACHE_ENABLED, SEMANTIC_HTML_MAX_CHARS,
+    TORCH_COMPILE_EMBEDDINGS, RANKPREDICT_DEVICE, USE_SELECTOLAX
+)
 
+logger = logging.getLogger(__name__)
 
-def cosine_sim(a: np.ndarray, b: np.ndarray) -> float:
-    """Cosine similarity between two vectors (from notebook)"""
-    denom = (norm(a) * norm(b)) + 1e-8
-    return float(np.dot(a, b) / denom)
+# Optional C HTML parser, much faster than BeautifulSoup. Used only with USE_SELECTOLAX:
+# its tree building differs from html.parser on malformed markup, so BeautifulSoup stays
+# the default that semantic scores were calibrated on.
+HTMLParser = None
+if USE_SELECTOLAX:
+    try:
+        from selectolax.parser import HTMLParser
+    except ImportError:
+        print("USE_SELECTOLAX is set but selectolax is not installed, using BeautifulSoup")
+
+# Documents per forward pass when embedding SERP results (CPU / CUDA)
+ENCODE_BATCH_SIZE = 32
+GPU_ENCODE_BATCH_SIZE = 64
+
+# Embeddings kept for reuse: query intent vectors and document main texts
+QUERY_EMBEDDING_CACHE_SIZE = 1024
+DOC_EMBEDDING_CACHE_SIZE = 4096
+
+# Paragraphs (after title and first h1) that make up a page's main text
+MAIN_TEXT_PARAGRAPHS = 5
+
+# Dummy texts encoded to trigger torch.compile at startup
+COMPILE_WARMUP_BATCH = 8
+
+# Token limit per text for the ONNX encoder (the sentence-transformers default for MiniLM)
+ONNX_MAX_SEQ_LENGTH = 256
+ONNX_QUANTIZED_FILE = "model_quantized.onnx"
+
+
+class OnnxInt8Encoder:
+    """
+    Drop-in for SentenceTransformer.encode backed by an INT8 (dynamic,
+    AVX512-VNNI) quantized ONNX export of the model: tokenize, run the
+    session, mean-pool over the attention mask, L2-normalize.
+    """
+
+    def __init__(self, model_name: str, cache_dir: str = ONNX_MODEL_DIR):
+        import onnxruntime
+        from transformers import AutoTokenizer
+
+        model_dir = Path(cache_dir) / model_name.replace("/", "__")
+        if not (model_dir / ONNX_QUANTIZED_FILE).exists():
+            self._export(model_name, model_dir)
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.session = onnxruntime.InferenceSession(
+            str(model_dir / ONNX_QUANTIZED_FILE), providers=["CPUExecutionProvider"]
+        )
+        self._input_names = {i.name for i in self.session.get_inputs()}
+
+    @staticmethod
+    def _export(model_name: str, model_dir: Path):
+        """Export model_name to ONNX and write the quantized graph next to it (one-off)"""
+        from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+        from optimum.onnxruntime.configuration import AutoQuantizationConfig
+        from transformers import AutoTokenizer
+
+        print(f"Exporting {model_name} to INT8 ONNX in {model_dir}")
+        model = ORTModelForFeatureExtraction.from_pretrained(model_name, export=True)
+        model.save_pretrained(model_dir)
+        AutoTokenizer.from_pretrained(model_name).save_pretrained(model_dir)
+        ORTQuantizer.from_pretrained(model).quantize(
+            save_dir=model_dir,
+            quantization_config=AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False)
+        )
+
+    def encode(
+        self,
+        sentences,
+        batch_size: int = ENCODE_BATCH_SIZE,
+        normalize_embeddings: bool = False,
+        convert_to_numpy: bool = True,
+        show_progress_bar: bool = False
+    ) -> np.ndarray:
+        """Same contract as SentenceTransformer.encode: (N, D) for a list, (D,) for a single string"""
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+
+        batches = []
+        for start in range(0, len(texts), batch_size):
+            inputs = self.tokenizer(
+                texts[start:start + batch_size], padding=True, truncation=True,
+                max_length=ONNX_MAX_SEQ_LENGTH, return_tensors="np"
+            )
+            feed = {name: value for name, value in inputs.items() if name in self._input_names}
+            token_embs = self.session.run(None, feed)[0]
+
+            mask = inputs["attention_mask"][..., None].astype(np.float32)
+            pooled = (token_embs * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+            if normalize_embeddings:
+                pooled /= np.maximum(norm(pooled, axis=1, keepdims=True), 1e-12)
+            batches.append(pooled.astype(np.float32))
+
+        embeddings = np.vstack(batches) if batches else np.empty((0, 0), dtype=np.float32)
+        return embeddings[0] if single else embeddings
+
+
+def _node_text(node) -> str:
+    """selectolax node text joined like BeautifulSoup's get_text(" ", strip=True): stripped strings, empty ones dropped"""
+    return " ".join(part for part in node.text(separator="\x00", strip=True).split("\x00") if part)
+
+
+def extract_main_text(html: str) -> str:
+    """
+    Focus on meaningful part of page for semantic scoring (from notebook):
+    - <title>
+    - first <h1>
+    - first 3–5 <p> elements
+    This avoids nav/footer noise.
+    Only the first SEMANTIC_HTML_MAX_CHARS characters are parsed.
+    """
+    if not html:
+        return ""
+    html = html[:SEMANTIC_HTML_MAX_CHARS]
+    
+    try:
+        if HTMLParser is not None:
+            tree = HTMLParser(html)
+            # BeautifulSoup's get_text leaves out script/style/template strings
+            tree.strip_tags(["script", "style", "template"])
+
+            title_node = tree.css_first("title")
+            title = _node_text(title_node) if title_node else ""
+
+            h1 = tree.css_first("h1")
+            h1_text = _node_text(h1) if h1 else ""
+
+            paragraphs = (_node_text(p) for p in tree.css("p"))
+        else:
+            soup = BeautifulSoup(html, "html.parser")
+
+            title = soup.title.get_text(" ", strip=True) if soup.title else ""
+
+            h1 = soup.find("h1")
+            h1_text = h1.get_text(" ", strip=True) if h1 else ""
+
+            paragraphs = (p.get_text(" ", strip=True) for p in soup.find_all("p"))
+        
+        p_texts = []
+        for t in paragraphs:
+            if not t:
+                continue
+            p_texts.append(t)
+            if len(p_texts) >= MAIN_TEXT_PARAGRAPHS:
+                break
+        
+        main_text = " ".join([title, h1_text] + p_texts).strip()
+        return main_text[:4000]
+    except Exception as e:
+        print(f"Error extracting main text: {e}")
+        return ""
+
+
+def load_embedding_model(model_name: str):
+    """INT8 ONNX encoder when USE_ONNX_INT8 is set (and it loads), otherwise the SentenceTransformer"""
+    if USE_ONNX_INT8:
+        try:
+            return OnnxInt8Encoder(model_name)
+        except Exception as e:
+            print(f"INT8 ONNX encoder unavailable, using SentenceTransformer: {e}")
+    device = resolve_device()
+    model = SentenceTransformer(model_name, device=device)
+    if device == "cuda":
+        model.half()
+    if TORCH_COMPILE_EMBEDDINGS:
+        compile_embedding_model(model)
+    return model
+
+
+def resolve_device() -> str:
+    """RANKPREDICT_DEVICE, with "auto" meaning CUDA when torch sees a GPU"""
+    if RANKPREDICT_DEVICE != "auto":
+        return RANKPREDICT_DEVICE
+    try:
+        import torch
+        return "cuda" if torch.cuda.is_available() else "cpu"
+    except ImportError:
+        return "cpu"
+
+
+def compile_embedding_model(model: SentenceTransformer):
+    """
+    torch.compile the transformer inside the SentenceTransformer (pooling and
+    normalization stay as they are) and run a dummy batch so compilation happens
+    at startup rather than on the first request. Leaves the model in eager mode
+    if compilation fails.
+    """
+    transformer = model[0]
+    eager = transformer.auto_model
+    try:
+        import torch
+        transformer.auto_model = torch.compile(eager, mode="reduce-overhead", fullgraph=False)
+        model.encode(["x"] * COMPILE_WARMUP_BATCH, batch_size=COMPILE_WARMUP_BATCH, show_progress_bar=False)
+    except Exception as e:
+        transformer.auto_model = eager
+        print(f"torch.compile unavailable for the embedding model, using eager mode: {e}")
 
 
 class SemanticService:
@@ -20,8 +222,18 @@ class SemanticService:
     
     def __init__(self, model_name: str = None):
         model_name = model_name or SENTENCE_TRANSFORMERS_MODEL
-        self.model = SentenceTransformer(model_name)
+        self.model = load_embedding_model(model_name)
         self.model_name = model_name
+        # Identifies the vectors in the persistent embedding cache (INT8 ONNX output differs slightly)
+        self.model_id = f"{model_name}#onnx-int8" if isinstance(self.model, OnnxInt8Encoder) else model_name
+        on_gpu = str(getattr(self.model, "device", "cpu")).startswith("cuda")
+        self.encode_batch_size = GPU_ENCODE_BATCH_SIZE if on_gpu else ENCODE_BATCH_SIZE
+
+        # Embeddings are pure functions of their text - repeated queries and
+        # pages re-scored for another keyword skip the forward pass
+        self._query_cache = lru_cache(maxsize=QUERY_EMBEDDING_CACHE_SIZE)(self._encode_query)
+        self._doc_cache: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._doc_cache_lock = threading.Lock()
     
     def get_query_embedding(self, query: str, query_variants: Optional[List[str]] = None) -> np.ndarray:
         """
@@ -32,48 +244,111 @@ class SemanticService:
             query_variants: Optional list of query variant strings
             
         Returns:
-            Average embedding vector representing query intent
+            Average embedding vector representing query intent, rescaled to
+            unit length so a dot product with a document embedding is the cosine
         """
         texts = [query]
         if query_variants:
             texts.extend([q for q in query_variants if isinstance(q, str) and q.strip()])
         
-        embeddings = self.model.encode(texts, normalize_embeddings=True)
-        return np.mean(embeddings, axis=0)
-    
-    def extract_main_text_for_semantics(self, html: str) -> str:
+        return self._query_cache(tuple(texts))
+
+    def prepare_query(self, query: str, query_variants: Optional[List[str]] = None) -> np.ndarray:
         """
-        Focus on meaningful part of page for semantic scoring (from notebook):
-        - <title>
-        - first <h1>
-        - first 3–5 <p> elements
-        This avoids nav/footer noise.
+        Unit-norm query intent embedding to compute once per SERP and pass as
+        `query_emb` to every compute_semantic_score call for that query
         """
-        if not html:
-            return ""
-        
+        return self.get_query_embedding(query, query_variants)
+
+    def _encode_query(self, texts: Tuple[str, ...]) -> np.ndarray:
+        """Unit-norm mean embedding of texts (cached by get_query_embedding, so read-only)"""
+        digest = hashlib.blake2b("\x1f".join(texts).encode("utf-8"), digest_size=16).digest()
+        key = self._persistent_key("query", digest)
+        query_emb = self._load_persisted([key]).get(key)
+        if query_emb is None:
+            embeddings = self.model.encode(list(texts), normalize_embeddings=True)
+            # The mean of unit vectors is shorter than 1 - normalize it again
+            mean = np.mean(embeddings, axis=0, dtype=np.float32)
+            query_emb = mean / (norm(mean) + 1e-8)
+            self._persist({key: query_emb})
+        query_emb.setflags(write=False)
+        return query_emb
+
+    def _encode_documents(self, texts: List[str]) -> np.ndarray:
+        """
+        Unit-norm embeddings of texts, one row each. Texts seen before (same
+        blake2b digest) come from the document cache; the rest are encoded in
+        one call, shortest first so each batch pads to a similar length.
+        """
+        keys = [hashlib.blake2b(t.encode("utf-8"), digest_size=16).digest() for t in texts]
+        rows: List[Optional[np.ndarray]] = [None] * len(texts)
+        with self._doc_cache_lock:
+            for i, key in enumerate(keys):
+                emb = self._doc_cache.get(key)
+                if emb is not None:
+                    self._doc_cache.move_to_end(key)
+                    rows[i] = emb
+
+        missing = [i for i, row in enumerate(rows) if row is None]
+        if missing:
+            # Then the persistent cache (other workers, earlier runs)
+            persistent_keys = {i: self._persistent_key("doc", keys[i]) for i in missing}
+            persisted = self._load_persisted(list(persistent_keys.values()))
+            fresh = {}
+            for i in missing:
+                rows[i] = persisted.get(persistent_keys[i])
+
+            to_encode = sorted((i for i in missing if rows[i] is None), key=lambda i: len(texts[i]))
+            if to_encode:
+                embs = self.model.encode(
+                    [texts[i] for i in to_encode],
+                    batch_size=self.encode_batch_size,
+                    normalize_embeddings=True,
+                    convert_to_numpy=True,
+                    show_progress_bar=False
+                )
+                for i, emb in zip(to_encode, embs):
+                    rows[i] = emb
+                    fresh[persistent_keys[i]] = emb
+                self._persist(fresh)
+
+            with self._doc_cache_lock:
+                for i in missing:
+                    self._doc_cache[keys[i]] = rows[i]
+                    self._doc_cache.move_to_end(keys[i])
+                while len(self._doc_cache) > DOC_EMBEDDING_CACHE_SIZE:
+                    self._doc_cache.popitem(last=False)
+
+        return np.vstack(rows).astype(np.float32, copy=False)
+
+    def _persistent_key(self, kind: str, digest: bytes) -> str:
+        """Persistent cache key: model id, kind ("query"/"doc") and the blake2b digest of the text"""
+        return f"{self.model_id}:{kind}:{digest.hex()}"
+
+    def _load_persisted(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """Embeddings found in the persistent cache (empty if disabled or unreadable)"""
+        if not EMBEDDING_CACHE_ENABLED:
+            return {}
         try:
-            soup = BeautifulSoup(html, "html.parser")
-            
-            title = soup.title.get_text(" ", strip=True) if soup.title else ""
-            
-            h1 = soup.find("h1")
-            h1_text = h1.get_text(" ", strip=True) if h1 else ""
-            
-            p_texts = []
-            for p in soup.find_all("p"):
-                t = p.get_text(" ", strip=True)
-                if not t:
-                    continue
-                p_texts.append(t)
-                if len(p_texts) >= 5:
-                    break
-            
-            main_text = " ".join([title, h1_text] + p_texts).strip()
-            return main_text[:4000]
+            from app.services.embedding_cache import get_embedding_cache
+            return get_embedding_cache().get_many(keys)
+        except Exception as e:
+            logger.warning("Embedding cache lookup failed: %s", e)
+            return {}
+
+    def _persist(self, items: Dict[str, np.ndarray]):
+        """Save freshly computed embeddings to the persistent cache"""
+        if not EMBEDDING_CACHE_ENABLED or not items:
+            return
+        try:
+            from app.services.embedding_cache import get_embedding_cache
+            get_embedding_cache().set_many(items)
         except Exception as e:
-            print(f"Error extracting main text: {e}")
-            return ""
+            logger.warning("Embedding cache store failed: %s", e)
+    
+    def extract_main_text_for_semantics(self, html: str) -> str:
+        """Title + first h1 + first paragraphs of a page (see extract_main_text)"""
+        return extract_main_text(html)
     
     def compute_semantic_scores_for_serp(
         self,
@@ -86,43 +361,57 @@ class SemanticService:
         Compute semantic scores for SERP results (from notebook)
         
         For each URL in serp_results:
-        - use pre-fetched HTML if available
+        - use the enrichment's "semantic_text" if present, else pre-fetched HTML
         - extract main text (title + h1 + first paragraphs)
-        - embed and compute cosine similarity with query intent
+        Then embed all extracted texts in one batch and compute cosine
+        similarity with query intent (results without text score 0.0)
         """
-        query_emb = self.get_query_embedding(query, query_variants)
-        scores = []
-        
-        for result in serp_results:
-            html = result.get(html_column, "")
-            if not html:
-                # Fallback: try to fetch if URL is available
-                url = result.get("url", "")
-                if not url:
-                    scores.append(0.0)
-                    continue
-                try:
-                    import requests
-                    resp = requests.get(url, timeout=10, headers={
-                        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-                    })
-                    html = resp.text
-                except Exception:
-                    scores.append(0.0)
-                    continue
-            
-            main_text = self.extract_main_text_for_semantics(html)
+        query_emb = self.prepare_query(query, query_variants)
+        scores = [0.0] * len(serp_results)
+
+        # Pass 1: main text per result, remembering which result it belongs to
+        indices = []
+        texts = []
+        for i, result in enumerate(serp_results):
+            # Main text extracted during SERP enrichment, if present
+            main_text = result.get("semantic_text", "")
+            if not main_text:
+                html = result.get(html_column, "")
+                if not html:
+                    # Fallback: try to fetch if URL is available
+                    url = result.get("url", "")
+                    if not url:
+                        continue
+                    try:
+                        import requests
+                        resp = requests.get(url, timeout=10, headers={
+                            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+                        })
+                        html = resp.text
+                    except Exception:
+                        continue
+                
+                main_text = self.extract_main_text_for_semantics(html)
             if not main_text.strip():
-                scores.append(0.0)
                 continue
-            
-            try:
-                doc_emb = self.model.encode(main_text, normalize_embeddings=True)
-                score = cosine_sim(query_emb, doc_emb)
-                scores.append(max(0.0, min(1.0, score)))  # Clamp to [0, 1]
-            except Exception as e:
-                print(f"Error encoding document for semantic score: {e}")
-                scores.append(0.0)
+            indices.append(i)
+            texts.append(main_text)
+
+        if not texts:
+            return scores
+
+        # Pass 2: one encode call for every uncached document, then cosine against the query in one matmul
+        try:
+            doc_embs = self._encode_documents(texts)
+        except Exception as e:
+            print(f"Error encoding documents for semantic score: {e}")
+            return scores
+
+        # Single float32 GEMV (model-native dtype, no upcast); both unit-norm, so this is the cosine
+        sims = doc_embs.astype(np.float32, copy=False) @ query_emb.astype(np.float32, copy=False)
+        np.clip(sims, 0.0, 1.0, out=sims)  # Clamp to [0, 1]
+        for i, score in zip(indices, sims.tolist()):
+            scores[i] = score
         
         return scores
     
@@ -130,7 +419,8 @@ class SemanticService:
         self,
         query: str,
         html: str,
-        query_variants: Optional[List[str]] = None
+        query_variants: Optional[List[str]] = None,
+        query_emb: Optional[np.ndarray] = None
     ) -> float:
         """
         Compute semantic similarity score between a query and a document's HTML.
@@ -139,6 +429,8 @@ class SemanticService:
             query: Search query
             html: Document HTML content
             query_variants: Optional query variants for better intent representation
+            query_emb: Embedding from prepare_query(query, query_variants), if
+                already computed (skips re-embedding the query)
             
         Returns:
             Semantic similarity score (0-1)
@@ -147,8 +439,9 @@ class SemanticService:
             return 0.0
         
         try:
-            # Get query embedding
-            query_emb = self.get_query_embedding(query, query_variants)
+            # Get query embedding (unless the caller prepared it)
+            if query_emb is None:
+                query_emb = self.prepare_query(query, query_variants)
             
             # Extract main text from HTML
             main_text = self.extract_main_text_for_semantics(html)
@@ -156,10 +449,10 @@ class SemanticService:
                 return 0.0
             
             # Get document embedding
-            doc_emb = self.model.encode(main_text, normalize_embeddings=True)
+            doc_emb = self._encode_documents([main_text])[0]
             
-            # Compute cosine similarity
-            score = cosine_sim(query_emb, doc_emb)
+            # Cosine similarity (both embeddings are unit-norm)
+            score = float(query_emb @ doc_emb)
             return max(0.0, min(1.0, score))  # Clamp to [0, 1]
         except Exception as e:
             print(f"Error computing semantic score: {e}")
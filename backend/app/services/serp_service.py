@@ -1,13 +1,107 @@
 """
 SERP Service - Fetch and enrich SERP data (based on notebook)
 """
+import asyncio
 import requests
 import re
+import weakref
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Dict, List, Optional
 from urllib.parse import urlparse
 from bs4 import BeautifulSoup
-from app.config import SERPAPI_KEY, SERANKING_KEY, SERP_RESULTS_COUNT, TOP_N_POSITIONS
+from requests.adapters import HTTPAdapter
+from app.config import SERPAPI_KEY, SERANKING_KEY, SERP_RESULTS_COUNT, TOP_N_POSITIONS, USE_SELECTOLAX
+
+# Optional C HTML parser, much faster than BeautifulSoup. Used only with USE_SELECTOLAX
+# (not in requirements): BeautifulSoup stays the default the trained features came from.
+HTMLParser = None
+if USE_SELECTOLAX:
+    try:
+        from selectolax.parser import HTMLParser
+    except ImportError:
+        print("USE_SELECTOLAX is set but selectolax is not installed, using BeautifulSoup")
+
+# HTTP/2 for the async client needs the h2 package (`pip install httpx[http2]`)
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Concurrent page / SE Ranking requests while enriching SERP results
+ENRICH_MAX_WORKERS = 10
+
+# Pooled connections per host for the shared session
+HTTP_POOL_SIZE = 32
+
+# Connection limit of the shared async client (all URLs x 3 requests fan out at once)
+ASYNC_HTTP_MAX_CONNECTIONS = 64
+
+SERANKING_DT_ENDPOINT = "https://api.seranking.com/v1/backlinks/authority/domain"
+SERANKING_RD_ENDPOINT = "https://api.seranking.com/v1/backlinks/refdomains/count"
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_HAS_LETTER_RE = re.compile(r'[a-zA-Z]')
+_SENTENCE_END_RE = re.compile(r'[.!?]+')
+_SCHEMA_TYPE_RE = re.compile(r'"@type"\s*:\s*"([^"]+)"')
+
+# Elements dropped before counting words on a page
+NON_CONTENT_TAGS = ['script', 'style', 'nav', 'header', 'footer', 'aside', 'noscript']
+
+BROWSER_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+}
+
+_session = None
+# httpx clients are tied to the event loop they were created on - one per loop
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_http_session() -> requests.Session:
+    """Shared requests.Session (lazy singleton) so TCP/TLS connections are reused across fetches"""
+    global _session
+    if _session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        _session = session
+    return _session
+
+
+def get_async_http_client():
+    """
+    Shared httpx.AsyncClient for page / SE Ranking requests (HTTP/2 when h2 is
+    installed), created lazily for each running event loop
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        import httpx
+        client = httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE,
+            follow_redirects=True,
+            timeout=10,
+            limits=httpx.Limits(max_connections=ASYNC_HTTP_MAX_CONNECTIONS)
+        )
+        _async_clients[loop] = client
+    return client
+
+
+async def aclose_async_http_client():
+    """Close the running loop's page / SE Ranking client (app shutdown)"""
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+def _float_or_nan(value) -> float:
+    """float(value), or NaN for anything that does not convert (None, "n/a", ...)"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float("nan")
 
 
 def extract_domain(url: str) -> str:
@@ -19,20 +113,35 @@ def extract_domain(url: str) -> str:
         return ""
 
 
-def get_domain_trust(url: str, seranking_key: str) -> float:
-    """Fetch Domain Trust (DT) from SE Ranking."""
-    domain = extract_domain(url)
-    if not domain or not seranking_key:
-        return np.nan
+def _domain_trust_params(domain: str, seranking_key: str) -> Dict:
+    return {
+        "apikey": seranking_key,
+        "target": domain,
+        "output": "json",
+    }
+
 
-    endpoint = "https://api.seranking.com/v1/backlinks/authority/domain"
-    params = {
+def _referring_domains_params(domain: str, seranking_key: str) -> Dict:
+    return {
         "apikey": seranking_key,
         "target": domain,
+        "mode": "domain",
         "output": "json",
     }
+
+
+def get_domain_trust(url: str, seranking_key: str) -> float:
+    """Fetch Domain Trust (DT) from SE Ranking."""
+    return get_domain_trust_by_domain(extract_domain(url), seranking_key)
+
+
+def get_domain_trust_by_domain(domain: str, seranking_key: str) -> float:
+    """Domain Trust of a bare domain (see extract_domain)"""
+    if not domain or not seranking_key:
+        return np.nan
+
     try:
-        r = requests.get(endpoint, params=params, timeout=10)
+        r = get_http_session().get(SERANKING_DT_ENDPOINT, params=_domain_trust_params(domain, seranking_key), timeout=10)
         data = r.json()
         return data.get("pages", [{}])[0].get("domain_inlink_rank", np.nan)
     except Exception:
@@ -41,19 +150,42 @@ def get_domain_trust(url: str, seranking_key: str) -> float:
 
 def get_referring_domains(url: str, seranking_key: str) -> float:
     """Fetch number of referring domains from SE Ranking."""
-    domain = extract_domain(url)
+    return get_referring_domains_by_domain(extract_domain(url), seranking_key)
+
+
+def get_referring_domains_by_domain(domain: str, seranking_key: str) -> float:
+    """Referring domains of a bare domain (see extract_domain)"""
     if not domain or not seranking_key:
         return np.nan
 
-    endpoint = "https://api.seranking.com/v1/backlinks/refdomains/count"
-    params = {
-        "apikey": seranking_key,
-        "target": domain,
-        "mode": "domain",
-        "output": "json",
-    }
     try:
-        r = requests.get(endpoint, params=params, timeout=10)
+        r = get_http_session().get(SERANKING_RD_ENDPOINT, params=_referring_domains_params(domain, seranking_key), timeout=10)
+        data = r.json()
+        return data.get("metrics", [{}])[0].get("refdomains", np.nan)
+    except Exception:
+        return np.nan
+
+
+async def aget_domain_trust(client, domain: str, seranking_key: str) -> float:
+    """get_domain_trust_by_domain on an httpx.AsyncClient"""
+    if not domain or not seranking_key:
+        return np.nan
+
+    try:
+        r = await client.get(SERANKING_DT_ENDPOINT, params=_domain_trust_params(domain, seranking_key))
+        data = r.json()
+        return data.get("pages", [{}])[0].get("domain_inlink_rank", np.nan)
+    except Exception:
+        return np.nan
+
+
+async def aget_referring_domains(client, domain: str, seranking_key: str) -> float:
+    """get_referring_domains_by_domain on an httpx.AsyncClient"""
+    if not domain or not seranking_key:
+        return np.nan
+
+    try:
+        r = await client.get(SERANKING_RD_ENDPOINT, params=_referring_domains_params(domain, seranking_key))
         data = r.json()
         return data.get("metrics", [{}])[0].get("refdomains", np.nan)
     except Exception:
@@ -91,64 +223,113 @@ def count_syllables(word: str) -> int:
     return max(1, count)
 
 
+def text_stats(text: str) -> tuple:
+    """(word_count, sentence_count, total_syllables) of page text"""
+    # Filter to only alphanumeric words (remove punctuation-only tokens)
+    words = [w for w in text.split() if _HAS_LETTER_RE.search(w)]
+    return len(words), len(_SENTENCE_END_RE.findall(text)), sum(count_syllables(w) for w in words)
+
+
 def extract_content_features(url: str) -> tuple:
     """
     Extract content features from URL using trafilatura for accurate content extraction.
     Falls back to BeautifulSoup if trafilatura is not available.
     Returns: word_count, sentence_count, avg_words_per_sentence, flesch_score, html
     """
-    text = None
-    html = ""
+    return parse_content_features(url, fetch_html(url))
 
+
+def fetch_html(url: str) -> str:
+    """
+    Download a page (I/O only): trafilatura's fetcher first, then the shared
+    session. Returns "" if both fail.
+    """
     try:
+        import trafilatura
+        downloaded = trafilatura.fetch_url(url)
+        if downloaded:
+            return downloaded
+    except ImportError:
+        print("trafilatura not installed, using BeautifulSoup fallback")
+    except Exception as e:
+        print(f"trafilatura error for {url}: {e}")
+
+    try:
+        return get_http_session().get(url, timeout=10, headers=BROWSER_HEADERS).text
+    except Exception as e:
+        print(f"Error fetching {url}: {e}")
+        return ""
+
+
+async def afetch_html(client, url: str) -> str:
+    """
+    Download a page on an httpx.AsyncClient. trafilatura's fetcher is blocking,
+    so it is skipped here; trafilatura still extracts the text when parsing.
+    Returns "" on failure.
+    """
+    try:
+        r = await client.get(url, headers=BROWSER_HEADERS)
+        return r.text
+    except Exception as e:
+        print(f"Error fetching {url}: {e}")
+        return ""
+
+
+def parse_content_features(url: str, html: str) -> tuple:
+    """
+    Content features of an already downloaded page (CPU only), same tuple as
+    extract_content_features
+    """
+    if not html:
+        return 0, 0, 0.0, 0.0, ""
+
+    try:
+        text = None
+
         # Try trafilatura first (best content extraction)
         try:
             import trafilatura
-            downloaded = trafilatura.fetch_url(url)
-            if downloaded:
-                html = downloaded
-                text = trafilatura.extract(downloaded, include_comments=False, include_tables=True)
+            text = trafilatura.extract(html, include_comments=False, include_tables=True)
         except ImportError:
-            print("trafilatura not installed, using BeautifulSoup fallback")
+            pass
         except Exception as e:
             print(f"trafilatura error for {url}: {e}")
 
-        # Fallback to BeautifulSoup if trafilatura didn't work
+        # Fallback to plain HTML text (selectolax with USE_SELECTOLAX, else BeautifulSoup) if trafilatura didn't work
         if not text:
-            resp = requests.get(url, timeout=10, headers={
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-            })
-            html = resp.text
+            if HTMLParser is not None:
+                tree = HTMLParser(html)
 
-            from bs4 import BeautifulSoup
-            soup = BeautifulSoup(html, "html.parser")
+                # Remove non-content elements
+                tree.strip_tags(NON_CONTENT_TAGS)
+
+                # Get text from body
+                body = tree.body or tree.root
+                text = body.text(separator=" ") if body else ""
+            else:
+                soup = BeautifulSoup(html, "html.parser")
 
-            # Remove non-content elements
-            for tag in soup.find_all(['script', 'style', 'nav', 'header', 'footer', 'aside', 'noscript']):
-                tag.decompose()
+                # Remove non-content elements
+                for tag in soup.find_all(NON_CONTENT_TAGS):
+                    tag.decompose()
 
-            # Get text from body
-            body = soup.find('body') or soup
-            text = body.get_text(separator=" ")
-            text = re.sub(r"\s+", " ", text).strip()
+                # Get text from body
+                body = soup.find('body') or soup
+                text = body.get_text(separator=" ")
+            text = _WHITESPACE_RE.sub(" ", text).strip()
 
         if not text:
             return 0, 0, 0.0, 0.0, html
 
-        # Filter to only alphanumeric words (remove punctuation-only tokens)
-        words = [w for w in text.split() if re.search(r'[a-zA-Z]', w)]
-        word_count = len(words)
+        # Words (with a letter), sentence-ending punctuation runs and syllables of ALL words (not sampled)
+        word_count, sentence_count, total_syllables = text_stats(text)
 
-        # Sentence count - look for sentence-ending punctuation
-        sentence_count = len(re.findall(r'[.!?]+', text))
         if sentence_count < 1:
             sentence_count = max(1, word_count // 15)  # Estimate ~15 words per sentence
 
         avg_wps = word_count / sentence_count if sentence_count > 0 else 15
 
-        # Calculate syllables per word for ALL words (not sampled)
         if word_count > 0:
-            total_syllables = sum(count_syllables(w) for w in words)
             avg_syllables_per_word = total_syllables / word_count
         else:
             avg_syllables_per_word = 1.5  # Default fallback
@@ -165,15 +346,27 @@ def extract_content_features(url: str) -> tuple:
         return 0, 0, 0.0, 0.0, ""
 
 
+def parse_page(url: str, html: str) -> tuple:
+    """
+    Content features plus the semantic main text (title + h1 + first
+    paragraphs) of a downloaded page, so semantic scoring need not re-parse it
+    """
+    from app.services.semantic_service import extract_main_text
+
+    return parse_content_features(url, html), extract_main_text(html)
+
+
 def extract_schema_features(html: str) -> tuple:
     """
     Extract schema features (from notebook).
+    Counts every "@type": "..." occurrence in the page (JSON-LD, inline JSON, ...).
     Returns: total_schema_types, unique_schema_types
     """
-    if not html:
+    # Substring check first: most pages without schema skip the regex scan
+    if not html or '"@type"' not in html:
         return 0, 0
 
-    types = re.findall(r'"@type"\s*:\s*"([^"]+)"', html)
+    types = _SCHEMA_TYPE_RE.findall(html)
     if not types:
         return 0, 0
 
@@ -390,65 +583,157 @@ class SERPService:
         Enrich SERP results with content features (from notebook).
         Fetches HTML, extracts features, gets authority metrics.
         Limit to top N results for performance.
+
+        All page downloads and SE Ranking lookups run concurrently on a thread
+        pool; pages are parsed as their downloads complete. SE Ranking is asked
+        once per domain, not once per URL.
         """
+        targets = self._enrich_targets(serp_results, limit)
+        if not targets:
+            return []
+        domains = [extract_domain(url) for _, url in targets]
+
+        features = {}
+        with ThreadPoolExecutor(max_workers=ENRICH_MAX_WORKERS) as executor:
+            html_futures = {executor.submit(fetch_html, url): i for i, (_, url) in enumerate(targets)}
+            dt_futures = {d: executor.submit(get_domain_trust_by_domain, d, self.seranking_key) for d in set(domains)}
+            rd_futures = {d: executor.submit(get_referring_domains_by_domain, d, self.seranking_key) for d in set(domains)}
+
+            # Parse (CPU) each page while the remaining requests are still in flight
+            for future in as_completed(html_futures):
+                i = html_futures[future]
+                try:
+                    features[i] = parse_page(targets[i][1], future.result())
+                except Exception as e:
+                    features[i] = e
+
         enriched = []
+        for i, (result, url) in enumerate(targets):
+            try:
+                if isinstance(features[i], Exception):
+                    raise features[i]
+                dt = dt_futures[domains[i]].result()
+                ref_domains = rd_futures[domains[i]].result()
+                enriched.append(self._enriched_result(result, url, *features[i], dt, ref_domains))
+            except Exception as e:
+                print(f"Error enriching {url}: {e}")
+                enriched.append(self._default_enriched_result(result, url))
         
-        # Only process top N results to speed up
-        for result in serp_results[:limit]:
-            url = result.get("url") or result.get("link", "")
-            if not url:
-                continue
-            
+        return self._fill_missing_authority(enriched)
+
+    async def enrich_serp_results_async(self, serp_results: List[Dict], limit: int = 10) -> List[Dict]:
+        """
+        enrich_serp_results for async callers: the page download and both SE
+        Ranking lookups of every URL go out at once on the shared httpx client
+        (one lookup per domain), and each page is parsed in a worker thread as
+        soon as it arrives.
+        """
+        targets = self._enrich_targets(serp_results, limit)
+        if not targets:
+            return []
+
+        client = get_async_http_client()
+        domains = {extract_domain(url) for _, url in targets}
+        dt_tasks = {d: asyncio.create_task(aget_domain_trust(client, d, self.seranking_key)) for d in domains}
+        rd_tasks = {d: asyncio.create_task(aget_referring_domains(client, d, self.seranking_key)) for d in domains}
+
+        async def enrich_one(url: str) -> tuple:
+            domain = extract_domain(url)
+            html, dt, ref_domains = await asyncio.gather(
+                afetch_html(client, url), dt_tasks[domain], rd_tasks[domain]
+            )
+            features, semantic_text = await asyncio.to_thread(parse_page, url, html)
+            return features, semantic_text, dt, ref_domains
+
+        outcomes = await asyncio.gather(*(enrich_one(url) for _, url in targets), return_exceptions=True)
+
+        enriched = []
+        for (result, url), outcome in zip(targets, outcomes):
             try:
-                # Extract content features (with timeout)
-                wc, sent_c, awps, flesch, html = extract_content_features(url)
-                
-                # Extract schema features
-                schema_total, schema_unique = extract_schema_features(html)
-                
-                # Get authority metrics (with timeout)
-                dt = get_domain_trust(url, self.seranking_key)
-                ref_domains = get_referring_domains(url, self.seranking_key)
-                
-                # Defaults
-                internal_links = 0.0  # Would need to parse HTML for actual count
-                rich_result_features = 0.0  # Would need SERPAPI rich results data
-                
-                enriched.append({
-                    **result,
-                    "url": url,  # Ensure URL is set
-                    "dt": float(dt) if not np.isnan(dt) else 0.0,
-                    "referring_domains": float(ref_domains) if not np.isnan(ref_domains) else 0.0,
-                    "word_count": wc,
-                    "sentence_count": sent_c,
-                    "average_words_per_sentence": awps,
-                    "flesch_reading_ease_score": flesch,
-                    "total_schema_types": schema_total,
-                    "unique_schema_types": schema_unique,
-                    "internal_links": internal_links,
-                    "rich_result_features": rich_result_features,
-                    "raw_html": html,  # Store HTML for semantic analysis
-                })
+                if isinstance(outcome, Exception):
+                    raise outcome
+                enriched.append(self._enriched_result(result, url, *outcome))
             except Exception as e:
                 print(f"Error enriching {url}: {e}")
-                # Add with defaults if enrichment fails
-                enriched.append({
-                    **result,
-                    "url": url,
-                    "dt": 0.0,
-                    "referring_domains": 0.0,
-                    "word_count": 0,
-                    "sentence_count": 0,
-                    "average_words_per_sentence": 0.0,
-                    "flesch_reading_ease_score": 0.0,
-                    "total_schema_types": 0,
-                    "unique_schema_types": 0,
-                    "internal_links": 0.0,
-                    "rich_result_features": 0.0,
-                    "raw_html": "",
-                })
+                enriched.append(self._default_enriched_result(result, url))
+
+        return self._fill_missing_authority(enriched)
+
+    def _enrich_targets(self, serp_results: List[Dict], limit: int) -> List[tuple]:
+        """(result, url) of the top `limit` results that have a URL"""
+        # Only process top N results to speed up
+        targets = []
+        for result in serp_results[:limit]:
+            url = result.get("url") or result.get("link", "")
+            if url:
+                targets.append((result, url))
+        return targets
+
+    def _enriched_result(
+        self, result: Dict, url: str, features: tuple, semantic_text: str, dt: float, ref_domains: float
+    ) -> Dict:
+        """SERP result with its content, schema and authority features"""
+        wc, sent_c, awps, flesch, html = features
+        
+        # Extract schema features
+        schema_total, schema_unique = extract_schema_features(html)
         
+        # Defaults
+        internal_links = 0.0  # Would need to parse HTML for actual count
+        rich_result_features = 0.0  # Would need SERPAPI rich results data
+        
+        return {
+            **result,
+            "url": url,  # Ensure URL is set
+            "dt": dt,  # NaN (lookup failed) becomes 0.0 in _fill_missing_authority
+            "referring_domains": ref_domains,
+            "word_count": wc,
+            "sentence_count": sent_c,
+            "average_words_per_sentence": awps,
+            "flesch_reading_ease_score": flesch,
+            "total_schema_types": schema_total,
+            "unique_schema_types": schema_unique,
+            "internal_links": internal_links,
+            "rich_result_features": rich_result_features,
+            "raw_html": html,  # Store HTML for semantic analysis
+            "semantic_text": semantic_text,  # Main text for semantic scoring (saves a re-parse)
+        }
+
+    def _fill_missing_authority(self, enriched: List[Dict]) -> List[Dict]:
+        """
+        dt / referring_domains as floats, missing or non-numeric (NaN, None, "n/a") ones
+        as 0.0 - one array pass for all rows
+        """
+        if not enriched:
+            return enriched
+        authority = np.asarray(
+            [[_float_or_nan(row["dt"]), _float_or_nan(row["referring_domains"])] for row in enriched],
+            dtype=np.float64
+        )
+        authority = np.nan_to_num(authority, nan=0.0, copy=False)
+        for row, (dt, ref_domains) in zip(enriched, authority.tolist()):
+            row["dt"] = dt
+            row["referring_domains"] = ref_domains
         return enriched
+
+    def _default_enriched_result(self, result: Dict, url: str) -> Dict:
+        """Defaults for a result whose enrichment failed"""
+        return {
+            **result,
+            "url": url,
+            "dt": 0.0,
+            "referring_domains": 0.0,
+            "word_count": 0,
+            "sentence_count": 0,
+            "average_words_per_sentence": 0.0,
+            "flesch_reading_ease_score": 0.0,
+            "total_schema_types": 0,
+            "unique_schema_types": 0,
+            "internal_links": 0.0,
+            "rich_result_features": 0.0,
+            "raw_html": "",
+            "semantic_text": "",
+        }
     
     def calculate_serp_medians(self, enriched_results: List[Dict], top_n: int = None) -> Dict:
         """
@@ -467,20 +752,24 @@ class SERPService:
         if not top_results:
             return self._get_default_medians()
         
-        medians = {}
-        metrics = [
+        metrics = (
             "dt", "referring_domains", "word_count", "sentence_count",
             "average_words_per_sentence", "flesch_reading_ease_score",
             "total_schema_types", "unique_schema_types", "internal_links",
             "rich_result_features"
-        ]
-        
-        for metric in metrics:
-            values = [r.get(metric, 0) for r in top_results if metric in r]
-            if values:
-                medians[metric] = float(np.median(values))
-            else:
-                medians[metric] = 0.0
+        )
+
+        # One (results x metrics) array, all medians in a single np.median call
+        values = np.array([[r.get(metric, np.nan) for metric in metrics] for r in top_results], dtype=np.float64)
+        present = np.array([[metric in r for metric in metrics] for r in top_results])
+        if present.all():
+            medians = dict(zip(metrics, map(float, np.median(values, axis=0))))
+        else:
+            # Some results lack a metric - take its median over the results that have it (0.0 if none do)
+            medians = {
+                metric: float(np.median(values[present[:, j], j])) if present[:, j].any() else 0.0
+                for j, metric in enumerate(metrics)
+            }
 
         # Fallback for flesch: if 0 or too low, use reasonable default
         # This handles cached data from before the fix
@@ -0,0 +1,231 @@
+"""
+Parity tests for the page feature extractors: on fixture HTML the current
+functions must return what the original implementations (copied below as
+_baseline_*) returned, since the trained model was fitted on those features.
+"""
+import re
+import sys
+import unittest
+from unittest import mock
+
+from bs4 import BeautifulSoup
+
+from app.config import SEMANTIC_HTML_MAX_CHARS
+from app.services import semantic_service, serp_service
+from app.services.semantic_service import extract_main_text
+from app.services.serp_service import count_syllables, extract_schema_features, parse_content_features, text_stats
+
+PAGE_URL = "https://example.com/guide"
+
+ARTICLE_PAGE = """<!DOCTYPE html>
+<html>
+<head>
+  <title>How to Brew Pour-Over Coffee | Example</title>
+  <script type="application/ld+json">
+  {"@context": "https://schema.org", "@type": "Article",
+   "author": {"@type": "Person", "name": "Sam"},
+   "publisher": {"@type" : "Organization", "name": "Example"}}
+  </script>
+  <style>p { color: #333; }</style>
+</head>
+<body>
+  <header><a href="/">Home</a> <a href="/shop">Shop</a></header>
+  <nav><ul><li>Guides</li><li>Reviews</li></ul></nav>
+  <h1>How to Brew <em>Pour-Over</em> Coffee</h1>
+  <p>Pour-over coffee takes about four minutes.&nbsp;It rewards&thinsp;patience!</p>
+  <p>Use a 1:16 ratio&emsp;of coffee to water. Grind medium-fine...</p>
+  <p><script>window.__DATA__ = {"@type": "Product", "sku": "kettle-1"};</script>Heat the water to 96 &deg;C.</p>
+  <p>   </p>
+  <p>Bloom the grounds for 30 seconds? Then pour slowly — in circles.</p>
+  <aside>Related: <a href="/espresso">Espresso guide</a></aside>
+  <noscript>Enable JavaScript to see comments.</noscript>
+  <footer>&copy; 2024 Example. All rights reserved.</footer>
+</body>
+</html>"""
+
+MICRODATA_PAGE = """<html>
+<head><title>Best Burr Grinders</title></head>
+<body>
+  <div itemscope itemtype="https://schema.org/Product">
+    <h1 itemprop="name">Best burr grinders of the year</h1>
+    <p>We tested twelve grinders</p>
+    <p>Conical burrs are quieter; flat burrs are more uniform</p>
+    <p>Prices range from $50 to $500</p>
+    <p></p>
+    <p>Our pick: the Model X</p>
+    <p>Runner-up: the Model Y</p>
+    <p>Budget pick: the Model Z</p>
+    <p>This seventh paragraph is past the first five</p>
+  </div>
+  <ul><li>—</li><li>...</li><li>100%</li></ul>
+</body>
+</html>"""
+
+SCRIPT_ONLY_PAGE = """<html><head><title>App</title></head>
+<body><script>{"@type":"WebApplication","name":"App"}</script><noscript>Loading</noscript></body></html>"""
+
+FIXTURE_TEXTS = [
+    "",
+    "Pour-over coffee takes about four minutes. It rewards patience!",
+    "Thin\u2009spaces and em\u2003spaces\u00a0and no-break spaces... still split?",
+    "— ... 100% 1:16 $50 !!! ?",
+    "No sentence punctuation at all just a long run of words",
+    "Ünïcödé wörds, naïve café: résumé; über-fast. Done!?",
+    "Wrapped\nacross\tlines\r\nwith  doubled   spaces.",
+]
+
+FIXTURE_PAGES = {
+    "article": ARTICLE_PAGE,
+    "microdata": MICRODATA_PAGE,
+    "script_only": SCRIPT_ONLY_PAGE,
+    "empty": "",
+}
+
+
+def _baseline_extract_schema_features(html):
+    if not html:
+        return 0, 0
+
+    types = re.findall(r'"@type"\s*:\s*"([^"]+)"', html)
+    if not types:
+        return 0, 0
+
+    total = len(types)
+    unique = len(set(types))
+    return total, unique
+
+
+def _baseline_text_stats(text):
+    words = [w for w in text.split() if re.search(r'[a-zA-Z]', w)]
+    sentence_count = len(re.findall(r'[.!?]+', text))
+    return len(words), sentence_count, sum(count_syllables(w) for w in words)
+
+
+class TextStatsParityTest(unittest.TestCase):
+    def test_matches_baseline(self):
+        for text in FIXTURE_TEXTS:
+            with self.subTest(text=text):
+                self.assertEqual(text_stats(text), _baseline_text_stats(text))
+
+    def test_counts(self):
+        # "Pour-over" is one word; "!" and "." each end a sentence
+        self.assertEqual(text_stats(FIXTURE_TEXTS[1])[:2], (9, 2))
+        self.assertEqual(text_stats(FIXTURE_TEXTS[3]), (0, 3, 0))
+
+
+def _baseline_content_features(html):
+    """BeautifulSoup branch of the original extract_content_features, minus the download"""
+    soup = BeautifulSoup(html, "html.parser")
+    for tag in soup.find_all(['script', 'style', 'nav', 'header', 'footer', 'aside', 'noscript']):
+        tag.decompose()
+    body = soup.find('body') or soup
+    text = re.sub(r"\s+", " ", body.get_text(separator=" ")).strip()
+
+    if not text:
+        return 0, 0, 0.0, 0.0, html
+
+    words = [w for w in text.split() if re.search(r'[a-zA-Z]', w)]
+    word_count = len(words)
+
+    sentence_count = len(re.findall(r'[.!?]+', text))
+    if sentence_count < 1:
+        sentence_count = max(1, word_count // 15)
+
+    avg_wps = word_count / sentence_count if sentence_count > 0 else 15
+
+    if word_count > 0:
+        total_syllables = sum(count_syllables(w) for w in words)
+        avg_syllables_per_word = total_syllables / word_count
+    else:
+        avg_syllables_per_word = 1.5
+
+    flesch = 206.835 - 1.015 * avg_wps - 84.6 * avg_syllables_per_word
+    flesch = max(min(flesch, 100), 0)
+
+    return word_count, sentence_count, avg_wps, flesch, html
+
+
+def _without_trafilatura():
+    """Make `import trafilatura` fail so the HTML-parser fallback runs"""
+    return mock.patch.dict(sys.modules, {"trafilatura": None})
+
+
+class ParseContentFeaturesParityTest(unittest.TestCase):
+    def test_beautifulsoup_path_matches_baseline(self):
+        with _without_trafilatura(), mock.patch.object(serp_service, "HTMLParser", None):
+            for name, html in FIXTURE_PAGES.items():
+                with self.subTest(page=name):
+                    self.assertEqual(parse_content_features(PAGE_URL, html), _baseline_content_features(html))
+
+    @unittest.skipUnless(serp_service.HTMLParser is not None, "USE_SELECTOLAX off or selectolax not installed")
+    def test_selectolax_path_matches_beautifulsoup_path(self):
+        with _without_trafilatura():
+            for name, html in FIXTURE_PAGES.items():
+                with self.subTest(page=name):
+                    with mock.patch.object(serp_service, "HTMLParser", None):
+                        expected = parse_content_features(PAGE_URL, html)
+                    self.assertEqual(parse_content_features(PAGE_URL, html), expected)
+
+
+def _baseline_extract_main_text(html):
+    """The original SemanticService.extract_main_text_for_semantics"""
+    if not html:
+        return ""
+
+    soup = BeautifulSoup(html, "html.parser")
+    title = soup.title.get_text(" ", strip=True) if soup.title else ""
+    h1 = soup.find("h1")
+    h1_text = h1.get_text(" ", strip=True) if h1 else ""
+
+    p_texts = []
+    for p in soup.find_all("p"):
+        t = p.get_text(" ", strip=True)
+        if not t:
+            continue
+        p_texts.append(t)
+        if len(p_texts) >= 5:
+            break
+
+    main_text = " ".join([title, h1_text] + p_texts).strip()
+    return main_text[:4000]
+
+
+class ExtractMainTextParserTest(unittest.TestCase):
+    def test_beautifulsoup_path_matches_baseline(self):
+        with mock.patch.object(semantic_service, "HTMLParser", None):
+            for name, html in FIXTURE_PAGES.items():
+                with self.subTest(page=name):
+                    self.assertEqual(extract_main_text(html), _baseline_extract_main_text(html))
+
+    def test_size_cap_keeps_leading_content(self):
+        # Past the cap, a long page tail changes nothing: title, h1 and the first paragraphs come first
+        tail = "<div>" + "<span>footer link</span>" * (SEMANTIC_HTML_MAX_CHARS // 20) + "</div>"
+        html = ARTICLE_PAGE.replace("</body>", tail + "</body>")
+        self.assertGreater(len(html), SEMANTIC_HTML_MAX_CHARS)
+
+        with mock.patch.object(semantic_service, "HTMLParser", None):
+            self.assertEqual(extract_main_text(html), _baseline_extract_main_text(html))
+
+    @unittest.skipUnless(semantic_service.HTMLParser is not None, "USE_SELECTOLAX off or selectolax not installed")
+    def test_selectolax_path_matches_beautifulsoup_path(self):
+        for name, html in FIXTURE_PAGES.items():
+            with self.subTest(page=name):
+                with mock.patch.object(semantic_service, "HTMLParser", None):
+                    expected = extract_main_text(html)
+                self.assertEqual(extract_main_text(html), expected)
+
+
+class ExtractSchemaFeaturesParityTest(unittest.TestCase):
+    def test_matches_baseline(self):
+        for name, html in FIXTURE_PAGES.items():
+            with self.subTest(page=name):
+                self.assertEqual(extract_schema_features(html), _baseline_extract_schema_features(html))
+
+    def test_counts_json_ld_and_inline_json(self):
+        # Article, Person, Organization (JSON-LD) and Product (inline script)
+        self.assertEqual(extract_schema_features(ARTICLE_PAGE), (4, 4))
+        self.assertEqual(extract_schema_features(MICRODATA_PAGE), (0, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+"""Smoke tests for batched intent analysis with a mocked OpenAI call"""
+import json
+import unittest
+from unittest import mock
+
+from app.services.intent_service import INTENT_BATCH_SIZE, IntentService
+
+
+def _intent(intent_type, content_format, index=None):
+    result = {
+        "intent_type": intent_type,
+        "content_format": content_format,
+        "query_variants": [],
+        "reasoning": "",
+    }
+    if index is not None:
+        result["index"] = index
+    return result
+
+
+SERP = [{"title": "A title", "snippet": "A snippet"}]
+
+
+class AnalyzeIntentBatchTest(unittest.TestCase):
+    def setUp(self):
+        self.service = IntentService()
+        self.service.openai_api_key = "test-key"
+        self.service.huggingface_api_key = None
+
+    def test_one_request_per_batch_in_input_order(self):
+        keywords = ["how to brew coffee", "best espresso machine", "buy coffee beans"]
+        response = json.dumps([
+            _intent("informational", "how-to", 0),
+            _intent("commercial", "product", 1),
+            _intent("transactional", "product", 2),
+        ])
+        with mock.patch.object(IntentService, "_call_openai", return_value=response) as call:
+            results = self.service.analyze_intent_batch(keywords, [SERP] * len(keywords))
+
+        call.assert_called_once()
+        self.assertEqual(call.call_args.kwargs["max_tokens"], 500 * len(keywords))
+        self.assertEqual(
+            [r["intent_type"] for r in results],
+            ["informational", "commercial", "transactional"],
+        )
+
+    def test_splits_into_batches(self):
+        keywords = [f"keyword {i}" for i in range(INTENT_BATCH_SIZE + 2)]
+
+        def respond(prompt, max_tokens=500, timeout=30):
+            return json.dumps({"results": [_intent("informational", "article", i) for i in range(max_tokens // 500)]})
+
+        with mock.patch.object(IntentService, "_call_openai", side_effect=respond) as call:
+            results = self.service.analyze_intent_batch(keywords, [SERP] * len(keywords))
+
+        self.assertEqual(call.call_count, 2)
+        self.assertEqual(len(results), len(keywords))
+
+    def test_missing_entries_fall_back_to_single_analysis(self):
+        keywords = ["first keyword", "second keyword", "third keyword"]
+        response = "Here you go:\n" + json.dumps([_intent("commercial", "comparison", 0)])
+        single = _intent("navigational", "article")
+        with mock.patch.object(IntentService, "_call_openai", return_value=response), \
+                mock.patch.object(IntentService, "analyze_intent", return_value=single) as analyze:
+            results = self.service.analyze_intent_batch(keywords, [SERP] * len(keywords))
+
+        self.assertEqual(results[0]["intent_type"], "commercial")
+        self.assertEqual(results[1:], [single, single])
+        self.assertEqual(
+            [c.args[0] for c in analyze.call_args_list], ["second keyword", "third keyword"]
+        )
+
+    def test_routes_by_index_not_position(self):
+        keywords = ["first keyword", "second keyword", "third keyword", "fourth keyword"]
+        # Out of order, keyword 1 missing, keyword 3 answered twice and one entry without an index
+        response = json.dumps([
+            _intent("transactional", "product", 2),
+            _intent("commercial", "comparison", 3),
+            _intent("informational", "how-to", 0),
+            _intent("commercial", "list", 3),
+            _intent("navigational", "article"),
+        ])
+        single = _intent("navigational", "article")
+        with mock.patch.object(IntentService, "_call_openai", return_value=response), \
+                mock.patch.object(IntentService, "analyze_intent", return_value=single) as analyze:
+            results = self.service.analyze_intent_batch(keywords, [SERP] * len(keywords))
+
+        self.assertEqual(results[0], _intent("informational", "how-to"))
+        self.assertEqual(results[2], _intent("transactional", "product"))
+        self.assertEqual(results[1], single)
+        self.assertEqual(results[3], single)
+        self.assertEqual(
+            [c.args[0] for c in analyze.call_args_list], ["second keyword", "fourth keyword"]
+        )
+
+    def test_without_api_key_uses_rule_based_fallback(self):
+        self.service.openai_api_key = None
+        with mock.patch.object(IntentService, "_call_openai") as call:
+            results = self.service.analyze_intent_batch(
+                ["how to brew coffee", "best espresso machine"], [SERP, SERP]
+            )
+
+        call.assert_not_called()
+        self.assertEqual(
+            [r["content_format"] for r in results], ["how-to", "product"]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
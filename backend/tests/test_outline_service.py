@@ -0,0 +1,193 @@
+"""Smoke tests for batched and concurrent brief and plan generation with mocked LLM calls"""
+import asyncio
+import json
+import unittest
+from unittest import mock
+
+from app.services.outline_service import (
+    BRIEF_MAX_TOKENS, LLM_CONTEXT_TOKENS, LLM_MAX_OUTPUT_TOKENS, OUTLINE_BATCH_SIZE, OutlineService,
+    get_llm_semaphore
+)
+
+
+def _brief(title, **extra):
+    """Minimal brief JSON that passes BRIEF_SCHEMA"""
+    brief = {
+        "title_recommendation": title,
+        "meta_description": "",
+        "content_strategy": {},
+        "search_intent": {},
+        "questions_to_answer": [],
+        "outline": {"sections": [{"h2": f"{title} basics"}]},
+        "semantic_coverage": {},
+        "serp_optimization": {},
+        "competitive_gaps": {},
+    }
+    brief.update(extra)
+    return brief
+
+
+def _request(keyword):
+    return {
+        "keyword": keyword,
+        "serp_results": [{"title": f"{keyword} result", "url": "https://example.com", "snippet": "A snippet."}],
+        "serp_medians": {"word_count": 1500, "flesch_reading_ease_score": 60},
+        "intent_analysis": {"intent_type": "informational", "content_format": "article"},
+    }
+
+
+def _claude_service():
+    service = OutlineService()
+    service.anthropic_api_key = "test-key"
+    service.active_provider = "claude"
+    service.race_providers = False
+    return service
+
+
+class _OutlineServiceTestCase(unittest.TestCase):
+    def setUp(self):
+        self.service = _claude_service()
+
+
+class GenerateOutlineBatchTest(_OutlineServiceTestCase):
+    def test_one_request_per_batch_in_input_order(self):
+        keywords = ["coffee grinders", "espresso beans", "pour over"]
+        response = json.dumps({"briefs": [_brief(kw, index=i) for i, kw in enumerate(keywords)]})
+        with mock.patch.object(OutlineService, "_call_claude", return_value=response) as call:
+            briefs = self.service.generate_outline_batch([_request(kw) for kw in keywords])
+
+        call.assert_called_once()
+        self.assertEqual([b["keyword"] for b in briefs], keywords)
+        self.assertEqual([b["title_recommendation"] for b in briefs], keywords)
+        self.assertEqual(briefs[0]["sections"][0]["heading"], "coffee grinders basics")
+
+    def test_routes_by_index_and_falls_back_for_missing_briefs(self):
+        keywords = ["coffee grinders", "espresso beans", "pour over"]
+        # Out of order, keyword 1 missing and a schema-invalid entry for keyword 0
+        batch_response = json.dumps({"briefs": [
+            _brief("pour over", index=2),
+            {"index": 0, "title_recommendation": "incomplete"},
+            _brief("coffee grinders", index=0),
+        ]})
+        single_response = json.dumps(_brief("espresso beans"))
+        with mock.patch.object(
+            OutlineService, "_call_claude", side_effect=[batch_response, single_response]
+        ) as call:
+            briefs = self.service.generate_outline_batch([_request(kw) for kw in keywords])
+
+        self.assertEqual(call.call_count, 2)
+        self.assertEqual(call.call_args_list[0].kwargs["max_tokens"], BRIEF_MAX_TOKENS["claude"] * 3)
+        self.assertEqual([b["title_recommendation"] for b in briefs], keywords)
+        self.assertEqual([b["keyword"] for b in briefs], keywords)
+
+    def test_requires_a_provider(self):
+        self.service.active_provider = None
+        with self.assertRaises(Exception):
+            self.service.generate_outline_batch([_request("coffee grinders")])
+
+
+class GenerateOutlinesAsyncTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.service = _claude_service()
+
+    async def test_results_in_input_order_with_failures_returned(self):
+        keywords = ["coffee grinders", "espresso beans", "pour over"]
+
+        async def respond(prompt_parts, cached_prefix=None, provider=None):
+            prompt = "".join(prompt_parts)
+            if "espresso beans" in prompt:
+                raise RuntimeError("provider error")
+            return json.dumps(_brief(next(kw for kw in keywords if kw in prompt)))
+
+        with mock.patch.object(OutlineService, "_acall_llm", side_effect=respond) as call, \
+                self.assertLogs("app.services.outline_service", level="ERROR"):
+            results = await self.service.generate_outlines_async(
+                [dict(_request(kw), use_cache=False) for kw in keywords]
+            )
+
+        self.assertEqual(call.await_count, 3)
+        self.assertEqual(results[0]["title_recommendation"], "coffee grinders")
+        self.assertIsInstance(results[1], Exception)
+        self.assertEqual(results[2]["title_recommendation"], "pour over")
+
+
+class LlmSemaphoreTest(unittest.TestCase):
+    def test_one_semaphore_per_event_loop(self):
+        async def semaphores():
+            return get_llm_semaphore("claude"), get_llm_semaphore("claude"), get_llm_semaphore("openai")
+
+        first_claude, same_claude, openai = asyncio.run(semaphores())
+        next_loop_claude, _, _ = asyncio.run(semaphores())
+
+        self.assertIs(first_claude, same_claude)
+        self.assertIsNot(first_claude, openai)
+        self.assertIsNot(first_claude, next_loop_claude)
+
+
+class GenerateOptimizationPlansBatchTest(_OutlineServiceTestCase):
+    def setUp(self):
+        super().setUp()
+        # Keep the persistent plan cache out of the test
+        for name, value in (("_lookup_cached_plan", None), ("_store_cached_plan", None)):
+            patcher = mock.patch.object(OutlineService, name, return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _page_request(self, keyword, url):
+        existing_content = {"url": url, "word_count": 900, "flesch_reading_ease_score": 55, "page_text": "Some text."}
+        return dict(_request(keyword), existing_content=existing_content)
+
+    def test_plans_in_input_order_with_fallbacks(self):
+        requests_list = [
+            self._page_request("coffee grinders", "https://example.com/grinders"),
+            _request("espresso beans"),
+            self._page_request("pour over", "https://example.com/pour-over"),
+        ]
+        plan = {"title_recommendation": "Better grinders", "outline": {"sections": [{"h2": "Burrs", "status": "ADD"}]}}
+        with mock.patch("app.services.outline_service.BatchProcessor") as processor, \
+                self.assertLogs("app.services.outline_service", level="WARNING"):
+            processor.return_value.run.return_value = {"plan-0": json.dumps(plan), "plan-2": None}
+            plans = self.service.generate_optimization_plans_batch(requests_list, poll_interval=0)
+
+        processor.assert_called_once_with("claude", "test-key", 0)
+        self.assertEqual(sorted(processor.return_value.run.call_args.args[0]), ["plan-0", "plan-2"])
+
+        self.assertEqual(plans[0]["title_recommendation"], "Better grinders")
+        self.assertEqual(plans[0]["sections"][0]["status"], "ADD")
+        # No existing content - basic structure without a batch request
+        self.assertEqual(plans[1]["sections"], [])
+        self.assertNotIn("existing_url", plans[1])
+        # Failed in the batch - rule-based fallback plan
+        self.assertEqual(plans[2]["existing_url"], "https://example.com/pour-over")
+        self.assertEqual(plans[2]["content_strategy"]["word_count_action"], "INCREASE")
+
+
+class PackBriefBatchesTest(_OutlineServiceTestCase):
+    def test_caps_keywords_per_batch(self):
+        items = [{"keyword": str(i), "tokens": 100} for i in range(OUTLINE_BATCH_SIZE + 2)]
+        batches = self.service._pack_brief_batches(items)
+
+        self.assertEqual([len(b) for b in batches], [OUTLINE_BATCH_SIZE, 2])
+        self.assertEqual([item for batch in batches for item in batch], items)
+
+    def test_caps_by_provider_output_limit(self):
+        self.service.active_provider = "openai"
+        items = [{"keyword": str(i), "tokens": 100} for i in range(OUTLINE_BATCH_SIZE)]
+        max_briefs = LLM_MAX_OUTPUT_TOKENS["openai"] // BRIEF_MAX_TOKENS["openai"]
+
+        batches = self.service._pack_brief_batches(items)
+
+        self.assertTrue(all(len(b) <= max_briefs for b in batches))
+        self.assertEqual(sum(len(b) for b in batches), len(items))
+
+    def test_closes_batch_before_context_overflow(self):
+        large = LLM_CONTEXT_TOKENS["claude"] // 2
+        items = [{"keyword": str(i), "tokens": large} for i in range(3)]
+
+        batches = self.service._pack_brief_batches(items)
+
+        self.assertEqual([len(b) for b in batches], [1, 1, 1])
+
+
+if __name__ == "__main__":
+    unittest.main()
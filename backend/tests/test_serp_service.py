@@ -0,0 +1,141 @@
+"""Smoke tests for async SERP enrichment with a fake HTTP client"""
+import contextlib
+import io
+import unittest
+from unittest import mock
+
+from app.services import serp_service
+from app.services.serp_service import SERANKING_DT_ENDPOINT, SERANKING_RD_ENDPOINT, SERPService
+
+DOMAIN_TRUST = {"a.com": 42, "b.com": None}
+REFERRING_DOMAINS = {"a.com": 7, "b.com": 3}
+
+SERP_RESULTS = [
+    {"title": "A one", "url": "https://a.com/one"},
+    {"title": "No URL"},
+    {"title": "B", "link": "https://b.com/page"},
+    {"title": "A two", "url": "https://a.com/two"},
+    {"title": "Broken", "url": "https://a.com/broken"},
+]
+
+
+class _Response:
+    def __init__(self, text="", data=None):
+        self.text = text
+        self._data = data
+
+    def json(self):
+        return self._data
+
+
+def _page_html(url):
+    if url.endswith("/broken"):
+        raise ConnectionError("connection reset")
+    return f"<html><body><p>Page {url}.</p></body></html>"
+
+
+def _domain_trust(domain, seranking_key):
+    return float("nan") if DOMAIN_TRUST[domain] is None else DOMAIN_TRUST[domain]
+
+
+def _referring_domains(domain, seranking_key):
+    return REFERRING_DOMAINS[domain]
+
+
+class _FakeAsyncClient:
+    """Answers page and SE Ranking requests the way httpx.AsyncClient.get would"""
+
+    def __init__(self):
+        self.requests = []
+
+    async def get(self, url, params=None, headers=None):
+        self.requests.append((url, params))
+        if url == SERANKING_DT_ENDPOINT:
+            return _Response(data={"pages": [{"domain_inlink_rank": DOMAIN_TRUST[params["target"]]}]})
+        if url == SERANKING_RD_ENDPOINT:
+            return _Response(data={"metrics": [{"refdomains": REFERRING_DOMAINS[params["target"]]}]})
+        return _Response(text=_page_html(url))
+
+
+def _parse_page(url, html):
+    """Stand-in for parse_page: deterministic features, fails on an empty page"""
+    if not html:
+        raise ValueError("empty page")
+    return (len(html.split()), 1, float(len(html.split())), 60.0, html), f"main text of {url}"
+
+
+def _fetch_html(url):
+    try:
+        return _page_html(url)
+    except ConnectionError:
+        return ""
+
+
+class EnrichSerpResultsAsyncTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.service = SERPService()
+        self.service.seranking_key = "test-key"
+        self.client = _FakeAsyncClient()
+        for target, value in (("get_async_http_client", mock.Mock(return_value=self.client)),
+                              ("parse_page", _parse_page)):
+            patcher = mock.patch.object(serp_service, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    async def _enrich(self):
+        # Page errors are reported with print
+        with contextlib.redirect_stdout(io.StringIO()):
+            return await self.service.enrich_serp_results_async(SERP_RESULTS, limit=5)
+
+    async def test_rows_in_input_order_with_authority(self):
+        enriched = await self._enrich()
+
+        self.assertEqual(
+            [row["url"] for row in enriched],
+            ["https://a.com/one", "https://b.com/page", "https://a.com/two", "https://a.com/broken"],
+        )
+        self.assertEqual(enriched[0]["semantic_text"], "main text of https://a.com/one")
+        self.assertEqual((enriched[0]["dt"], enriched[0]["referring_domains"]), (42.0, 7.0))
+        # Missing domain trust becomes 0.0
+        self.assertEqual((enriched[1]["dt"], enriched[1]["referring_domains"]), (0.0, 3.0))
+        # A failed page gets the default row
+        self.assertEqual(enriched[3]["word_count"], 0)
+        self.assertEqual(enriched[3]["semantic_text"], "")
+
+    async def test_one_seranking_lookup_per_domain(self):
+        await self._enrich()
+
+        lookups = [(url, params["target"]) for url, params in self.client.requests if params]
+        self.assertEqual(len(lookups), 4)
+        self.assertEqual(len(set(lookups)), 4)
+
+    async def test_matches_sync_enrichment(self):
+        enriched = await self._enrich()
+
+        with mock.patch.object(serp_service, "fetch_html", _fetch_html), \
+                mock.patch.object(serp_service, "get_domain_trust_by_domain", _domain_trust), \
+                mock.patch.object(serp_service, "get_referring_domains_by_domain", _referring_domains), \
+                contextlib.redirect_stdout(io.StringIO()):
+            expected = self.service.enrich_serp_results(SERP_RESULTS, limit=5)
+
+        self.assertEqual(enriched, expected)
+
+
+class FillMissingAuthorityTest(unittest.TestCase):
+    def test_missing_and_non_numeric_values_become_zero(self):
+        enriched = [
+            {"dt": "n/a", "referring_domains": "12"},
+            {"dt": 5, "referring_domains": None},
+            {"dt": float("nan"), "referring_domains": {"refdomains": 3}},
+        ]
+
+        SERPService()._fill_missing_authority(enriched)
+
+        self.assertEqual(
+            [(row["dt"], row["referring_domains"]) for row in enriched],
+            [(0.0, 12.0), (5.0, 0.0), (0.0, 0.0)],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
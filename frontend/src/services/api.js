@@ -133,6 +133,50 @@ export const outlineAPI = {
     return response.data;
   },
 
+  // Streams brief fields as the LLM produces them; onEvent receives
+  // {type: 'field', key, value} events and resolves with the final outline
+  generateOutlineStream: async (keywordId, contentType, onEvent, existingUrl = null, targetIntent = null, existingContent = null, forceRefresh = false) => {
+    const token = Cookies.get('auth_token');
+    const response = await fetch(`${API_BASE_URL}/api/outline/generate/stream`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        ...(token ? { Authorization: `Bearer ${token}` } : {}),
+      },
+      body: JSON.stringify({
+        keyword_id: keywordId,
+        content_type: contentType,
+        existing_url: existingUrl,
+        target_intent: targetIntent,
+        existing_content: existingContent,
+        force_refresh: forceRefresh
+      }),
+    });
+    if (!response.ok) {
+      const error = await response.json().catch(() => ({}));
+      throw new Error(error.detail || `Request failed with status ${response.status}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      const lines = buffer.split('\n');
+      buffer = lines.pop();
+      for (const line of lines) {
+        if (!line.trim()) continue;
+        const event = JSON.parse(line);
+        if (event.type === 'error') throw new Error(event.detail);
+        if (event.type === 'complete') return event.outline;
+        onEvent?.(event);
+      }
+    }
+    throw new Error('Outline stream ended before completion');
+  },
+
   getImprovementPlan: async (keywordId, existingUrl) => {
     const response = await api.get(`/api/outline/improvement-plan/${keywordId}`, {
       params: { existing_url: existingUrl }